@@ -0,0 +1,443 @@
+# analytics.py
+"""
+Backend analítico dos relatórios: snapshot colunar (Parquet) do livro de cada
+household consultado com DuckDB.
+
+O snapshot fica em disco, um Parquet por mês, atrás do cache dos fetchers
+(datacache) com o mesmo TTL: quando chega uma mudança de transações do
+household (changefeed.py), o próximo relatório compara os checksums por mês
+do banco (migração 008) e rebusca em lotes (utils.iter_tx_batches) só os
+meses que mudaram. As consultas leem o Parquet direto (projeção + filtros
+empurrados para o scan), sem montar DataFrame do intervalo inteiro.
+
+Comparações de janela (últimos N dias vs anteriores, mês vs mesmo mês do ano
+passado) saem do cubo de somas de prefixo montado uma vez sobre o mesmo
+snapshot (fetch_cube): cada total é uma subtração, sem consulta nova.
+
+Sem o pacote duckdb instalado, cai para pandas/pyarrow com as mesmas respostas.
+"""
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+import os
+import time
+import uuid
+
+import datacache
+import fx
+import money
+import perf
+from utils import _CLIENT_HASH_FUNCS, _live, _stamped, iter_tx_batches
+
+SNAPSHOT_DIR = os.environ.get("FF_ANALYTICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ff_analytics"))
+_FORMAT = 2  # layout do snapshot (2: um Parquet por mês); mudou -> reconstrói
+
+# Colunas do snapshot (o resto do JSON de transactions não entra nos relatórios)
+_COLUMNS = ("id,household_id,member_id,category_id,account_id,type,description,"
+            "occurred_at,due_date,amount,planned_amount,paid_amount,is_paid,currency")
+
+# Agrupamentos suportados -> expressão SQL
+GROUPS = {
+    "member": "member_id",
+    "category": "category_id",
+    "month": "strftime(occurred_at, '%Y-%m')",
+    "type": "type",
+}
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()), ("member_id", pa.string()), ("category_id", pa.string()),
+        ("account_id", pa.string()), ("type", pa.string()), ("description", pa.string()),
+        ("occurred_at", pa.date32()), ("due_date", pa.date32()),
+        ("planned_amount", pa.float64()), ("paid_amount", pa.float64()),
+        ("is_paid", pa.bool_()), ("currency", pa.string()), ("valor_eff_cents", pa.int64()),
+    ])
+
+
+def _batch_table(rows: List[dict]):
+    """Converte um lote de linhas JSON em uma tabela Arrow tipada."""
+    import pyarrow as pa
+    from utils import _to_date_safe
+
+    cols: Dict[str, list] = {f.name: [] for f in _schema()}
+    for r in rows:
+        planned = r.get("planned_amount")
+        if planned is None:
+            planned = r.get("amount")
+        planned = float(planned or 0)
+        paid = r.get("paid_amount")
+        is_paid = bool(r.get("is_paid"))
+        base = money.to_cents(paid if is_paid and paid is not None else planned)
+        cols["id"].append(str(r.get("id")))
+        cols["member_id"].append(r.get("member_id"))
+        cols["category_id"].append(r.get("category_id"))
+        cols["account_id"].append(r.get("account_id"))
+        cols["type"].append(r.get("type"))
+        cols["description"].append(r.get("description"))
+        cols["occurred_at"].append(_to_date_safe(r.get("occurred_at")))
+        cols["due_date"].append(_to_date_safe(r.get("due_date")))
+        cols["planned_amount"].append(planned)
+        cols["paid_amount"].append(float(paid) if paid is not None else None)
+        cols["is_paid"].append(is_paid)
+        cols["currency"].append(r.get("currency") or fx.REPORTING)
+        cols["valor_eff_cents"].append(base if r.get("type") == "income" else -base)
+    # valor_eff_cents na moeda de apresentação: uma conversão vetorizada por lote
+    if any(c != fx.REPORTING for c in cols["currency"]):
+        dias = [d or date(1970, 1, 1) for d in cols["occurred_at"]]
+        cols["valor_eff_cents"] = fx.convert(cols["valor_eff_cents"], cols["currency"], dias).tolist()
+    return pa.Table.from_pydict(cols, schema=_schema())
+
+
+def _months_between(first: str, last: str) -> List[str]:
+    out, m = [], first
+    while m <= last:
+        out.append(m)
+        y, mm = int(m[:4]), int(m[5:7])
+        m = f"{y + mm // 12}-{mm % 12 + 1:02d}"
+    return out
+
+
+def _month_range(first: str, last: str):
+    """('YYYY-MM', 'YYYY-MM') -> (primeiro dia do primeiro, último dia do último)."""
+    ini = date.fromisoformat(f"{first}-01")
+    fim = date.fromisoformat(f"{last}-01")
+    return ini, (fim.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _files(path: str) -> List[str]:
+    """Arquivos Parquet do snapshot (diretório por mês; aceita um arquivo só)."""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet"))
+    return [path] if os.path.exists(path) else []
+
+
+def _month_checksums(sb, household_id: str) -> Optional[Dict[str, str]]:
+    """{'YYYY-MM': 'linhas:checksum'} (RPC da migração 008) ou None sem a migração."""
+    try:
+        rows = sb.rpc("ledger_month_checksums", {"p_household": household_id}).execute().data or []
+    except Exception as e:
+        if getattr(e, "code", None) in ("PGRST202", "42883"):
+            return None
+        raise
+    return {str(r["month"])[:7]: f"{r['n']}:{r['checksum']}" for r in rows}
+
+
+def _write_months(sb, household_id: str, directory: str, start: Optional[date] = None,
+                  end: Optional[date] = None) -> List[str]:
+    """
+    Busca [start, end] em lotes e grava um Parquet por mês em `directory`
+    (troca atômica por arquivo). Os lotes vêm por occurred_at: um arquivo aberto por vez.
+    """
+    import pyarrow.parquet as pq
+
+    feitos: List[str] = []
+    atual = None  # (mês, writer, tmp)
+
+    def _fecha():
+        mes, writer, tmp = atual
+        writer.close()
+        os.replace(tmp, os.path.join(directory, f"{mes}.parquet"))
+        feitos.append(mes)
+
+    try:
+        for rows in iter_tx_batches(sb, household_id, start, end, columns=_COLUMNS):
+            por_mes: Dict[str, List[dict]] = {}
+            for r in rows:
+                por_mes.setdefault(str(r.get("occurred_at"))[:7], []).append(r)
+            for mes, rs in por_mes.items():
+                if atual is None or atual[0] != mes:
+                    if atual is not None:
+                        _fecha()
+                    tmp = os.path.join(directory, f".{mes}.{uuid.uuid4().hex}.tmp")  # "." fica fora da leitura
+                    atual = (mes, pq.ParquetWriter(tmp, _schema(), compression="zstd"), tmp)
+                atual[1].write_table(_batch_table(rs))
+        if atual is not None:
+            _fecha()
+            atual = None
+    finally:
+        if atual is not None:
+            atual[1].close()
+            os.remove(atual[2])
+    return feitos
+
+
+def build_snapshot(sb, household_id: str, directory: Optional[str] = None) -> str:
+    """
+    Mantém o livro do household em Parquet, um arquivo por mês, e devolve o diretório.
+
+    Compara os checksums por mês do banco (um round trip) com os do último
+    snapshot e rebusca só os meses diferentes — um save custa o mês dele, não
+    o histórico. A primeira vez, com a tabela de câmbio nova, ou sem a
+    migração 008, monta tudo em lotes (memória constante) num diretório novo e
+    troca de uma vez.
+    """
+    import json
+    import shutil
+
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    final = os.path.join(directory, str(household_id))
+    legado = f"{final}.parquet"  # formato antigo (arquivo único)
+    if os.path.exists(legado):
+        os.remove(legado)
+    manifest_path = os.path.join(final, "_manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    checks = _month_checksums(sb, household_id)
+    versao = {"format": _FORMAT, "fx": fx.version()}
+    if checks is not None and manifest.get("version") == versao and os.path.isdir(final):
+        mudou = sorted(m for m, ck in checks.items() if manifest.get("months", {}).get(m) != ck)
+        # meses seguidos viram uma consulta só
+        corridas: List[List[str]] = []
+        for m in mudou:
+            if corridas and _months_between(corridas[-1][-1], m)[1:2] == [m]:
+                corridas[-1].append(m)
+            else:
+                corridas.append([m])
+        with perf.section("analytics.snapshot.delta"):
+            for run in corridas:
+                for m in run:
+                    arq = os.path.join(final, f"{m}.parquet")
+                    if os.path.exists(arq):
+                        os.remove(arq)
+                _write_months(sb, household_id, final, *_month_range(run[0], run[-1]))
+            for arq in _files(final):  # meses que deixaram de ter lançamentos
+                if os.path.basename(arq)[:7] not in checks:
+                    os.remove(arq)
+    else:
+        tmp = os.path.join(directory, f".{household_id}.{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp)
+        with perf.section("analytics.snapshot.full"):
+            _write_months(sb, household_id, tmp)
+        velho = f"{tmp}.old"
+        if os.path.exists(final):
+            os.replace(final, velho)
+        os.replace(tmp, final)
+        shutil.rmtree(velho, ignore_errors=True)
+
+    novo = os.path.join(final, f".manifest.{uuid.uuid4().hex}.tmp")
+    with open(novo, "w", encoding="utf-8") as f:
+        json.dump({"version": versao, "months": checks or {}}, f)
+    os.replace(novo, manifest_path)
+    return final
+
+
+@_live("transactions")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_ledger_snapshot(sb, HOUSEHOLD_ID) -> dict:
+    """Garante um snapshot atual do household (só os meses que mudaram) e devolve {path, built_at}."""
+    path = build_snapshot(sb, HOUSEHOLD_ID)
+    return {"path": path, "built_at": time.time()}
+
+
+# =========================
+# Consultas
+# =========================
+def _where(start: Optional[date], end: Optional[date], filters: Optional[dict]):
+    """Monta o WHERE parametrizado a partir do intervalo e filtros livres."""
+    conds, params = [], []
+    f = dict(filters or {})
+    if start is not None:
+        conds.append("occurred_at >= ?"); params.append(start)
+    if end is not None:
+        conds.append("occurred_at <= ?"); params.append(end)
+    for key, col in (("member_ids", "member_id"), ("category_ids", "category_id"),
+                     ("account_ids", "account_id"), ("types", "type")):
+        vals = list(f.get(key) or [])
+        if vals:
+            conds.append(f"{col} IN ({', '.join('?' for _ in vals)})"); params.extend(vals)
+    if f.get("is_paid") is not None:
+        conds.append("is_paid = ?"); params.append(bool(f["is_paid"]))
+    if f.get("min_amount") is not None:
+        conds.append("abs(valor_eff_cents) >= ?"); params.append(money.to_cents(f["min_amount"]))
+    if f.get("max_amount") is not None:
+        conds.append("abs(valor_eff_cents) <= ?"); params.append(money.to_cents(f["max_amount"]))
+    if f.get("text"):
+        conds.append("description ILIKE ?"); params.append(f"%{f['text']}%")
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+def query_report(path: str, by: str | Iterable[str], start: Optional[date] = None,
+                 end: Optional[date] = None, filters: Optional[dict] = None):
+    """
+    Soma valor_eff agrupando por `by` ("member", "category", "month", "type" ou
+    combinação). Devolve um DataFrame pequeno: uma linha por grupo. A soma é
+    feita em centavos inteiros (exata); valor_eff sai em reais.
+    """
+    import pandas as pd
+
+    keys = [by] if isinstance(by, str) else list(by)
+    exprs = [f"{GROUPS[k]} AS {k}" for k in keys]
+    where, params = _where(start, end, filters)
+    arquivos = _files(path)
+    if not arquivos:
+        return pd.DataFrame(columns=keys + ["valor_eff", "qtd"])
+    try:
+        import duckdb
+    except ImportError:
+        return _query_report_pandas(path, keys, start, end, filters)
+
+    sql = (f"SELECT {', '.join(exprs)}, CAST(sum(valor_eff_cents) AS DOUBLE) / 100 AS valor_eff, count(*) AS qtd "
+           f"FROM read_parquet(?){where} GROUP BY ALL ORDER BY ALL")
+    with duckdb.connect() as con:
+        return con.execute(sql, [arquivos] + params).df()
+
+
+def _query_report_pandas(path, keys, start, end, filters):
+    """Fallback sem DuckDB: mesmo resultado, filtros empurrados para o leitor Parquet."""
+    import pandas as pd
+
+    dnf = []
+    if start is not None:
+        dnf.append(("occurred_at", ">=", start))
+    if end is not None:
+        dnf.append(("occurred_at", "<=", end))
+    df = pd.read_parquet(path, filters=dnf or None)
+    f = dict(filters or {})
+    for key, col in (("member_ids", "member_id"), ("category_ids", "category_id"),
+                     ("account_ids", "account_id"), ("types", "type")):
+        if f.get(key):
+            df = df[df[col].isin(list(f[key]))]
+    if f.get("is_paid") is not None:
+        df = df[df["is_paid"] == bool(f["is_paid"])]
+    if f.get("min_amount") is not None:
+        df = df[df["valor_eff_cents"].abs() >= money.to_cents(f["min_amount"])]
+    if f.get("max_amount") is not None:
+        df = df[df["valor_eff_cents"].abs() <= money.to_cents(f["max_amount"])]
+    if f.get("text"):
+        df = df[df["description"].fillna("").str.contains(f["text"], case=False, regex=False)]
+    if "month" in keys:
+        df = df.assign(month=pd.to_datetime(df["occurred_at"]).dt.strftime("%Y-%m"))
+    df = df.rename(columns={"member_id": "member", "category_id": "category"}) if keys else df
+    out = df.groupby(keys, dropna=False).agg(valor_eff=("valor_eff_cents", "sum"), qtd=("id", "count")).reset_index()
+    out["valor_eff"] = money.to_reais(out["valor_eff"].to_numpy(dtype="int64"))
+    return out.sort_values(keys).reset_index(drop=True)
+
+
+def report(sb, household_id: str, by, start: Optional[date] = None, end: Optional[date] = None,
+           filters: Optional[dict] = None):
+    """Atalho usado pelas páginas: garante o snapshot e consulta."""
+    snap = fetch_ledger_snapshot(sb, household_id)
+    with perf.section(f"analytics.{by if isinstance(by, str) else '+'.join(by)}"):
+        return query_report(snap["path"], by, start, end, filters)
+
+
+# =========================
+# Janelas e comparações (somas de prefixo)
+# =========================
+# "Últimos 30/90/365 dias vs período anterior" e "este mês vs mesmo mês do ano
+# passado" por categoria/membro: em vez de um fetch + groupby por comparação,
+# o snapshot vira uma vez por household uma matriz célula x dia de somas
+# acumuladas (célula = tipo, categoria, membro). O total de qualquer janela
+# [a, b] é prefix[:, b+1] - prefix[:, a] — O(1) por célula, sem consulta.
+CUBE_KEYS = ("type", "category", "member")
+
+
+def build_cube(path: str) -> dict:
+    """
+    Somas de prefixo diárias do snapshot (centavos com sinal, por occurred_at).
+    {origin, days, type/category/member (rótulo de cada célula), prefix (células x dias+1)}.
+    """
+    import numpy as np
+    import pandas as pd
+
+    vazio = {"origin": date.today(), "days": 0, "prefix": np.zeros((0, 1), dtype=np.int64),
+             **{k: np.array([], dtype=object) for k in CUBE_KEYS}}
+    if not _files(path):
+        return vazio
+    df = pd.read_parquet(path, columns=["type", "category_id", "member_id", "occurred_at", "valor_eff_cents"])
+    df = df[df["occurred_at"].notna()]
+    if df.empty:
+        return vazio
+    with perf.section("analytics.cube"):
+        dia = pd.to_datetime(df["occurred_at"]).to_numpy().astype("datetime64[D]")
+        origin = dia.min()
+        last = max(dia.max(), np.datetime64(date.today(), "D"))
+        days = int((last - origin).astype(np.int64)) + 1
+        index: Dict[tuple, int] = {}
+        codes = np.fromiter((index.setdefault(k, len(index)) for k in
+                             zip(df["type"].to_numpy(), df["category_id"].to_numpy(), df["member_id"].to_numpy())),
+                            dtype=np.int64, count=len(df))
+        cells = list(index)
+        grid = np.zeros((len(cells), days + 1), dtype=np.int64)
+        np.add.at(grid, (codes, (dia - origin).astype(np.int64) + 1), df["valor_eff_cents"].to_numpy(dtype=np.int64))
+        prefix = np.cumsum(grid, axis=1)
+    return {"origin": origin.astype(date), "days": days, "prefix": prefix,
+            **{k: np.array([c[i] for c in cells], dtype=object) for i, k in enumerate(CUBE_KEYS)}}
+
+
+@_live("transactions")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_cube(sb, HOUSEHOLD_ID) -> dict:
+    """Cubo de somas de prefixo do household (a partir do snapshot atual)."""
+    snap = fetch_ledger_snapshot(sb, HOUSEHOLD_ID)
+    return build_cube(snap["path"])
+
+
+def _offset(cube: dict, d: date) -> int:
+    """Coluna do prefixo até o fim de `d` (fora do cubo: presa às bordas)."""
+    return min(max((d - cube["origin"]).days + 1, 0), cube["days"])
+
+
+def window_totals(cube: dict, start: date, end: date):
+    """Total de cada célula em [start, end] (int64 centavos)."""
+    p = cube["prefix"]
+    return p[:, _offset(cube, end)] - p[:, _offset(cube, start - timedelta(days=1))]
+
+
+def rolling(cube: dict, window: int, start: date, end: date, types: Iterable[str] = ("expense",)):
+    """
+    Soma móvel de `window` dias das células de `types`, para cada dia de [start, end]
+    (int64 centavos). Uma subtração de prefixos por dia.
+    """
+    import numpy as np
+
+    linha = cube["prefix"][np.isin(cube["type"], list(types))].sum(axis=0)
+    dias = np.arange((start - cube["origin"]).days, (end - cube["origin"]).days + 1)
+    fim = np.clip(dias + 1, 0, cube["days"])
+    ini = np.clip(dias + 1 - window, 0, cube["days"])
+    return linha[fim] - linha[ini]
+
+
+def compare(cube: dict, current: tuple, previous: tuple, by: str = "category",
+            types: Iterable[str] = ("expense",)):
+    """
+    Totais de `current` (início, fim) vs `previous` por `by` ("category" ou
+    "member"), só das células de `types`. DataFrame {by, atual, anterior, delta, pct}
+    em centavos, maior movimento primeiro; pct é NaN sem base anterior.
+    """
+    import numpy as np
+    import pandas as pd
+
+    sel = np.isin(cube["type"], list(types))
+    df = pd.DataFrame({
+        by: cube[by][sel],
+        "atual": window_totals(cube, *current)[sel],
+        "anterior": window_totals(cube, *previous)[sel],
+    }).groupby(by, dropna=False, as_index=False).sum()
+    df = df[(df["atual"] != 0) | (df["anterior"] != 0)]
+    df["delta"] = df["atual"] - df["anterior"]
+    df["pct"] = np.where(df["anterior"] != 0, df["delta"] / df["anterior"].abs().replace(0, 1), np.nan)
+    return df.sort_values("delta", key=lambda s: -s.abs()).reset_index(drop=True)
+
+
+def rolling_periods(today: date, days: int):
+    """Últimos `days` dias (até hoje) e os `days` dias imediatamente antes."""
+    cur = (today - timedelta(days=days - 1), today)
+    return cur, (cur[0] - timedelta(days=days), cur[0] - timedelta(days=1))
+
+
+def yoy_periods(today: date):
+    """Mês corrente até hoje vs os mesmos dias do mesmo mês do ano anterior."""
+    cur = (today.replace(day=1), today)
+    ano = today.replace(year=today.year - 1, day=1)
+    fim = (ano.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return cur, (ano, min(fim, ano.replace(day=min(today.day, fim.day))))
@@ -0,0 +1,249 @@
+# anomalies.py
+"""
+Detecção incremental de gastos fora do normal.
+
+Dois tipos de alerta, só para despesas:
+
+  * lançamento: valor bem acima do usual da categoria (conta de luz com o
+    dobro do valor de sempre) — z-score sobre média/variância (Welford) e
+    razão sobre a EWMA dos valores recentes;
+  * categoria: total do mês corrente bem acima do mês típico (surto de
+    delivery) — contra a EWMA/variância exponencial dos totais mensais.
+
+As estatísticas são contínuas: cada lançamento novo (ou com valor alterado,
+ou apagado) mexe nelas em O(1) — nada de recalcular o histórico a cada
+render. A entrada é a janela de transações que a Home já carrega (sem
+consulta extra); o estado fica em disco por household (FF_ANOMALY_DIR), então
+reiniciar o processo não recomeça do zero.
+
+    alertas = anomalies.update(HOUSEHOLD_ID, linhas_da_janela, inicio_da_janela)
+    anomalies.alerts(HOUSEHOLD_ID)   # último resultado, sem processar nada
+"""
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+import json
+import math
+import os
+import threading
+import uuid
+
+import fx
+import money
+import perf
+
+STATE_DIR = os.environ.get("FF_ANOMALY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ff_anomalies"))
+
+MIN_COUNT = 5          # lançamentos da categoria antes de julgar um valor
+TX_Z = 3.0             # desvios acima da média
+TX_RATIO = 1.8         # e pelo menos isso vezes a EWMA recente
+MIN_MONTHS = 3         # meses fechados antes de julgar o total do mês
+SPIKE_Z = 2.0
+SPIKE_RATIO = 1.5
+MIN_EXCESS = 5000      # centavos: diferenças menores não viram alerta
+ALPHA = 0.3            # peso da observação nova nas EWMAs
+RECENT_DAYS = 30       # lançamentos sinalizados que ainda aparecem
+
+_LOCK = threading.Lock()
+_STATES: Dict[str, dict] = {}
+
+
+# =========================
+# Estatísticas contínuas
+# =========================
+def _new_stat() -> dict:
+    return {"n": 0, "mean": 0.0, "m2": 0.0, "ewma": None,
+            "months": {}, "ew_n": 0, "ew_mean": 0.0, "ew_var": 0.0, "ew_through": None}
+
+
+def _add(s: dict, x: int):
+    """Welford + EWMA: O(1)."""
+    s["n"] += 1
+    d = x - s["mean"]
+    s["mean"] += d / s["n"]
+    s["m2"] += d * (x - s["mean"])
+    s["ewma"] = x if s["ewma"] is None else s["ewma"] + ALPHA * (x - s["ewma"])
+
+
+def _remove(s: dict, x: int):
+    """Desfaz um _add (Welford é reversível; a EWMA fica como está)."""
+    if s["n"] <= 1:
+        s.update(n=0, mean=0.0, m2=0.0)
+        return
+    old = s["mean"]
+    s["n"] -= 1
+    s["mean"] = (old * (s["n"] + 1) - x) / s["n"]
+    s["m2"] = max(s["m2"] - (x - old) * (x - s["mean"]), 0.0)
+
+
+def _std(s: dict) -> float:
+    return math.sqrt(s["m2"] / (s["n"] - 1)) if s["n"] > 1 else 0.0
+
+
+def _ew_fold(ew: tuple, x: int) -> tuple:
+    """(n, média, variância) exponenciais + um mês."""
+    n, mean, var = ew
+    if n == 0:
+        return 1, float(x), 0.0
+    d = x - mean
+    inc = ALPHA * d
+    return n + 1, mean + inc, (1 - ALPHA) * (var + d * inc)
+
+
+def _next_month(m: str) -> str:
+    y, mm = int(m[:4]), int(m[5:7])
+    return f"{y + mm // 12}-{mm % 12 + 1:02d}"
+
+
+def _fold_months(s: dict, until: str, commit: bool) -> tuple:
+    """Dobra na EWMA os meses fechados até `until` (exclusive); meses sem gasto contam 0."""
+    ew = (s["ew_n"], s["ew_mean"], s["ew_var"])
+    m = _next_month(s["ew_through"]) if s["ew_through"] else min(s["months"], default=until)
+    while m < until:
+        ew = _ew_fold(ew, s["months"].get(m, 0))
+        if commit:
+            s["months"].pop(m, None)
+            s["ew_through"] = m
+        m = _next_month(m)
+    if commit:
+        s["ew_n"], s["ew_mean"], s["ew_var"] = ew
+    return ew
+
+
+def _is_outlier(s: dict, x: int) -> bool:
+    if s["n"] < MIN_COUNT or s["ewma"] is None:
+        return False
+    std = _std(s)
+    usual = max(s["ewma"], s["mean"])
+    return (x - usual >= MIN_EXCESS and x >= TX_RATIO * usual
+            and (std == 0 or (x - s["mean"]) / std >= TX_Z))
+
+
+# =========================
+# Estado por household (memória + disco)
+# =========================
+def _path(household_id: str) -> str:
+    return os.path.join(STATE_DIR, f"{household_id}.json")
+
+
+def _load(household_id: str) -> dict:
+    st_ = _STATES.get(household_id)
+    if st_ is None:
+        try:
+            with open(_path(household_id), encoding="utf-8") as f:
+                st_ = json.load(f)
+        except (OSError, ValueError):
+            st_ = {"version": 1, "watermark": None, "stats": {}, "seen": {}, "alerts": {}}
+        _STATES[household_id] = st_
+    return st_
+
+
+def _save(household_id: str, st_: dict):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    final = _path(household_id)
+    tmp = f"{final}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(st_, f, separators=(",", ":"))
+    os.replace(tmp, final)
+
+
+# =========================
+# Atualização incremental
+# =========================
+def update(household_id: str, rows: Sequence[dict], window_start: date,
+           today: Optional[date] = None) -> List[dict]:
+    """
+    Aplica as diferenças entre `rows` (transações de [window_start, hoje]) e o
+    que já foi visto: novos entram, alterados trocam de valor, sumidos saem.
+    Lançamentos anteriores à janela ficam definitivos. Devolve alerts().
+    """
+    today = today or date.today()
+    wm = window_start.isoformat()
+    with _LOCK, perf.section("anomalies.update"):
+        st_ = _load(household_id)
+        seen, stats, alerts = st_["seen"], st_["stats"], st_["alerts"]
+        changed = False
+
+        # janela andou: o que ficou para trás é definitivo
+        if st_["watermark"] != wm:
+            for tid in [t for t, (_, d, _c) in seen.items() if d < wm]:
+                del seen[tid]
+                alerts.pop(tid, None)
+            for s in stats.values():
+                _fold_months(s, wm[:7], commit=True)
+            st_["watermark"] = wm
+            changed = True
+
+        desp = [r for r in rows if r.get("type") == "expense" and r.get("id") is not None
+                and str(r.get("occurred_at") or "")[:10] >= wm]
+        valores = fx.effective(desp)
+        atuais = {}
+        for r, x in zip(desp, valores):
+            atuais[str(r["id"])] = (int(x), str(r["occurred_at"])[:10], r.get("category_id") or "", r)
+
+        # sumiram (apagados ou movidos para fora da janela)
+        for tid in [t for t in seen if t not in atuais]:
+            x, d, cat = seen.pop(tid)
+            s = stats[cat]
+            _remove(s, x)
+            s["months"][d[:7]] = s["months"].get(d[:7], 0) - x
+            alerts.pop(tid, None)
+            changed = True
+
+        novos = sorted((v for t, v in atuais.items() if seen.get(t) != list(v[:3])), key=lambda v: (v[1], str(v[3]["id"])))
+        for x, d, cat, r in novos:
+            tid = str(r["id"])
+            antes = seen.get(tid)
+            if antes is not None:  # valor/data/categoria mudou: sai o antigo
+                ox, od, ocat = antes
+                _remove(stats[ocat], ox)
+                stats[ocat]["months"][od[:7]] = stats[ocat]["months"].get(od[:7], 0) - ox
+            s = stats.setdefault(cat, _new_stat())
+            if _is_outlier(s, x):
+                alerts[tid] = {"kind": "transaction", "id": r["id"], "category_id": r.get("category_id"),
+                               "description": r.get("description"), "day": d, "value": x,
+                               "usual": int(round(max(s["ewma"], s["mean"])))}
+            else:
+                alerts.pop(tid, None)
+            _add(s, x)
+            s["months"][d[:7]] = s["months"].get(d[:7], 0) + x
+            seen[tid] = [x, d, cat]
+            changed = True
+
+        if changed:
+            _save(household_id, st_)
+        return _alerts(st_, today)
+
+
+def _alerts(st_: dict, today: date) -> List[dict]:
+    desde = (today - timedelta(days=RECENT_DAYS)).isoformat()
+    mes = today.strftime("%Y-%m")
+    out = []
+    for cat, s in st_["stats"].items():
+        total = s["months"].get(mes, 0)
+        n, mean, var = _fold_months(s, mes, commit=False)
+        if (n >= MIN_MONTHS and total - mean >= MIN_EXCESS and total >= SPIKE_RATIO * mean
+                and total > mean + SPIKE_Z * math.sqrt(var)):
+            out.append({"kind": "category", "category_id": cat or None, "month": mes,
+                        "value": total, "usual": int(round(mean))})
+    out.sort(key=lambda a: -(a["value"] - a["usual"]))
+    out += sorted((a for a in st_["alerts"].values() if a["day"] >= desde), key=lambda a: a["day"], reverse=True)
+    return out
+
+
+def alerts(household_id: str, today: Optional[date] = None) -> List[dict]:
+    """Alertas do último estado conhecido (categorias do mês + lançamentos dos últimos RECENT_DAYS)."""
+    with _LOCK:
+        return _alerts(_load(household_id), today or date.today())
+
+
+def describe(a: dict, cat_name_by_id: Optional[dict] = None) -> str:
+    """Uma linha de texto para a Home e o e-mail."""
+    cat = (cat_name_by_id or {}).get(a.get("category_id")) or "Sem categoria"
+    vezes = a["value"] / a["usual"] if a["usual"] else 0
+    if a["kind"] == "category":
+        return (f"{cat}: {money.brl(a['value'])} no mês, {vezes:.1f}× o mês típico "
+                f"({money.brl(a['usual'])})")
+    d = date.fromisoformat(a["day"]).strftime("%d/%m")
+    return (f"{a.get('description') or '(sem descrição)'} ({cat}, {d}): {money.brl(a['value'])}, "
+            f"{vezes:.1f}× o usual ({money.brl(a['usual'])})")
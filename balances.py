@@ -0,0 +1,141 @@
+# balances.py
+"""
+Saldo diário por conta (e patrimônio) a partir dos checkpoints mensais.
+
+Saldo de uma conta em um dia = opening_balance + lançamentos pagos da conta até
+o dia (cartão fora), na data coalesce(paid_at, occurred_at). Recalcular isso
+varrendo o histórico a cada gráfico é O(histórico); a migração 005 guarda o
+saldo de fim de mês de cada conta e a RPC account_balance_series parte do
+checkpoint anterior à janela, varrendo só os lançamentos dela. Edições
+retroativas marcam a conta suja (trigger) e o recálculo começa no mês afetado.
+
+    s = balances.fetch_balance_series(sb, HOUSEHOLD_ID, ini, fim)          # diário
+    s = balances.fetch_balance_series(sb, HOUSEHOLD_ID, ini, fim, "month")  # fins de mês
+    df = balances.net_worth(s, contas)   # dia x conta (centavos) + "Total"
+
+Sem a RPC (migração não aplicada), cai para a varredura em lotes do histórico.
+"""
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, List, Sequence
+
+import datacache
+import fx
+import money
+import perf
+from utils import _CLIENT_HASH_FUNCS, _live, _stamped, iter_tx_batches
+
+STEPS = ("day", "month")
+TOTAL = "Total"
+
+
+def _move(t: dict):
+    """(conta, dia, centavos com sinal) se o lançamento mexe no saldo; senão None."""
+    if not t.get("is_paid") or not t.get("account_id") or (t.get("payment_method") or "account") == "card":
+        return None
+    v = t.get("paid_amount")
+    if v is None:
+        v = t.get("planned_amount") if t.get("planned_amount") is not None else t.get("amount")
+    c = money.to_cents(v)
+    raw = t.get("paid_at") or t.get("occurred_at")
+    try:
+        day = date.fromisoformat(str(raw)[:10])
+    except ValueError:
+        return None
+    return t["account_id"], day, c if t.get("type") == "income" else -c
+
+
+def _month_ends(start: date, end: date) -> List[date]:
+    out, m = [], start.replace(day=1)
+    while True:
+        fim = (m.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        if fim > end:
+            break
+        out.append(fim)
+        m = fim + timedelta(days=1)
+    return out
+
+
+def _series_scan(sb, HOUSEHOLD_ID, start: date, end: date, step: str) -> List[dict]:
+    """Mesma resposta da RPC, varrendo o histórico inteiro (O(histórico))."""
+    accs = sb.table("accounts").select("id,opening_balance").eq("household_id", HOUSEHOLD_ID).execute().data or []
+    delta: Dict[tuple, int] = {}
+    for rows in iter_tx_batches(sb, HOUSEHOLD_ID, columns="account_id,type,is_paid,payment_method,"
+                                                             "amount,planned_amount,paid_amount,paid_at,occurred_at"):
+        for t in rows:
+            mv = _move(t)
+            if mv is not None and mv[1] <= end:
+                key = (mv[0], max(mv[1], start - timedelta(days=1)))  # antes da janela: tudo num dia só
+                delta[key] = delta.get(key, 0) + mv[2]
+    if step == "month":
+        dias = _month_ends(start, end)
+        hoje = min(end, date.today())
+        if end >= date.today().replace(day=1) and (not dias or dias[-1] != hoje):  # último dia do mês já está
+            dias.append(hoje)
+    else:
+        dias = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    out = []
+    for a in sorted(accs, key=lambda a: str(a["id"])):
+        bal = money.to_cents(a.get("opening_balance")) + delta.get((a["id"], start - timedelta(days=1)), 0)
+        d, k = start, 0
+        while k < len(dias) and d <= dias[-1]:
+            bal += delta.get((a["id"], d), 0)
+            if d == dias[k]:
+                out.append({"account_id": a["id"], "day": d.isoformat(), "balance": money.to_reais(bal)})
+                k += 1
+            d += timedelta(days=1)
+    return out
+
+
+def _rpc_missing(e: Exception) -> bool:
+    """Erro do PostgREST/Postgres de função inexistente (migração não aplicada)."""
+    return getattr(e, "code", None) in ("PGRST202", "42883")
+
+
+@_live("transactions", "accounts")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_balance_series(sb, HOUSEHOLD_ID, start: date, end: date, step: str = "day") -> List[dict]:
+    """
+    [{account_id, day, balance}] de [start, end]: todo dia (step "day") ou só os
+    fins de mês + hoje (step "month", direto dos checkpoints — anos de gráfico).
+    """
+    if step not in STEPS:
+        raise ValueError(f"step inválido: {step!r}")
+    try:
+        return sb.rpc("account_balance_series", {
+            "p_household": HOUSEHOLD_ID, "p_start": start.isoformat(),
+            "p_end": end.isoformat(), "p_step": step,
+        }).execute().data or []
+    except Exception as e:
+        if not _rpc_missing(e):
+            raise  # rede, RLS, timeout: não vira varredura do histórico
+        # migração 005 não aplicada: varredura do histórico em lotes
+        return _series_scan(sb, HOUSEHOLD_ID, start, end, step)
+
+
+def net_worth(series: Sequence[dict], accounts: Sequence[dict]):
+    """
+    DataFrame dia x nome da conta (centavos int64, na moeda de apresentação) + coluna "Total".
+    Conta sem ponto num dia repete o último saldo (ou o inicial).
+    """
+    import pandas as pd
+
+    nomes = {a["id"]: a.get("name") or "Conta" for a in accounts}
+    if not series:
+        return pd.DataFrame(columns=[TOTAL])
+    df = pd.DataFrame(series)
+    df["day"] = pd.to_datetime(df["day"])
+    df["cents"] = money.cents(df["balance"])
+    wide = df.pivot_table(index="day", columns="account_id", values="cents", aggfunc="last").sort_index().ffill()
+    inicial = {a["id"]: money.to_cents(a.get("opening_balance")) for a in accounts}
+    moeda = {a["id"]: a.get("currency") for a in accounts}
+    dias = wide.index.to_numpy().astype("datetime64[D]")
+    for col in wide.columns:
+        # saldo na moeda da conta -> moeda de apresentação, pela cotação de cada dia
+        nativo = wide[col].fillna(inicial.get(col, 0)).to_numpy(dtype="int64")
+        wide[col] = fx.convert(nativo, [moeda.get(col)] * len(nativo), dias)
+    wide = wide.astype("int64").rename(columns=lambda c: nomes.get(c, str(c)))
+    wide = wide.T.groupby(level=0).sum().T.rename_axis(columns=None)  # contas com o mesmo nome viram uma coluna
+    wide[TOTAL] = wide.sum(axis=1)
+    return wide
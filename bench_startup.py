@@ -0,0 +1,161 @@
+# bench_startup.py
+"""
+Benchmark de partida a frio do app.
+
+Cada medida roda num interpretador novo (nada em sys.modules), contra o
+cliente fake (FF_FAKE_SUPABASE=1), e cronometra:
+
+  login      import do Streamlit + primeiro rerun do app.py até o formulário de login
+  dashboard  idem, já autenticado, até a Home com os gráficos
+
+Também lista quais bibliotecas pesadas já estavam carregadas ao fim de cada
+caminho (o login não deveria precisar de pandas/plotly/smtplib).
+
+Uso:
+    python bench_startup.py                     # mediana de 5 execuções
+    python bench_startup.py --profile login     # pacotes que mais pesam no import (-X importtime)
+    python bench_startup.py --record            # acrescenta o resultado em startup_history.jsonl
+    python bench_startup.py --max-regression 20 # sai com 1 se piorar >20% vs. último registro
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HISTORY = os.path.join(ROOT, "startup_history.jsonl")
+HEAVY = ("pandas", "numpy", "plotly", "pyarrow", "duckdb", "smtplib", "email.message", "dateutil")
+PATHS = ("login", "dashboard")
+
+
+# =========================
+# Processo filho (uma medida)
+# =========================
+def _child(path: str):
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t_import = time.perf_counter() - t0
+
+    sys.path.insert(0, ROOT)
+    if path == "login":
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    else:
+        from fake_supabase import FakeSupabase, demo_dataset
+        from perf_budget import _new_app
+        at = _new_app(FakeSupabase(demo_dataset()))
+    t1 = time.perf_counter()
+    at.run()
+    t_run = time.perf_counter() - t1
+    if at.exception:
+        raise SystemExit(f"{path}: {at.exception[0].message}")
+    if path == "login" and not any(b.label == "Entrar" for b in at.button):
+        raise SystemExit("login: formulário de login não renderizou")
+    print(json.dumps({
+        "import_ms": round(t_import * 1000, 1),
+        "run_ms": round(t_run * 1000, 1),
+        "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "heavy": [m for m in HEAVY if m in sys.modules],
+    }))
+
+
+def _spawn(path: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, "FF_FAKE_SUPABASE": "1", "PYTHONDONTWRITEBYTECODE": "0"}
+    env.pop("FF_PERF", None)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + [__file__, "--child", path]
+    return subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+
+
+# =========================
+# Medição / perfil
+# =========================
+def measure(runs: int = 5) -> Dict[str, dict]:
+    out = {}
+    for path in PATHS:
+        samples = []
+        for _ in range(runs):
+            res = _spawn(path)
+            if res.returncode != 0:
+                raise RuntimeError(res.stderr.strip().splitlines()[-1] if res.stderr.strip() else path)
+            samples.append(json.loads(res.stdout.strip().splitlines()[-1]))
+        out[path] = {
+            "total_ms": statistics.median(s["total_ms"] for s in samples),
+            "import_ms": statistics.median(s["import_ms"] for s in samples),
+            "run_ms": statistics.median(s["run_ms"] for s in samples),
+            "heavy": samples[-1]["heavy"],
+        }
+    return out
+
+
+def profile(path: str, top: int = 20) -> List[tuple]:
+    """Tempo próprio de import (µs) somado por pacote de topo, maiores primeiro."""
+    res = _spawn(path, importtime=True)
+    agg: Dict[str, int] = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = [p.strip() for p in line[len("import time:"):].split("|")]
+        if self_us.isdigit():
+            pkg = name.split(".")[0]
+            agg[pkg] = agg.get(pkg, 0) + int(self_us)
+    return sorted(agg.items(), key=lambda kv: -kv[1])[:top]
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _last_record(path: str = HISTORY) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        lines = [l for l in f if l.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de partida a frio (login e primeira Home).")
+    ap.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--profile", choices=PATHS)
+    ap.add_argument("--record", action="store_true", help=f"acrescenta o resultado em {os.path.basename(HISTORY)}")
+    ap.add_argument("--max-regression", type=float, help="falha se total_ms piorar mais que N%% vs. último registro")
+    args = ap.parse_args(argv)
+
+    if args.child:
+        _child(args.child)
+        return 0
+    if args.profile:
+        for name, us in profile(args.profile):
+            print(f"{us / 1000:>9.1f} ms  {name}")
+        return 0
+
+    res = measure(args.runs)
+    prev = _last_record()
+    failed = False
+    for path, r in res.items():
+        line = f"{path:<10} total={r['total_ms']:>7.1f} ms  (streamlit {r['import_ms']:.0f} + rerun {r['run_ms']:.0f})"
+        if prev and path in prev:
+            delta = (r["total_ms"] / prev[path]["total_ms"] - 1) * 100
+            line += f"  {delta:+.1f}% vs {prev.get('rev') or 'anterior'}"
+            if args.max_regression is not None and delta > args.max_regression:
+                failed = True
+        print(line + (f"  carregados: {', '.join(r['heavy'])}" if r["heavy"] else ""))
+
+    if args.record:
+        entry = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "rev": _git_rev(), **res}
+        with open(HISTORY, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
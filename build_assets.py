@@ -0,0 +1,54 @@
+# build_assets.py
+"""
+Gera as variantes WebP das imagens de assets/ em static/img/.
+
+O app não manda mais PNG de 1–2 MB pelo st.image: as páginas referenciam
+static/img/<nome>_<largura>.webp (servido pelo Streamlit com
+server.enableStaticServing e cacheado pelo navegador), com a variante 2x no
+srcset para telas de alta densidade.
+
+Rodar sempre que uma imagem de assets/ mudar (os .webp são versionados):
+    python build_assets.py
+"""
+from __future__ import annotations
+from typing import Dict, Tuple
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(ROOT, "assets")
+OUT = os.path.join(ROOT, "static", "img")
+
+# arquivo de origem -> (nome de saída, larguras, qualidade)
+VARIANTS: Dict[str, Tuple[str, Tuple[int, ...], int]] = {
+    "logo_family_finance.png": ("logo_family_finance", (116, 232, 250, 500), 90),
+    "logo_automaGO.png": ("logo_automaGO", (96, 192), 90),
+    "Backgroud_FF.png": ("bg", (640, 1024), 78),
+}
+
+
+def build(src_dir: str = SRC, out_dir: str = OUT) -> Dict[str, int]:
+    """Gera (ou regera) todas as variantes e devolve {arquivo: bytes}."""
+    from PIL import Image
+
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = {}
+    for src, (name, widths, quality) in VARIANTS.items():
+        with Image.open(os.path.join(src_dir, src)) as im:
+            im.load()
+            for w in widths:
+                w = min(w, im.width)
+                h = round(im.height * w / im.width)
+                path = os.path.join(out_dir, f"{name}_{w}.webp")
+                im.resize((w, h), Image.LANCZOS).save(path, "WEBP", quality=quality, method=6)
+                sizes[os.path.relpath(path, ROOT)] = os.path.getsize(path)
+    return sizes
+
+
+if __name__ == "__main__":
+    total = 0
+    for path, n in build().items():
+        total += n
+        print(f"{n / 1024:8.1f} KiB  {path}")
+    print(f"{total / 1024:8.1f} KiB  total")
+    sys.exit(0)
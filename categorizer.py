@@ -0,0 +1,170 @@
+# categorizer.py
+"""
+Sugestão de categoria pela descrição, aprendida do histórico do household.
+
+Índice invertido: cada descrição vira termos normalizados (sem acento/caixa,
+números descartados) e prefixos desses termos ("farm" acha "farmácia",
+"FARMACIA SAO JOAO" acha "Farmácia"); cada termo guarda a contagem por
+category_id. Sugerir é somar os contadores dos termos da descrição, com peso
+IDF (termo que aparece em toda categoria não decide nada) — microssegundos,
+sem consulta ao banco.
+
+O modelo é montado uma vez por household e processo (histórico em lotes,
+utils.iter_tx_batches) e depois só cresce: learn() nas gravações do app e,
+passado FF_CATEGORIZER_REFRESH segundos, um catch-up dos últimos dias que
+acrescenta apenas ids ainda não vistos. Nada é re-treinado do zero.
+
+    cat_id, conf = categorizer.suggest(sb, HOUSEHOLD_ID, "farmacia sao joao", "expense")
+    sugestoes = categorizer.model_for(sb, HOUSEHOLD_ID).suggest_many(descricoes)
+"""
+from __future__ import annotations
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import perf
+from utils import iter_tx_batches
+
+REFRESH_SECONDS = int(os.environ.get("FF_CATEGORIZER_REFRESH", "600"))
+CATCH_UP_DAYS = 90
+MIN_PREFIX, MAX_PREFIX = 3, 6
+PREFIX_WEIGHT = 0.5  # prefixo vale menos que o termo inteiro
+_STOP = {"de", "da", "do", "das", "dos", "e", "em", "no", "na", "com", "para", "pix", "ted", "doc",
+         "pagto", "pagamento", "compra", "debito", "credito", "cartao", "parc", "parcela"}
+
+
+def _fold(s: Optional[str]) -> str:
+    s = unicodedata.normalize("NFKD", (s or "").lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def features(description: Optional[str]) -> List[Tuple[str, float]]:
+    """Termos (peso 1) e prefixos (peso PREFIX_WEIGHT) de uma descrição."""
+    out: Dict[str, float] = {}
+    for tok in re.findall(r"[a-z]+", _fold(description)):
+        if len(tok) < 2 or tok in _STOP:
+            continue
+        out["w:" + tok] = 1.0
+        for n in range(MIN_PREFIX, min(len(tok), MAX_PREFIX) + 1):
+            out.setdefault("p:" + tok[:n], PREFIX_WEIGHT)
+    return list(out.items())
+
+
+class Categorizer:
+    """Índice termo -> Counter(category_id); incremental e seguro entre threads."""
+
+    def __init__(self):
+        self._index: Dict[str, Counter] = {}
+        self._kind: Dict[str, Counter] = {"income": Counter(), "expense": Counter()}
+        self._seen: set = set()
+        self._lock = threading.Lock()
+        self.docs = 0
+        self.refreshed_at = 0.0
+
+    def learn(self, rows: Iterable[dict]) -> int:
+        """Acrescenta transações (id, description, category_id, type); ids repetidos são ignorados."""
+        n = 0
+        with self._lock:
+            for r in rows:
+                cat, tid = r.get("category_id"), r.get("id")
+                if not cat or (tid is not None and tid in self._seen):
+                    continue
+                if tid is not None:
+                    self._seen.add(tid)
+                for f, _ in features(r.get("description")):
+                    self._index.setdefault(f, Counter())[cat] += 1
+                if r.get("type") in self._kind:
+                    self._kind[r["type"]][cat] += 1
+                self.docs += 1
+                n += 1
+        return n
+
+    def scores(self, description: Optional[str], kind: Optional[str] = None) -> Counter:
+        out: Counter = Counter()
+        with self._lock:
+            allowed = self._kind.get(kind) if kind else None
+            n_cats = max(1, len(set(self._kind["income"]) | set(self._kind["expense"])))
+            for f, w in features(description):
+                hits = self._index.get(f)
+                if not hits:
+                    continue
+                # IDF por categorias: termo presente em todas vale ~0
+                idf = math.log(1 + n_cats / len(hits))
+                total = sum(hits.values())
+                for cat, c in hits.items():
+                    if allowed is None or cat in allowed:
+                        out[cat] += w * idf * c / total
+        return out
+
+    def suggest(self, description: Optional[str], kind: Optional[str] = None) -> Tuple[Optional[str], float]:
+        """(category_id, confiança 0..1) ou (None, 0.0) quando nada bate."""
+        sc = self.scores(description, kind)
+        if not sc:
+            return None, 0.0
+        cat, best = max(sc.items(), key=lambda kv: (kv[1], str(kv[0])))
+        return cat, round(best / sum(sc.values()), 3)
+
+    def suggest_many(self, descriptions: Iterable[Optional[str]],
+                     kinds: Optional[Iterable[Optional[str]]] = None) -> List[Tuple[Optional[str], float]]:
+        """Classifica em lote; descrições repetidas (comum em extratos) são calculadas uma vez."""
+        descriptions = list(descriptions)
+        kinds = list(kinds) if kinds is not None else [None] * len(descriptions)
+        memo: Dict[tuple, Tuple[Optional[str], float]] = {}
+        out = []
+        for d, k in zip(descriptions, kinds):
+            key = (_fold(d).strip(), k)
+            if key not in memo:
+                memo[key] = self.suggest(d, k)
+            out.append(memo[key])
+        return out
+
+
+# =========================
+# Modelo por household (processo)
+# =========================
+_MODELS: Dict[str, Categorizer] = {}
+_MODELS_LOCK = threading.Lock()
+_COLUMNS = "id,description,category_id,type"
+
+
+def model_for(sb, HOUSEHOLD_ID) -> Categorizer:
+    """Modelo do household: monta na primeira vez, depois só o catch-up incremental."""
+    with _MODELS_LOCK:
+        m = _MODELS.get(HOUSEHOLD_ID)
+        fresh = m is None
+        if fresh:
+            m = _MODELS[HOUSEHOLD_ID] = Categorizer()
+    if fresh or time.time() - m.refreshed_at > REFRESH_SECONDS:
+        # marca antes de buscar: sessões concorrentes não disparam o mesmo catch-up
+        m.refreshed_at = time.time()
+        start = None if fresh else date.today() - timedelta(days=CATCH_UP_DAYS)
+        with perf.section("categorizer.build" if fresh else "categorizer.catch_up"):
+            try:
+                for batch in iter_tx_batches(sb, HOUSEHOLD_ID, start, None, columns=_COLUMNS):
+                    m.learn(batch)
+            except Exception:
+                if fresh:
+                    # montagem parcial: descarta, e o próximo uso monta o histórico inteiro de novo
+                    with _MODELS_LOCK:
+                        if _MODELS.get(HOUSEHOLD_ID) is m:
+                            del _MODELS[HOUSEHOLD_ID]
+                else:
+                    m.refreshed_at = 0.0  # tenta o catch-up de novo no próximo uso
+    return m
+
+
+def learn(HOUSEHOLD_ID, rows: Iterable[dict]):
+    """Gravações do app alimentam o modelo já carregado (sem consulta)."""
+    m = _MODELS.get(HOUSEHOLD_ID)
+    if m is not None:
+        m.learn(rows)
+
+
+def suggest(sb, HOUSEHOLD_ID, description: Optional[str], kind: Optional[str] = None) -> Tuple[Optional[str], float]:
+    return model_for(sb, HOUSEHOLD_ID).suggest(description, kind)
@@ -0,0 +1,289 @@
+# changefeed.py
+"""
+Feed de mudanças por household: mantém o cache compartilhado entre sessões
+atualizado e empurra os dados novos para todas as sessões abertas do household.
+
+Fontes (uma por household e processo):
+  * produção: Supabase Realtime (postgres_changes filtrado por household_id,
+    migração 004), num thread com loop asyncio próprio;
+  * testes/local: FakeSupabase.on_change, mesmo formato de payload.
+
+Cada evento passa por publish():
+  * UPDATE de transação que não muda intervalo, filtro nem ordem (pagamento,
+    anexo...) vira patch sobre as entradas cacheadas (utils.patch_cached_transactions);
+  * o resto marca a tabela do household como mudada (utils.mark_changed): só as
+    entradas daquele household buscadas antes disso são rebuscadas;
+  * as sessões do household recebem um rerun (agrupado em FF_FEED_DEBOUNCE_MS),
+    sem polling.
+
+As páginas chamam watch(sb, HOUSEHOLD_ID) depois do login; gravações do próprio
+app chamam changed(HOUSEHOLD_ID, tabela, linhas) para não depender do atraso do
+feed — e o eco dessas linhas no feed é descartado (já foi aplicado), em qualquer
+ordem de chegada. A fonte Realtime de um household fecha quando a última sessão
+dele termina; a próxima watch() abre outra.
+
+Sem Realtime (SDK sem suporte, FF_REALTIME=0) o app continua com o TTL de 600 s
+e as marcações das gravações locais.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Set, Tuple
+import logging
+import os
+import threading
+import time
+
+import utils
+
+log = logging.getLogger(__name__)
+
+# Tabelas com household_id acompanhadas pelo feed
+TABLES = ("transactions", "members", "categories", "accounts", "credit_cards", "budgets")
+DEBOUNCE = float(os.environ.get("FF_FEED_DEBOUNCE_MS", "300")) / 1000.0
+ECHO_WINDOW = 30.0  # segundos em que uma gravação local e o eco dela no feed se anulam
+# Mudou um destes campos: a linha pode ter entrado/saído de um intervalo ou filtro, ou mudado de
+# posição. is_paid (pagamento, o caso comum) segue como patch: as entradas filtradas por ele
+# rebuscam no próprio _live (filters=...).
+_RANGE_FIELDS = ("household_id", "occurred_at", "due_date", "type", "amount", "planned_amount", "description",
+                 "category_id", "member_id", "account_id")
+
+_LOCK = threading.Lock()
+_SESSIONS: Dict[str, Set[str]] = {}        # household -> session ids
+_SOURCES: Dict[object, object] = {}        # household (Realtime) ou id(cliente fake) -> fonte
+_TIMERS: Dict[str, threading.Timer] = {}
+# (household, tabela, id) -> instante: linhas gravadas por este processo (_OWN) e
+# linhas já recebidas do feed (_ECHOED); quem chega depois é o eco e é descartado
+_OWN: Dict[Tuple[str, str, str], float] = {}
+_ECHOED: Dict[Tuple[str, str, str], float] = {}
+_STATS = {"events": 0, "patched": 0, "invalidated": 0, "reruns": 0, "echoes": 0}
+
+
+# =========================
+# Entrada dos eventos
+# =========================
+def publish(HOUSEHOLD_ID, table: str, op: str = "*", record: Optional[dict] = None,
+            old: Optional[dict] = None, origin: Optional[str] = None):
+    """Aplica uma mudança ao cache do household e agenda o rerun das sessões (menos `origin`)."""
+    if not HOUSEHOLD_ID:
+        return
+    with _LOCK:
+        _STATS["events"] += 1
+    if table == "transactions" and op == "UPDATE" and record and old \
+            and all(k in old and old.get(k) == record.get(k) for k in _RANGE_FIELDS):
+        utils.patch_cached_transactions(HOUSEHOLD_ID, [record])
+        with _LOCK:
+            _STATS["patched"] += 1
+    else:
+        utils.mark_changed(HOUSEHOLD_ID, table)
+        with _LOCK:
+            _STATS["invalidated"] += 1
+    if table == "transactions" and op == "INSERT" and record:
+        import categorizer
+        categorizer.learn(HOUSEHOLD_ID, [record])
+    _schedule_rerun(HOUSEHOLD_ID, origin)
+
+
+def _match(seen: Dict[Tuple[str, str, str], float], other: Dict[Tuple[str, str, str], float],
+           keys: Iterable[Tuple[str, str, str]]) -> bool:
+    """
+    True se todas as `keys` já estão em `other` (consome-as: o evento é eco);
+    senão anota-as em `seen`. Chamar com _LOCK.
+    """
+    now = time.monotonic()
+    for d in (seen, other):
+        for k in [k for k, t in d.items() if now - t > ECHO_WINDOW]:
+            del d[k]
+    keys = list(keys)
+    if keys and all(k in other for k in keys):
+        for k in keys:
+            del other[k]
+        _STATS["echoes"] += 1
+        return True
+    seen.update((k, now) for k in keys)
+    return False
+
+
+def _on_payload(payload: dict):
+    """Payload de postgres_changes (Realtime ou fake) -> publish()."""
+    d = payload.get("data", payload) if isinstance(payload, dict) else {}
+    table = d.get("table")
+    op = (d.get("type") or d.get("eventType") or "*").upper()
+    record = d.get("record") or d.get("new") or None
+    old = d.get("old_record") or d.get("old") or None
+    hh = (record or {}).get("household_id") or (old or {}).get("household_id")
+    if table not in TABLES or not hh:
+        return
+    rid = (record or {}).get("id") or (old or {}).get("id")
+    with _LOCK:
+        if rid is not None and _match(_ECHOED, _OWN, [(str(hh), table, str(rid))]):
+            return  # gravação desta instância: changed() já aplicou
+    publish(hh, table, op, record, old)
+
+
+# =========================
+# Sessões
+# =========================
+def _current_session() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx else None
+
+
+def watch(sb, HOUSEHOLD_ID):
+    """Inscreve a sessão atual no household e garante a fonte do feed."""
+    sid = _current_session()
+    if sid:
+        with _LOCK:
+            _SESSIONS.setdefault(HOUSEHOLD_ID, set()).add(sid)
+    _ensure_source(sb, HOUSEHOLD_ID)
+
+
+def changed(HOUSEHOLD_ID, table: str = "transactions", rows: Optional[Iterable[dict]] = None):
+    """
+    Gravação feita por esta sessão: invalida já e avisa as outras sessões do
+    household. `rows` (as linhas devolvidas pela gravação) permite descartar o
+    eco delas no feed; se o feed chegou primeiro, a invalidação já foi feita.
+    """
+    keys = [(str(HOUSEHOLD_ID), table, str(r["id"])) for r in rows or () if r.get("id") is not None]
+    with _LOCK:
+        if _match(_OWN, _ECHOED, keys):
+            return
+    publish(HOUSEHOLD_ID, table, origin=_current_session())
+
+
+def _schedule_rerun(HOUSEHOLD_ID, origin: Optional[str]):
+    with _LOCK:
+        if not _SESSIONS.get(HOUSEHOLD_ID):
+            return
+        if HOUSEHOLD_ID in _TIMERS:
+            return  # rajada: o rerun já agendado leva tudo
+        t = threading.Timer(DEBOUNCE, _rerun_sessions, (HOUSEHOLD_ID, origin))
+        t.daemon = True
+        _TIMERS[HOUSEHOLD_ID] = t
+    t.start()
+
+
+def _active_sessions(HOUSEHOLD_ID) -> Optional[dict]:
+    """sid -> info das sessões do household ainda abertas (descarta as encerradas); None sem runtime."""
+    with _LOCK:
+        sids = set(_SESSIONS.get(HOUSEHOLD_ID, ()))
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return None
+        mgr = Runtime.instance()._session_mgr
+    except Exception:
+        return None
+    infos = {sid: mgr.get_active_session_info(sid) for sid in sids}
+    with _LOCK:
+        for sid, info in infos.items():
+            if info is None:
+                _SESSIONS.get(HOUSEHOLD_ID, set()).discard(sid)
+    return {sid: info for sid, info in infos.items() if info is not None}
+
+
+def _rerun_sessions(HOUSEHOLD_ID, origin: Optional[str]):
+    with _LOCK:
+        _TIMERS.pop(HOUSEHOLD_ID, None)
+    for sid, info in (_active_sessions(HOUSEHOLD_ID) or {}).items():
+        if sid == origin:
+            continue
+        info.session.request_rerun(None)  # mesmo caminho do runOnSave: mantém o estado dos widgets
+        with _LOCK:
+            _STATS["reruns"] += 1
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return {**_STATS, "sessions": sum(len(s) for s in _SESSIONS.values()), "sources": len(_SOURCES)}
+
+
+# =========================
+# Fontes
+# =========================
+def _ensure_source(sb, HOUSEHOLD_ID):
+    inner = getattr(sb, "_inner", sb)  # perf.TracingClient
+    if hasattr(inner, "on_change"):
+        key = id(inner)
+        with _LOCK:
+            if key in _SOURCES:
+                return
+            _SOURCES[key] = inner.on_change(_on_payload)
+        return
+    if os.environ.get("FF_REALTIME", "1") == "0":
+        return
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        return
+    with _LOCK:
+        src = _SOURCES.get(HOUSEHOLD_ID)
+        if src is None:
+            src = _SOURCES[HOUSEHOLD_ID] = RealtimeSource(url, key, HOUSEHOLD_ID)
+            src.start()
+    try:
+        sess = sb.auth.get_session()
+        src.set_token(getattr(sess, "access_token", None))
+    except Exception:
+        pass
+
+
+class RealtimeSource(threading.Thread):
+    """Canal Realtime de um household (postgres_changes das TABLES, filtrado por household_id)."""
+
+    def __init__(self, url: str, key: str, HOUSEHOLD_ID):
+        super().__init__(name=f"ff-realtime-{HOUSEHOLD_ID}", daemon=True)
+        self.url, self.key, self.household = url, key, HOUSEHOLD_ID
+        self._token: Optional[str] = None
+
+    def set_token(self, token: Optional[str]):
+        """JWT do usuário: o Realtime aplica as policies de RLS com ele."""
+        if token:
+            self._token = token
+
+    def run(self):
+        import asyncio
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            log.warning("changefeed: Realtime indisponível para %s: %s", self.household, e)
+            with _LOCK:
+                if _SOURCES.get(self.household) is self:
+                    _SOURCES.pop(self.household)  # próxima watch() tenta de novo
+
+    def _idle(self) -> bool:
+        """Sem sessões abertas no household: sai de _SOURCES (a próxima watch() cria outra fonte)."""
+        if _active_sessions(self.household) is None:
+            return False
+        with _LOCK:
+            if _SESSIONS.get(self.household):
+                return False
+            if _SOURCES.get(self.household) is self:
+                _SOURCES.pop(self.household)
+            return True
+
+    async def _main(self):
+        import asyncio
+        from supabase import acreate_client
+
+        client = await acreate_client(self.url, self.key)
+        while self._token is None:
+            await asyncio.sleep(0.5)
+        applied = self._token
+        await client.realtime.set_auth(applied)
+        channel = client.channel(f"ff-household-{self.household}")
+        for table in TABLES:
+            channel.on_postgres_changes("*", schema="public", table=table,
+                                        filter=f"household_id=eq.{self.household}", callback=_on_payload)
+        await channel.subscribe()
+        try:
+            while not self._idle():
+                # token renovado (sessão nova do usuário): repassa aos canais já abertos
+                await asyncio.sleep(5)
+                if self._token != applied:
+                    applied = self._token
+                    await client.realtime.set_auth(applied)
+        finally:
+            await client.remove_all_channels()
+        log.info("changefeed: Realtime de %s fechado (sem sessões)", self.household)
@@ -0,0 +1,133 @@
+# charts.py
+"""
+Cache de figuras Plotly por impressão digital dos dados agregados.
+
+Montar uma figura com plotly.express custa dezenas de ms por gráfico e os
+reruns (clique na sidebar, troca de aba) refazem tudo com os mesmos dados.
+Aqui a figura é montada uma vez e o mesmo objeto go.Figure é reaproveitado
+enquanto o hash dos DataFrames agregados + parâmetros não mudar: o
+st.plotly_chart aceita a figura já validada e só a serializa (um dict, ao
+contrário, seria revalidado campo a campo a cada rerun). O cache é do
+processo, limitado em entradas e bytes (LRU, tamanho do JSON), compartilhado
+entre sessões — a figura devolvida é somente leitura (não chame update_*).
+
+    fig = charts.figure("home.pizza", df, lambda: px.pie(df, ...))
+    st.plotly_chart(fig, use_container_width=True)
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import hashlib
+import os
+import threading
+import time
+
+import perf
+
+MAX_ENTRIES = int(os.environ.get("FF_FIGURE_CACHE_SIZE", "128"))
+MAX_BYTES = int(float(os.environ.get("FF_FIGURE_CACHE_MB", "16")) * 1024 * 1024)
+
+_CACHE: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()  # chave -> (figura, bytes)
+_BYTES = 0
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _feed(h, obj: Any):
+    """Alimenta o hash com DataFrames/Series (por conteúdo) ou qualquer repr estável."""
+    import pandas as pd
+
+    if isinstance(obj, pd.Series):
+        obj = obj.to_frame()
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr([(str(c), str(d)) for c, d in obj.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for v in obj:
+            _feed(h, v)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*parts: Any) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        _feed(h, p)
+    return h.hexdigest()
+
+
+def _store(key: str, fig: Any, nbytes: int):
+    global _BYTES
+    if nbytes > MAX_BYTES:
+        return
+    with _LOCK:
+        if key in _CACHE:
+            _BYTES -= _CACHE.pop(key)[1]
+        _CACHE[key] = (fig, nbytes)
+        _BYTES += nbytes
+        while _CACHE and (len(_CACHE) > MAX_ENTRIES or _BYTES > MAX_BYTES):
+            _, (_, old) = _CACHE.popitem(last=False)
+            _BYTES -= old
+            _STATS["evictions"] += 1
+
+
+def figure(name: str, data: Any, build: Callable[[], Any], **params):
+    """
+    Devolve a figura (go.Figure pronta para st.plotly_chart) para `data`.
+    `build` só é chamado quando não há figura para a impressão digital de
+    (name, data, params); `params` deve conter o que muda a aparência.
+    A figura é compartilhada: não a altere depois de devolvida.
+    """
+    t0 = time.perf_counter()
+    key = fingerprint(name, data, params)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            _STATS["hits"] += 1
+    cache = "hit"
+    if hit is None:
+        import plotly.io as pio
+
+        cache = "miss"
+        fig = build()
+        hit = (fig, len(pio.to_json(fig, validate=False)))
+        _store(key, *hit)
+        with _LOCK:
+            _STATS["misses"] += 1
+    perf.record("figure", name, time.perf_counter() - t0, nbytes=hit[1], cache=cache)
+    return hit[0]
+
+
+def bar(name: str, df, x: str, y: str, **kwargs):
+    """px.bar via cache (substitui st.bar_chart nos relatórios)."""
+    def build():
+        import plotly.express as px
+        return px.bar(df, x=x, y=y, **kwargs)
+    return figure(name, df, build, kind="bar", x=x, y=y, **kwargs)
+
+
+def line(name: str, df, x: str, y: str, **kwargs):
+    """px.line via cache (fluxo de caixa)."""
+    def build():
+        import plotly.express as px
+        return px.line(df, x=x, y=y, **kwargs)
+    return figure(name, df, build, kind="line", x=x, y=y, **kwargs)
+
+
+def stats() -> Dict[str, int]:
+    with _LOCK:
+        return {**_STATS, "entries": len(_CACHE), "bytes": _BYTES}
+
+
+def clear():
+    global _BYTES
+    with _LOCK:
+        _CACHE.clear()
+        _BYTES = 0
@@ -0,0 +1,263 @@
+# datacache.py
+"""
+Cache dos fetchers com orçamento de memória (substitui st.cache_data em utils).
+
+st.cache_data só tinha TTL: cada (household, início, fim) escolhido nos
+date_inputs virava uma entrada nova e a memória do worker crescia o dia todo.
+Aqui cada entrada é guardada serializada (pickle, como o st.cache_data — quem
+recebe ganha uma cópia) e o tamanho em bytes é contado:
+
+  * orçamento global FF_DATA_CACHE_MB (padrão 128);
+  * cota por household FF_DATA_CACHE_HOUSEHOLD_SHARE (fração do orçamento,
+    padrão 0.25): passou da cota, o household despeja as próprias entradas —
+    explorar períodos não empurra para fora os dados quentes dos outros;
+  * despejo SLRU (LRU com proteção por frequência): entrada nova fica em
+    "probation"; lida de novo, vai para "protected". O despejo começa pelas
+    menos recentes de probation, então consultas de uma vez só (varreduras de
+    datas) saem antes do que é lido a cada rerun;
+  * TTL por fetcher; chamadas concorrentes da mesma chave esperam uma única busca.
+
+    @perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+    def fetch_x(sb, HOUSEHOLD_ID, ...): ...
+
+    fetch_x.clear(sb, HOUSEHOLD_ID, ...)   # só esta entrada; sem argumentos, todas do fetcher
+    datacache.stats()                      # hits/misses/despejos/bytes por fetcher
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+import functools
+import inspect
+import os
+import pickle
+import threading
+import time
+
+MAX_BYTES = int(float(os.environ.get("FF_DATA_CACHE_MB", "128")) * 1024 * 1024)
+HOUSEHOLD_SHARE = float(os.environ.get("FF_DATA_CACHE_HOUSEHOLD_SHARE", "0.25"))
+PROTECTED_SHARE = 0.8  # fração do orçamento que as entradas protegidas podem ocupar
+
+_LOCK = threading.Lock()
+_PROBATION: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_PROTECTED: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_BYTES = {"probation": 0, "protected": 0}
+_HH_BYTES: Dict[Any, int] = {}
+_STATS: Dict[str, Dict[str, int]] = {}
+_INFLIGHT: Dict[tuple, list] = {}  # chave -> [lock, usuários]
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("blob", "size", "household", "fetcher", "expires", "hits")
+
+    def __init__(self, blob: bytes, household, fetcher: str, expires: float):
+        self.blob, self.size = blob, len(blob)
+        self.household, self.fetcher, self.expires = household, fetcher, expires
+        self.hits = 0
+
+
+def _stat(fetcher: str) -> Dict[str, int]:
+    return _STATS.setdefault(fetcher, {"hits": 0, "misses": 0, "evictions": 0, "expired": 0,
+                                       "rejected": 0, "entries": 0, "bytes": 0})
+
+
+# =========================
+# Estrutura (chamadas com _LOCK)
+# =========================
+def _unlink(key: tuple, reason: Optional[str] = None) -> Optional[_Entry]:
+    for seg, od in (("probation", _PROBATION), ("protected", _PROTECTED)):
+        e = od.pop(key, None)
+        if e is not None:
+            _BYTES[seg] -= e.size
+            _HH_BYTES[e.household] = _HH_BYTES.get(e.household, 0) - e.size
+            if _HH_BYTES[e.household] <= 0:
+                _HH_BYTES.pop(e.household, None)
+            s = _stat(e.fetcher)
+            s["entries"] -= 1
+            s["bytes"] -= e.size
+            if reason:
+                s[reason] += 1
+            return e
+    return None
+
+
+def _evict_from(od: "OrderedDict[tuple, _Entry]", household=_MISSING) -> bool:
+    """Despeja a entrada menos recente de `od` (só do household, se dado)."""
+    for key, e in od.items():
+        if household is _MISSING or e.household == household:
+            _unlink(key, "evictions")
+            return True
+    return False
+
+
+def _purge_expired(now: float):
+    for od in (_PROBATION, _PROTECTED):
+        for key in [k for k, e in od.items() if e.expires <= now]:
+            _unlink(key, "expired")
+
+
+def _make_room(household, quota: int):
+    # 1) a cota do household: despeja as dele, probation primeiro
+    while _HH_BYTES.get(household, 0) > quota:
+        if not (_evict_from(_PROBATION, household) or _evict_from(_PROTECTED, household)):
+            break
+    # 2) protegidas demais: a mais antiga volta para probation
+    while _PROTECTED and _BYTES["protected"] > MAX_BYTES * PROTECTED_SHARE:
+        key, e = _PROTECTED.popitem(last=False)
+        _BYTES["protected"] -= e.size
+        _PROBATION[key] = e
+        _BYTES["probation"] += e.size
+    # 3) orçamento global
+    if _BYTES["probation"] + _BYTES["protected"] > MAX_BYTES:
+        _purge_expired(time.time())
+    while _BYTES["probation"] + _BYTES["protected"] > MAX_BYTES:
+        if not (_evict_from(_PROBATION) or _evict_from(_PROTECTED)):
+            break
+
+
+def _get(key: tuple, fetcher: str):
+    with _LOCK:
+        e = _PROBATION.get(key)
+        seg = "probation"
+        if e is None:
+            e, seg = _PROTECTED.get(key), "protected"
+        if e is None:
+            return _MISSING
+        if e.expires <= time.time():
+            _unlink(key, "expired")
+            return _MISSING
+        e.hits += 1
+        if seg == "probation":
+            # segunda leitura: promove
+            del _PROBATION[key]
+            _BYTES["probation"] -= e.size
+            _PROTECTED[key] = e
+            _BYTES["protected"] += e.size
+        else:
+            _PROTECTED.move_to_end(key)
+        _stat(fetcher)["hits"] += 1
+        blob = e.blob
+    return pickle.loads(blob)
+
+
+def _put(key: tuple, fetcher: str, household, value: Any, ttl: Optional[float]):
+    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    quota = int(MAX_BYTES * HOUSEHOLD_SHARE) if household is not None else MAX_BYTES
+    with _LOCK:
+        _unlink(key)
+        if len(blob) > quota:
+            _stat(fetcher)["rejected"] += 1  # maior que a cota: serve sem guardar
+            return
+        e = _Entry(blob, household, fetcher, time.time() + ttl if ttl else float("inf"))
+        _PROBATION[key] = e
+        _BYTES["probation"] += e.size
+        _HH_BYTES[household] = _HH_BYTES.get(household, 0) + e.size
+        s = _stat(fetcher)
+        s["entries"] += 1
+        s["bytes"] += e.size
+        _make_room(household, quota)
+
+
+# =========================
+# Decorator
+# =========================
+def _type_name(v) -> str:
+    t = type(v)
+    return f"{t.__module__}.{t.__qualname__}"
+
+
+def _norm(v, hash_funcs: Dict[str, Callable]):
+    f = hash_funcs.get(_type_name(v))
+    if f is not None:
+        return f(v)
+    try:
+        hash(v)
+        return v
+    except TypeError:
+        return repr(v)
+
+
+def cached(ttl: Optional[float] = None, hash_funcs: Optional[Dict[str, Callable]] = None,
+           household_arg: str = "HOUSEHOLD_ID") -> Callable:
+    """Decorator no formato do st.cache_data(ttl=..., hash_funcs=...), com orçamento de memória."""
+    hash_funcs = hash_funcs or {}
+
+    def deco(fn):
+        name = fn.__name__
+        sig = inspect.signature(fn)
+
+        def key_of(args, kwargs):
+            b = sig.bind(*args, **kwargs)
+            b.apply_defaults()
+            key = (name,) + tuple((k, _norm(v, hash_funcs)) for k, v in b.arguments.items())
+            return key, b.arguments.get(household_arg)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key, household = key_of(args, kwargs)
+            value = _get(key, name)
+            if value is not _MISSING:
+                return value
+            with _LOCK:
+                entry = _INFLIGHT.setdefault(key, [threading.Lock(), 0])
+                entry[1] += 1  # quem está usando este lock (buscando ou esperando)
+            try:
+                with entry[0]:
+                    # outra thread pode ter buscado enquanto esta esperava
+                    value = _get(key, name)
+                    if value is _MISSING:
+                        with _LOCK:
+                            _stat(name)["misses"] += 1
+                        value = fn(*args, **kwargs)
+                        _put(key, name, household, value, ttl)
+            finally:
+                # mesmo se fn() falhar; só o último a sair remove (ninguém mais pega outro lock)
+                with _LOCK:
+                    entry[1] -= 1
+                    if entry[1] == 0 and _INFLIGHT.get(key) is entry:
+                        del _INFLIGHT[key]
+            return value
+
+        def clear(*args, **kwargs):
+            with _LOCK:
+                if args or kwargs:
+                    _unlink(key_of(args, kwargs)[0])
+                    return
+                for od in (_PROBATION, _PROTECTED):
+                    for key in [k for k in od if k[0] == name]:
+                        _unlink(key)
+
+        wrapper.clear = clear
+        return wrapper
+    return deco
+
+
+# =========================
+# Estatísticas / manutenção
+# =========================
+def stats() -> Dict[str, Dict[str, int]]:
+    """Por fetcher + "_total" (bytes, entradas, households, orçamento)."""
+    with _LOCK:
+        out = {k: dict(v) for k, v in _STATS.items()}
+        out["_total"] = {
+            "bytes": _BYTES["probation"] + _BYTES["protected"],
+            "protected_bytes": _BYTES["protected"],
+            "entries": len(_PROBATION) + len(_PROTECTED),
+            "households": len(_HH_BYTES),
+            "max_bytes": MAX_BYTES,
+            **{k: sum(s[k] for s in _STATS.values()) for k in ("hits", "misses", "evictions", "expired", "rejected")},
+        }
+    return out
+
+
+def household_bytes() -> Dict[Any, int]:
+    with _LOCK:
+        return dict(_HH_BYTES)
+
+
+def clear():
+    """Esvazia tudo (equivalente ao st.cache_data.clear() para estes fetchers)."""
+    with _LOCK:
+        for od in (_PROBATION, _PROTECTED):
+            for key in list(od):
+                _unlink(key)
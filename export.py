@@ -0,0 +1,169 @@
+# export.py
+"""
+Exportação de transações em streaming (CSV, XLSX ou Parquet).
+
+As linhas vêm do banco em lotes (utils.iter_tx_batches) e vão direto para o
+writer do formato, então a memória fica constante qualquer que seja o
+intervalo. A mesma API atende o botão de download da página Financeiro e a
+linha de comando (backup de um household):
+
+    python export.py --household <HOUSEHOLD_ID> --format parquet --out backup.parquet
+    python export.py --household <HOUSEHOLD_ID> --format csv --start 2024-01-01 --end 2024-12-31
+"""
+from __future__ import annotations
+from datetime import date
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+
+from utils import iter_tx_batches
+
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+# Colunas do arquivo; ids de categoria/membro/conta saem resolvidos para nomes
+COLUMNS = (
+    "id", "data", "vencimento", "tipo", "descricao", "categoria", "membro", "conta",
+    "previsto", "pago", "valor_pago", "data_pagamento", "forma_pagamento", "boleto",
+)
+
+
+def _lookup(sb, household_id: str, table: str, label: str) -> Dict[str, str]:
+    try:
+        rows = sb.table(table).select(f"id,{label}").eq("household_id", household_id).execute().data or []
+    except Exception:
+        rows = []
+    return {r["id"]: r.get(label) for r in rows}
+
+
+def _rows(sb, household_id: str, start: Optional[date], end: Optional[date],
+          batch_size: int) -> Iterable[List[list]]:
+    """Gera lotes de linhas já no layout de COLUMNS."""
+    cats = _lookup(sb, household_id, "categories", "name")
+    mems = _lookup(sb, household_id, "members", "display_name")
+    accs = _lookup(sb, household_id, "accounts", "name")
+    for batch in iter_tx_batches(sb, household_id, start, end, batch_size):
+        out = []
+        for t in batch:
+            planned = t.get("planned_amount")
+            if planned is None:
+                planned = t.get("amount")
+            out.append([
+                t.get("id"), t.get("occurred_at"), t.get("due_date"),
+                {"income": "Receita", "expense": "Despesa"}.get(t.get("type"), t.get("type")),
+                t.get("description"), cats.get(t.get("category_id")), mems.get(t.get("member_id")),
+                accs.get(t.get("account_id")),
+                float(planned) if planned is not None else None,
+                bool(t.get("is_paid")),
+                float(t["paid_amount"]) if t.get("paid_amount") is not None else None,
+                t.get("paid_at"), t.get("payment_method"), t.get("attachment_url"),
+            ])
+        yield out
+
+
+def _write_csv(batches, out: BinaryIO):
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="", write_through=True)
+    try:
+        w = csv.writer(text, delimiter=";")
+        w.writerow(COLUMNS)
+        n = 0
+        for rows in batches:
+            w.writerows(rows)
+            n += len(rows)
+        text.flush()
+        return n
+    finally:
+        text.detach()  # não fecha o arquivo do chamador
+
+
+def _write_xlsx(batches, out: BinaryIO):
+    import xlsxwriter
+
+    # constant_memory: cada linha é gravada em disco assim que a próxima começa
+    wb = xlsxwriter.Workbook(out, {"constant_memory": True, "strings_to_urls": False})
+    ws = wb.add_worksheet("Transações")
+    money = wb.add_format({"num_format": "#,##0.00"})
+    ws.write_row(0, 0, COLUMNS)
+    n = 0
+    for rows in batches:
+        for r in rows:
+            n += 1
+            for col, v in enumerate(r):
+                if col in (8, 10) and v is not None:
+                    ws.write_number(n, col, v, money)
+                elif v is not None:
+                    ws.write(n, col, v)
+    wb.close()
+    return n
+
+
+def _write_parquet(batches, out: BinaryIO):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (c, pa.float64() if c in ("previsto", "valor_pago") else pa.bool_() if c == "pago" else pa.string())
+        for c in COLUMNS
+    ])
+    n = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for rows in batches:
+            cols = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(list(c), type=f.type) for c, f in zip(cols, schema)], schema=schema))
+            n += len(rows)
+    return n
+
+
+_WRITERS: Dict[str, Callable] = {"csv": _write_csv, "xlsx": _write_xlsx, "parquet": _write_parquet}
+
+
+def export_transactions(sb, household_id: str, fmt: str, out: BinaryIO,
+                        start: Optional[date] = None, end: Optional[date] = None,
+                        batch_size: int = 1000) -> int:
+    """Escreve as transações em `out` (arquivo binário) no formato pedido. Retorna nº de linhas."""
+    if fmt not in _WRITERS:
+        raise ValueError(f"Formato não suportado: {fmt}. Use: {', '.join(_WRITERS)}")
+    return _WRITERS[fmt](_rows(sb, household_id, start, end, batch_size), out)
+
+
+def export_to_tempfile(sb, household_id: str, fmt: str, start: Optional[date] = None,
+                       end: Optional[date] = None) -> str:
+    """Exporta para um arquivo temporário em disco e devolve o caminho."""
+    fd, path = tempfile.mkstemp(prefix="ff_export_", suffix=FORMATS[fmt][1])
+    with os.fdopen(fd, "wb") as f:
+        export_transactions(sb, household_id, fmt, f, start, end)
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Exporta as transações de um household.")
+    ap.add_argument("--household", required=True)
+    ap.add_argument("--format", choices=sorted(_WRITERS), default="csv")
+    ap.add_argument("--out", help="arquivo de saída (padrão: stdout)")
+    ap.add_argument("--start", type=date.fromisoformat)
+    ap.add_argument("--end", type=date.fromisoformat)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    args = ap.parse_args(argv)
+
+    from supabase_client import get_supabase
+    sb = get_supabase()
+    if args.out:
+        with open(args.out, "wb") as f:
+            n = export_transactions(sb, args.household, args.format, f, args.start, args.end, args.batch_size)
+    else:
+        n = export_transactions(sb, args.household, args.format, sys.stdout.buffer, args.start, args.end, args.batch_size)
+        sys.stdout.buffer.flush()
+    print(f"{n} transações exportadas.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
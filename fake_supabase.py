@@ -0,0 +1,916 @@
+# fake_supabase.py
+"""
+Cliente Supabase local (em memória) com a mesma API fluente usada no app:
+table().select().eq().gte().lte().is_().order().limit().execute(), rpc(),
+storage.from_() e auth. Serve para rodar o app e medir performance offline.
+
+Latência por chamada e limite de linhas (como o max-rows do PostgREST) são
+configuráveis, assim como um orçamento de round trips.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+import copy
+import difflib
+import json
+import os
+import threading
+import time
+import unicodedata
+import uuid
+
+# Tabelas conhecidas do schema. Tabelas fora desta lista respondem como o
+# PostgREST quando a relação não existe (erro), o que mantém o comportamento
+# de sondas como `_exists_table` na Administração.
+DEFAULT_TABLES = (
+    "households", "members", "categories", "accounts", "credit_cards",
+    "transactions", "budgets", "pending_invites", "relationships",
+    "account_members", "card_members",
+    "account_balance_checkpoints", "account_balance_dirty",
+)
+VIEWS = ("v_card_limit",)
+
+
+class FakeAPIError(Exception):
+    """Erro equivalente ao APIError do postgrest."""
+
+    def __init__(self, message: str, code: str = "PGRST000"):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Disparado quando o número de round trips passa do orçamento definido."""
+
+
+class FakeResponse:
+    def __init__(self, data, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"FakeResponse(data={self.data!r}, count={self.count!r})"
+
+
+def _norm(v):
+    """Normaliza valores para comparação (datas viram ISO, bool/num mantidos)."""
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    return v
+
+
+def _cmp_key(v):
+    # Ordenação tolerante a tipos mistos; NULL vai para o fim (padrão PostgREST)
+    v = _norm(v)
+    if v is None:
+        return (2, "")
+    if isinstance(v, bool):
+        return (0, int(v))
+    if isinstance(v, (int, float)):
+        return (0, v)
+    return (1, str(v))
+
+
+def _ilike_to_match(pattern: str) -> Callable[[Any], bool]:
+    import re
+    rx = "^" + re.escape(pattern.lower()).replace("%", ".*").replace("_", ".") + "$"
+    comp = re.compile(rx, re.S)
+    return lambda v: v is not None and bool(comp.match(str(v).lower()))
+
+
+class _Query:
+    """Builder de consulta no estilo postgrest-py."""
+
+    def __init__(self, client: "FakeSupabase", name: str):
+        self._c = client
+        self._name = name
+        self._op = "select"
+        self._cols: Optional[List[str]] = None
+        self._count: Optional[str] = None
+        self._filters: List[Callable[[dict], bool]] = []
+        self._order: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+
+    # ---- operações ----
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self._op = "select"
+        cols = [c.strip() for c in (columns or "*").split(",") if c.strip()]
+        self._cols = None if cols == ["*"] or not cols else cols
+        self._count = count
+        return self
+
+    def insert(self, rows, **_):
+        self._op, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, **_):
+        self._op, self._payload, self._on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values: dict, **_):
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self, **_):
+        self._op = "delete"
+        return self
+
+    # ---- filtros ----
+    def _add(self, col, pred):
+        self._filters.append(lambda r: pred(_norm(r.get(col))))
+        return self
+
+    def eq(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v == val)
+
+    def neq(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v is not None and v != val)
+
+    def gt(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v is not None and _cmp_key(v) > _cmp_key(val))
+
+    def gte(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v is not None and _cmp_key(v) >= _cmp_key(val))
+
+    def lt(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v is not None and _cmp_key(v) < _cmp_key(val))
+
+    def lte(self, col, val):
+        val = _norm(val)
+        return self._add(col, lambda v: v is not None and _cmp_key(v) <= _cmp_key(val))
+
+    def is_(self, col, val):
+        if val in (None, "null"):
+            return self._add(col, lambda v: v is None)
+        want = {"true": True, "false": False}.get(str(val).lower(), val)
+        return self._add(col, lambda v: v is want)
+
+    def in_(self, col, values):
+        vals = {_norm(v) for v in values}
+        return self._add(col, lambda v: v in vals)
+
+    def ilike(self, col, pattern):
+        m = _ilike_to_match(pattern)
+        return self._add(col, m)
+
+    def like(self, col, pattern):
+        return self.ilike(col, pattern)
+
+    # ---- modificadores ----
+    def order(self, col, desc: bool = False, **_):
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, n: int, **_):
+        self._limit = int(n)
+        return self
+
+    def range(self, start: int, end: int, **_):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ---- execução ----
+    def execute(self) -> FakeResponse:
+        return self._c._round_trip(f"{self._op}:{self._name}", self._run)
+
+    def _run(self) -> FakeResponse:
+        c = self._c
+        if self._name in VIEWS:
+            if self._op != "select":
+                raise FakeAPIError(f'cannot modify view "{self._name}"')
+            rows = c._view(self._name)
+        else:
+            rows = c._table(self._name)
+
+        if self._op == "insert":
+            return FakeResponse(c._insert(self._name, self._payload))
+        if self._op == "upsert":
+            return FakeResponse(c._upsert(self._name, self._payload, self._on_conflict))
+
+        matched = [r for r in rows if all(f(r) for f in self._filters)]
+
+        if self._op == "update":
+            for r in matched:
+                old = copy.deepcopy(r)
+                r.update({k: _norm(v) for k, v in self._payload.items()})
+                c._emit(self._name, "UPDATE", r, old)
+            return FakeResponse(copy.deepcopy(matched))
+        if self._op == "delete":
+            ids = {id(r) for r in matched}
+            rows[:] = [r for r in rows if id(r) not in ids]
+            for r in matched:
+                c._emit(self._name, "DELETE", None, r)
+            return FakeResponse(copy.deepcopy(matched))
+
+        # select
+        for col, desc in reversed(self._order):
+            # NULLs ficam no fim em ambas as direções (como nullslast)
+            nn = [r for r in matched if r.get(col) is not None]
+            nl = [r for r in matched if r.get(col) is None]
+            nn.sort(key=lambda r: _cmp_key(r.get(col)), reverse=desc)
+            matched = nn + nl
+        total = len(matched)
+        lim = self._limit
+        if c.row_cap is not None:
+            lim = c.row_cap if lim is None else min(lim, c.row_cap)
+        page = matched[self._offset:] if lim is None else matched[self._offset:self._offset + lim]
+        if self._cols is not None:
+            page = [{k: r.get(k) for k in self._cols} for r in page]
+        return FakeResponse(copy.deepcopy(page), total if self._count else None)
+
+
+class _RpcCall:
+    def __init__(self, client: "FakeSupabase", name: str, params: Optional[dict]):
+        self._c, self._name, self._params = client, name, params or {}
+
+    def execute(self) -> FakeResponse:
+        def _run():
+            fn = self._c._rpcs.get(self._name)
+            if fn is None:
+                raise FakeAPIError(f"function {self._name} does not exist", "PGRST202")
+            return FakeResponse(fn(self._c, **self._params))
+        return self._c._round_trip(f"rpc:{self._name}", _run)
+
+
+class _Bucket:
+    def __init__(self, client: "FakeSupabase", bucket: str):
+        self._c, self._bucket = client, bucket
+
+    def _files(self) -> Dict[str, bytes]:
+        if self._bucket not in self._c.buckets:
+            raise FakeAPIError(f"Bucket not found: {self._bucket}")
+        return self._c.buckets[self._bucket]
+
+    def upload(self, path: str, content: bytes, file_options: Optional[dict] = None):
+        def _run():
+            files = self._files()
+            upsert = str((file_options or {}).get("upsert", "false")).lower() == "true"
+            if path in files and not upsert:
+                raise FakeAPIError("The resource already exists", "Duplicate")
+            files[path] = bytes(content)
+            return SimpleNamespace(path=path, full_path=f"{self._bucket}/{path}")
+        return self._c._round_trip(f"storage.upload:{self._bucket}", _run)
+
+    def download(self, path: str) -> bytes:
+        def _run():
+            files = self._files()
+            if path not in files:
+                raise FakeAPIError("Object not found")
+            return files[path]
+        return self._c._round_trip(f"storage.download:{self._bucket}", _run)
+
+    def list(self, path: str = "", *_, **__):
+        def _run():
+            prefix = path.rstrip("/") + "/" if path else ""
+            return [{"name": k[len(prefix):]} for k in self._files() if k.startswith(prefix)]
+        return self._c._round_trip(f"storage.list:{self._bucket}", _run)
+
+    def get_public_url(self, path: str) -> str:
+        # URL pública é montada localmente no SDK real (sem round trip)
+        return f"{self._c.url}/storage/v1/object/public/{self._bucket}/{path}"
+
+    def create_signed_url(self, path: str, expires_in: int, *_, **__):
+        def _run():
+            if path not in self._files():
+                raise FakeAPIError("Object not found")
+            url = f"{self._c.url}/storage/v1/object/sign/{self._bucket}/{path}?token=fake&expires={int(expires_in)}"
+            return {"signedURL": url, "signedUrl": url}
+        return self._c._round_trip(f"storage.sign:{self._bucket}", _run)
+
+
+class _Storage:
+    def __init__(self, client: "FakeSupabase"):
+        self._c = client
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self._c, bucket)
+
+
+class _Auth:
+    """Auth mínimo: qualquer e-mail/senha (>= 6) entra; sessão única por cliente."""
+
+    def __init__(self, client: "FakeSupabase"):
+        self._c = client
+        self._users: Dict[str, SimpleNamespace] = {}
+        self._session = None
+
+    def sign_up(self, credentials: dict):
+        email = credentials["email"]
+        user = self._users.get(email) or SimpleNamespace(id=str(uuid.uuid4()), email=email)
+        self._users[email] = user
+        return SimpleNamespace(user=user, session=None)
+
+    def sign_in_with_password(self, credentials: dict):
+        email = credentials["email"]
+        if len(credentials.get("password") or "") < 6:
+            raise FakeAPIError("Invalid login credentials")
+        user = self._users.get(email) or self.sign_up(credentials).user
+        self._session = SimpleNamespace(user=user, access_token="fake")
+        self._c.current_user = user
+        return SimpleNamespace(user=user, session=self._session)
+
+    def sign_out(self):
+        self._session = None
+        self._c.current_user = None
+
+    def get_session(self):
+        return self._session
+
+    def get_user(self):
+        return SimpleNamespace(user=self._session.user) if self._session else None
+
+
+# =========================
+# RPCs padrão (espelham as funções do banco)
+# =========================
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    y, m = d.year + y, m + 1
+    nxt = date(y + (m == 12), (m % 12) + 1, 1)
+    return date(y, m, min(d.day, (nxt - timedelta(days=1)).day))
+
+
+def _rpc_create_installments(c, p_household, p_member, p_account, p_category, p_desc,
+                             p_total, p_n, p_first_due, p_payment_method=None, p_card_id=None, p_currency=None):
+    n = int(p_n)
+    cents = int(round(float(p_total) * 100))
+    base, rest = divmod(cents, n)
+    first = date.fromisoformat(str(p_first_due)[:10])
+    rows = []
+    for i in range(n):
+        v = (base + (1 if i < rest else 0)) / 100
+        d = _add_months(first, i).isoformat()
+        rows.append({
+            "household_id": p_household, "member_id": p_member, "account_id": p_account,
+            "category_id": p_category, "type": "expense", "amount": v, "planned_amount": v,
+            "occurred_at": d, "due_date": d, "description": f"{p_desc} ({i + 1}/{n})",
+            "payment_method": p_payment_method, "card_id": p_card_id,
+            "created_by": getattr(c.current_user, "id", None),
+            **({"currency": p_currency} if p_currency else {}),
+        })
+    return c._insert("transactions", rows)
+
+
+def _rpc_mark_transaction_paid(c, p_tx_id, p_amount, p_date):
+    for r in c._table("transactions"):
+        if r.get("id") == p_tx_id:
+            old = copy.deepcopy(r)
+            r.update({"is_paid": True, "paid_amount": float(p_amount), "paid_at": _norm(p_date)})
+            c._emit("transactions", "UPDATE", r, old)
+            return [copy.deepcopy(r)]
+    raise FakeAPIError("transaction not found")
+
+
+def _rpc_mark_transactions_paid(c, p_items):
+    por_id = {it["id"]: it for it in (p_items or [])}
+    hoje = date.today().isoformat()
+    out = []
+    for r in c._table("transactions"):
+        it = por_id.get(r.get("id"))
+        if it is None:
+            continue
+        amount = it.get("amount")
+        if amount is None:
+            amount = r.get("planned_amount") if r.get("planned_amount") is not None else r.get("amount")
+        old = copy.deepcopy(r)
+        r.update({"is_paid": True, "paid_amount": float(amount or 0.0), "paid_at": _norm(it.get("paid_at")) or hoje})
+        c._emit("transactions", "UPDATE", r, old)
+        out.append({k: r[k] for k in ("id", "is_paid", "paid_amount", "paid_at")})
+    return out
+
+
+def _rpc_upsert_budget(c, p_household, p_month, p_category, p_amount):
+    return c._upsert("budgets", {
+        "household_id": p_household, "month": p_month,
+        "category_id": p_category, "amount": float(p_amount),
+    }, "household_id,month,category_id")
+
+
+def _rpc_create_household_and_member(c, display_name="Você"):
+    user = c.current_user
+    hh = c._insert("households", {"name": "Minha família"})[0]
+    mem = c._insert("members", {
+        "household_id": hh["id"], "user_id": getattr(user, "id", None),
+        "display_name": display_name, "role": "owner",
+    })[0]
+    return [{"household_id": hh["id"], "member_id": mem["id"]}]
+
+
+def _rpc_create_invite_link(c, p_household_id, p_email=None, p_display_name=None,
+                            p_expires_in_days=7, p_app_url=""):
+    tok = uuid.uuid4().hex
+    exp = (datetime.utcnow() + timedelta(days=int(p_expires_in_days))).isoformat()
+    c._insert("pending_invites", {
+        "household_id": p_household_id, "email": p_email, "display_name": p_display_name,
+        "token": tok, "status": "pending", "expires_at": exp,
+    })
+    return [{"url": f"{p_app_url}/?join={tok}", "token": tok}]
+
+
+def _rpc_revoke_invite(c, p_invite_id):
+    for r in c._table("pending_invites"):
+        if r.get("id") == p_invite_id:
+            r["status"] = "revoked"
+    return None
+
+
+def _rpc_accept_invite_by_token(c, p_token):
+    user = c.current_user
+    for inv in c._table("pending_invites"):
+        if inv.get("token") == p_token and inv.get("status") == "pending":
+            inv["status"] = "used"
+            c._insert("members", {
+                "household_id": inv["household_id"], "user_id": getattr(user, "id", None),
+                "display_name": inv.get("display_name") or "Membro", "role": "member",
+            })
+            return [{"household_id": inv["household_id"]}]
+    return []
+
+
+def _fold(text) -> str:
+    """minúsculas sem acento (equivale a ff_unaccent(lower(...)) da migração 002)."""
+    t = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in t if not unicodedata.combining(ch))
+
+
+def _rpc_search_transactions(c, p_household, p_query="", p_start=None, p_end=None,
+                             p_min_amount=None, p_max_amount=None, p_member=None,
+                             p_category=None, p_is_paid=None, p_limit=25, p_offset=0):
+    """
+    Aproximação em memória da busca FTS + trigramas: cada termo precisa aparecer
+    (substring) ou ser parecido com alguma palavra da descrição.
+    """
+    terms = [_fold(w) for w in str(p_query or "").split() if w.strip()]
+    hits = []
+    for r in c._table("transactions"):
+        if r.get("household_id") != p_household:
+            continue
+        occ = _norm(r.get("occurred_at"))
+        if p_start and (not occ or occ < _norm(p_start)):
+            continue
+        if p_end and (not occ or occ > _norm(p_end)):
+            continue
+        planned = r.get("planned_amount") if r.get("planned_amount") is not None else r.get("amount")
+        if p_min_amount is not None and (planned is None or float(planned) < float(p_min_amount)):
+            continue
+        if p_max_amount is not None and (planned is None or float(planned) > float(p_max_amount)):
+            continue
+        if p_member and r.get("member_id") != p_member:
+            continue
+        if p_category and r.get("category_id") != p_category:
+            continue
+        if p_is_paid is not None and bool(r.get("is_paid")) != bool(p_is_paid):
+            continue
+        rank = 0.0
+        if terms:
+            words = _fold(r.get("description")).split()
+            for t in terms:
+                best = max((1.0 if t in w else difflib.SequenceMatcher(None, t, w).ratio() for w in words), default=0.0)
+                if best < 0.75:
+                    break
+                rank += best
+            else:
+                hits.append((rank, r))
+            continue
+        hits.append((rank, r))
+    hits.sort(key=lambda h: (-h[0], _neg_date(h[1].get("occurred_at")), str(h[1].get("id"))))
+    total = len(hits)
+    lim = min(max(int(p_limit or 25), 1), 200)
+    off = max(int(p_offset or 0), 0)
+    out = []
+    for rank, r in hits[off:off + lim]:
+        row = {k: copy.deepcopy(r.get(k)) for k in (
+            "id", "occurred_at", "due_date", "type", "description", "planned_amount", "paid_amount",
+            "is_paid", "member_id", "category_id", "attachment_url")}
+        words = str(r.get("description") or "").split(" ")
+        if terms:
+            words = [f"[[{w}]]" if any(t in _fold(w) or difflib.SequenceMatcher(None, t, _fold(w)).ratio() >= .75
+                                       for t in terms) else w for w in words]
+        row.update(rank=round(rank, 4), headline=" ".join(words), total_count=total)
+        out.append(row)
+    return out
+
+
+def _neg_date(v) -> int:
+    d = _norm(v)
+    try:
+        return -date.fromisoformat(str(d)[:10]).toordinal()
+    except Exception:
+        return 0
+
+
+# ---- saldos por conta (migração 005) ----
+def _balance_move(r: dict):
+    """(conta, dia, centavos com sinal) do lançamento que mexe no saldo, ou None."""
+    if not r.get("is_paid") or not r.get("account_id") or (r.get("payment_method") or "account") == "card":
+        return None
+    v = r.get("paid_amount")
+    if v is None:
+        v = r.get("planned_amount") if r.get("planned_amount") is not None else r.get("amount")
+    c = int(round(float(v or 0) * 100))
+    day = _to_day(r.get("paid_at") or r.get("occurred_at"))
+    return None if day is None else (r["account_id"], day, c if r.get("type") == "income" else -c)
+
+
+def _to_day(v) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(_norm(v))[:10]) if v else None
+    except ValueError:
+        return None
+
+
+def _balance_mark_dirty(c, household, account, day: Optional[date]):
+    """ff_balance_mark_dirty: a conta precisa recalcular a partir do mês de `day`."""
+    if not account or day is None or day >= date.today().replace(day=1):
+        return
+    month = day.replace(day=1).isoformat()
+    for d in c._tables["account_balance_dirty"]:
+        if d["account_id"] == account:
+            d["from_month"] = min(d["from_month"], month)
+            return
+    c._tables["account_balance_dirty"].append(
+        {"account_id": account, "household_id": household, "from_month": month})
+
+
+def _balance_triggers(c, table: str, op: str, record: Optional[dict], old: Optional[dict]):
+    """Triggers da migração 005 (transactions marca suja; opening_balance/DELETE descarta)."""
+    if "account_balance_dirty" not in c._tables:
+        return
+    if table == "transactions":
+        for r in (old, record):
+            if r and r.get("is_paid"):
+                _balance_mark_dirty(c, r.get("household_id"), r.get("account_id"),
+                                    _to_day(r.get("paid_at") or r.get("occurred_at")))
+    elif table == "accounts" and old and (op == "DELETE" or old.get("opening_balance") != (record or {}).get("opening_balance")):
+        for t in ("account_balance_checkpoints", "account_balance_dirty"):
+            c._tables[t][:] = [x for x in c._tables[t] if x["account_id"] != old.get("id")]
+
+
+def _rpc_refresh_balance_checkpoints(c, p_household):
+    """Recalcula os checkpoints de fim de mês só a partir do mês sujo (ou do último checkpoint)."""
+    last = _add_months(date.today().replace(day=1), -1)
+    cps, dirty = c._table("account_balance_checkpoints"), c._table("account_balance_dirty")
+    accounts = [a for a in c._table("accounts") if a.get("household_id") == p_household]
+    moves: Dict[str, List[tuple]] = {}
+    for t in c._table("transactions"):
+        mv = _balance_move(t)
+        if mv is not None:
+            moves.setdefault(mv[0], []).append(mv[1:])
+    total = 0
+    for a in accounts:
+        mine = {cp["month"]: cp for cp in cps if cp["account_id"] == a["id"]}
+        d = next((x for x in dirty if x["account_id"] == a["id"]), None)
+        if not mine:
+            first = min((day for day, _ in moves.get(a["id"], [])), default=None)
+            v_from = first.replace(day=1) if first else None
+        else:
+            v_from = _add_months(date.fromisoformat(max(mine)), 1)
+            if d is not None:
+                v_from = min(v_from, date.fromisoformat(d["from_month"]))
+        if v_from is not None and v_from <= last:
+            prev = mine.get(_add_months(v_from, -1).isoformat())
+            bal = int(round(float(prev["balance"] if prev else a.get("opening_balance") or 0) * 100))
+            delta: Dict[date, int] = {}
+            for day, cents in moves.get(a["id"], []):
+                if v_from <= day < _add_months(last, 1):
+                    delta[day.replace(day=1)] = delta.get(day.replace(day=1), 0) + cents
+            m = v_from
+            while m <= last:
+                bal += delta.get(m, 0)
+                row = mine.get(m.isoformat())
+                if row is None:
+                    row = {"account_id": a["id"], "household_id": p_household, "month": m.isoformat()}
+                    cps.append(row)
+                row.update(balance=bal / 100, updated_at=datetime.utcnow().isoformat())
+                total += 1
+                m = _add_months(m, 1)
+        dirty[:] = [x for x in dirty if x["account_id"] != a["id"]]
+    return total
+
+
+def _rpc_account_balance_series(c, p_household, p_start, p_end, p_step="day"):
+    """Saldo por conta e dia (ou fim de mês): checkpoint anterior + lançamentos da janela."""
+    _rpc_refresh_balance_checkpoints(c, p_household)
+    start, end, today = _to_day(p_start), _to_day(p_end), date.today()
+    cps = [cp for cp in c._table("account_balance_checkpoints") if cp["household_id"] == p_household]
+    if p_step == "month":
+        out = []
+        for cp in cps:
+            m = date.fromisoformat(cp["month"])
+            fim = _add_months(m, 1) - timedelta(days=1)
+            if m >= start.replace(day=1) and fim <= end:
+                out.append({"account_id": cp["account_id"], "day": fim.isoformat(), "balance": cp["balance"]})
+        if end >= today.replace(day=1):
+            live = min(end, today)
+            out += _rpc_account_balance_series(c, p_household, live, live, "day")
+        return sorted(out, key=lambda r: (str(r["account_id"]), r["day"]))
+
+    out = []
+    for a in sorted((a for a in c._table("accounts") if a.get("household_id") == p_household),
+                    key=lambda a: str(a["id"])):
+        antes = [cp for cp in cps if cp["account_id"] == a["id"] and cp["month"] < start.replace(day=1).isoformat()]
+        cp = max(antes, key=lambda x: x["month"], default=None)
+        bal = int(round(float(cp["balance"] if cp else a.get("opening_balance") or 0) * 100))
+        since = _add_months(date.fromisoformat(cp["month"]), 1) if cp else date.min
+        delta: Dict[date, int] = {}
+        for t in c._table("transactions"):
+            mv = _balance_move(t)
+            if mv is not None and mv[0] == a["id"] and since <= mv[1] <= end:
+                if mv[1] < start:
+                    bal += mv[2]
+                else:
+                    delta[mv[1]] = delta.get(mv[1], 0) + mv[2]
+        d = start
+        while d <= end:
+            bal += delta.get(d, 0)
+            out.append({"account_id": a["id"], "day": d.isoformat(), "balance": bal / 100})
+            d += timedelta(days=1)
+    return out
+
+
+_LEDGER_FIELDS = ("id", "member_id", "category_id", "account_id", "type", "description", "occurred_at",
+                  "due_date", "amount", "planned_amount", "paid_amount", "is_paid", "currency")
+
+
+def _rpc_ledger_month_checksums(c, p_household):
+    """Migração 008: (mês, linhas, checksum) do livro do household."""
+    import hashlib
+    meses: Dict[str, list] = {}
+    for r in c._table("transactions"):
+        if r.get("household_id") != p_household or not r.get("occurred_at"):
+            continue
+        raw = "|".join("" if r.get(k) is None else str(r.get(k)) for k in _LEDGER_FIELDS)
+        h = int.from_bytes(hashlib.blake2b(raw.encode(), digest_size=8).digest(), "big", signed=True)
+        m = meses.setdefault(str(r["occurred_at"])[:7] + "-01", [0, 0])
+        m[0] += 1
+        m[1] += h
+    return [{"month": m, "n": n, "checksum": ck} for m, (n, ck) in sorted(meses.items())]
+
+
+DEFAULT_RPCS: Dict[str, Callable] = {
+    "create_installments": _rpc_create_installments,
+    "mark_transaction_paid": _rpc_mark_transaction_paid,
+    "mark_transactions_paid": _rpc_mark_transactions_paid,
+    "upsert_budget": _rpc_upsert_budget,
+    "create_household_and_member": _rpc_create_household_and_member,
+    "create_invite_link": _rpc_create_invite_link,
+    "revoke_invite": _rpc_revoke_invite,
+    "accept_invite_by_token": _rpc_accept_invite_by_token,
+    "accept_pending_invite": lambda c: None,
+    "search_transactions": _rpc_search_transactions,
+    "refresh_balance_checkpoints": _rpc_refresh_balance_checkpoints,
+    "account_balance_series": _rpc_account_balance_series,
+    "ledger_month_checksums": _rpc_ledger_month_checksums,
+}
+
+
+class FakeSupabase:
+    """
+    Stand-in em memória do `supabase.Client`.
+
+    latency: segundos por round trip (float ou callable(label) -> float).
+    row_cap: máximo de linhas por SELECT (equivalente ao max-rows do PostgREST).
+    budget: máximo de round trips; ao exceder dispara QueryBudgetExceeded.
+
+    on_change(cb) faz o papel do Supabase Realtime: cada INSERT/UPDATE/DELETE
+    chega em cb com o mesmo formato do payload de postgres_changes
+    ({table, type, record, old_record}), depois que o round trip termina.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[dict]]] = None, *,
+                 latency: float | Callable[[str], float] = 0.0,
+                 row_cap: Optional[int] = None,
+                 budget: Optional[int] = None,
+                 missing_tables: tuple = (),
+                 url: str = "http://localhost:54321"):
+        self.url = url
+        self.latency = latency
+        self.row_cap = row_cap
+        self.budget = budget
+        self.current_user = None
+        self.calls: List[dict] = []
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._pending: List[dict] = []
+        self._tables: Dict[str, List[dict]] = {
+            t: [] for t in DEFAULT_TABLES if t not in missing_tables
+        }
+        self._rpcs: Dict[str, Callable] = dict(DEFAULT_RPCS)
+        self.buckets: Dict[str, Dict[str, bytes]] = {"boletos": {}, "avatars": {}}
+        self.storage = _Storage(self)
+        self.auth = _Auth(self)
+        for name, rows in (tables or {}).items():
+            self.seed(name, rows)
+
+    # ---- API pública (compatível com supabase.Client) ----
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> _RpcCall:
+        return _RpcCall(self, name, params)
+
+    # ---- utilidades de teste ----
+    def seed(self, name: str, rows: List[dict]):
+        """Carrega linhas sem contar round trip (cria a tabela se preciso)."""
+        self._tables.setdefault(name, [])
+        with self._lock:
+            self._insert(name, rows)
+            self._pending.clear()  # carga de teste não é mudança
+        return self
+
+    def on_change(self, callback: Callable[[dict], None]) -> Callable[[], None]:
+        """Assina as mudanças de linha (stand-in do Realtime); devolve o cancelamento."""
+        self._listeners.append(callback)
+        return lambda: callback in self._listeners and self._listeners.remove(callback)
+
+    def register_rpc(self, name: str, fn: Callable):
+        """Registra/substitui uma RPC: fn(client, **params) -> data."""
+        self._rpcs[name] = fn
+
+    def rows(self, name: str) -> List[dict]:
+        return copy.deepcopy(self._table(name))
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.calls)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    # ---- internos ----
+    def _round_trip(self, label: str, fn: Callable):
+        with self._lock:
+            if self.budget is not None and len(self.calls) >= self.budget:
+                raise QueryBudgetExceeded(
+                    f"orçamento de {self.budget} round trips excedido em '{label}'"
+                )
+            call = {"label": label, "ok": True, "duration": 0.0}
+            self.calls.append(call)
+        t0 = time.perf_counter()
+        lat = self.latency(label) if callable(self.latency) else self.latency
+        if lat:
+            time.sleep(lat)
+        try:
+            with self._lock:
+                out = fn()
+                events, self._pending = self._pending, []
+        except Exception:
+            call["ok"] = False
+            with self._lock:
+                self._pending.clear()
+            raise
+        finally:
+            call["duration"] = time.perf_counter() - t0
+        # fora do lock: o ouvinte pode consultar o próprio cliente
+        for ev in events:
+            for cb in list(self._listeners):
+                cb(ev)
+        return out
+
+    def _emit(self, table: str, op: str, record: Optional[dict], old: Optional[dict]):
+        _balance_triggers(self, table, op, record, old)
+        if self._listeners:
+            self._pending.append({"table": table, "type": op, "record": copy.deepcopy(record),
+                                  "old_record": copy.deepcopy(old)})
+
+    def _table(self, name: str) -> List[dict]:
+        if name not in self._tables:
+            raise FakeAPIError(f'relation "public.{name}" does not exist', "42P01")
+        return self._tables[name]
+
+    def _insert(self, name: str, rows) -> List[dict]:
+        single = isinstance(rows, dict)
+        table = self._table(name)
+        out = []
+        for r in ([rows] if single else rows):
+            r = {k: _norm(v) for k, v in r.items()}
+            r.setdefault("id", str(uuid.uuid4()))
+            r.setdefault("created_at", datetime.utcnow().isoformat())
+            if name == "transactions":
+                r.setdefault("is_paid", False)
+                r.setdefault("paid_amount", None)
+                r.setdefault("paid_at", None)
+                # trigger ff_transactions_currency (migração 006): herda a moeda da conta
+                conta = next((a for a in self._tables.get("accounts", []) if a.get("id") == r.get("account_id")), {})
+                r["currency"] = str(r.get("currency") or conta.get("currency") or "BRL").upper()
+                if (conta.get("currency") and (r.get("payment_method") or "account") != "card"
+                        and r["currency"] != conta["currency"].upper()):
+                    raise FakeAPIError(f"lançamento em {r['currency']} numa conta em {conta['currency']}: "
+                                       "use a moeda da conta", "23514")
+            table.append(r)
+            out.append(copy.deepcopy(r))
+            self._emit(name, "INSERT", r, None)
+        return out
+
+    def _upsert(self, name: str, rows, on_conflict: Optional[str]) -> List[dict]:
+        keys = [k.strip() for k in (on_conflict or "id").split(",")]
+        table = self._table(name)
+        out = []
+        for r in ([rows] if isinstance(rows, dict) else rows):
+            r = {k: _norm(v) for k, v in r.items()}
+            hit = next((x for x in table if all(x.get(k) == r.get(k) for k in keys)), None)
+            if hit is not None:
+                old = copy.deepcopy(hit)
+                hit.update(r)
+                self._emit(name, "UPDATE", hit, old)
+                out.append(copy.deepcopy(hit))
+            else:
+                out.extend(self._insert(name, r))
+        return out
+
+    def _view(self, name: str) -> List[dict]:
+        if name == "v_card_limit":
+            used: Dict[str, float] = {}
+            for t in self._tables.get("transactions", []):
+                if t.get("card_id") and t.get("type") == "expense" and not t.get("is_paid"):
+                    used[t["card_id"]] = used.get(t["card_id"], 0.0) + float(t.get("planned_amount") or 0)
+            return [{
+                "id": c["id"], "household_id": c.get("household_id"), "name": c.get("name"),
+                "limit_amount": c.get("limit_amount"),
+                "available_limit": float(c.get("limit_amount") or 0) - used.get(c["id"], 0.0),
+            } for c in self._tables.get("credit_cards", [])]
+        raise FakeAPIError(f'relation "public.{name}" does not exist', "42P01")
+
+
+def demo_dataset(household_id: str = "hh-demo", user_id: Optional[str] = None,
+                 months: int = 6, per_month: int = 40, seed: int = 7) -> Dict[str, List[dict]]:
+    """Gera um household sintético (membros, categorias, contas, cartões e transações)."""
+    import random
+    rnd = random.Random(seed)
+    members = [
+        {"id": "m-1", "household_id": household_id, "user_id": user_id, "display_name": "Você", "role": "owner"},
+        {"id": "m-2", "household_id": household_id, "user_id": None, "display_name": "Parceiro(a)", "role": "member"},
+    ]
+    cats = [
+        ("c-sal", "💼 Salário", "income"), ("c-mer", "🛒 Mercado", "expense"),
+        ("c-ene", "💡 Energia", "expense"), ("c-far", "💊 Farmácia", "expense"),
+        ("c-laz", "🎬 Lazer", "expense"), ("c-tra", "🚗 Transporte", "expense"),
+    ]
+    categories = [{"id": i, "household_id": household_id, "name": n, "kind": k} for i, n, k in cats]
+    accounts = [{"id": "a-1", "household_id": household_id, "name": "Conta Corrente", "type": "checking",
+                 "opening_balance": 1500.0, "currency": "BRL", "is_active": True}]
+    cards = [{"id": "k-1", "household_id": household_id, "name": "Cartão Principal", "limit_amount": 5000.0,
+              "closing_day": 5, "due_day": 15, "is_active": True, "created_by": user_id}]
+    txs = []
+    today = date.today()
+    for mi in range(months):
+        first = _add_months(today.replace(day=1), -mi)
+        for j in range(per_month):
+            cid, cname, kind = cats[0] if j == 0 else rnd.choice(cats[1:])
+            d = first + timedelta(days=rnd.randrange(28))
+            v = 6000.0 if kind == "income" else round(rnd.uniform(15, 400), 2)
+            paid = d < today and rnd.random() < 0.7
+            txs.append({
+                "id": f"t-{mi}-{j}", "household_id": household_id,
+                "member_id": rnd.choice(members)["id"], "account_id": "a-1", "category_id": cid,
+                "type": kind, "amount": v, "planned_amount": v,
+                "occurred_at": d.isoformat(), "due_date": d.isoformat(),
+                "description": f"{cname.split(' ', 1)[1]} #{j}",
+                "payment_method": "account", "card_id": None,
+                "is_paid": paid, "paid_amount": v if paid else None,
+                "paid_at": d.isoformat() if paid else None, "attachment_url": None, "currency": "BRL",
+            })
+    return {"households": [{"id": household_id, "name": "Família Demo"}], "members": members,
+            "categories": categories, "accounts": accounts, "credit_cards": cards, "transactions": txs}
+
+
+def from_env() -> FakeSupabase:
+    """
+    Monta o cliente fake a partir de variáveis de ambiente:
+      FF_FAKE_SUPABASE   "1"/"demo" (dados sintéticos) ou caminho de um JSON {tabela: [linhas]}
+      FF_FAKE_LATENCY_MS latência por round trip, em milissegundos
+      FF_FAKE_ROW_CAP    máximo de linhas por SELECT
+    """
+    src = os.environ.get("FF_FAKE_SUPABASE", "1")
+    if src.lower() in ("1", "true", "demo"):
+        tables = demo_dataset()
+    else:
+        with open(src, encoding="utf-8") as f:
+            tables = json.load(f)
+    lat = float(os.environ.get("FF_FAKE_LATENCY_MS", "0") or 0) / 1000.0
+    cap = os.environ.get("FF_FAKE_ROW_CAP")
+    client = FakeSupabase(tables, latency=lat, row_cap=int(cap) if cap else None)
+    if src.lower() in ("1", "true", "demo"):
+        # no modo demo o primeiro login vira o owner do household sintético
+        def _claim(c, credentials, _orig=client.auth.sign_in_with_password):
+            res = _orig(credentials)
+            for m in c._tables["members"]:
+                if m["id"] == "m-1" and m.get("user_id") is None:
+                    m["user_id"] = res.user.id
+            return res
+        client.auth.sign_in_with_password = lambda cred: _claim(client, cred)
+    return client
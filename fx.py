@@ -0,0 +1,230 @@
+# fx.py
+"""
+Câmbio: tabela local de cotações diárias + conversão vetorizada.
+
+Contas e lançamentos podem estar em outra moeda (accounts.currency,
+transactions.currency — migração 006); relatórios somam na moeda de
+apresentação (REPORTING, a do app: BRL). As cotações ficam num Parquet local
+(FF_FX_DIR), importadas de CSV — nada de rede — e viram em memória um índice
+por moeda (dias ordenados + taxas). Converter uma coluna é um join "as of"
+por moeda (searchsorted: a última cotação até o dia), uma vez por relatório,
+nunca uma busca por linha.
+
+    fx.import_csv(arquivo)                      # data,moeda,taxa (em BRL por unidade)
+    c = fx.effective(rows, signed=True)         # money.effective já na moeda de apresentação
+    c = fx.convert(centavos, moedas, dias)      # colunas inteiras
+
+Cotação é dado de mercado, igual para todas as famílias: a tabela é do
+servidor, e só quem está em FF_FX_ADMINS (e-mails) importa pela tela —
+ou o operador, por `python fx.py cotacoes.csv`. Moeda sem nenhuma cotação
+fica sem conversão; missing(moedas) diz quais das moedas do chamador faltam.
+"""
+from __future__ import annotations
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+import io
+import os
+import threading
+import uuid
+
+import numpy as np
+
+import money
+
+REPORTING = "BRL"
+FX_DIR = os.environ.get("FF_FX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ff_fx"))
+RATES_PATH = os.path.join(FX_DIR, "rates.parquet")
+ADMINS = {e.strip().lower() for e in os.environ.get("FF_FX_ADMINS", "").split(",") if e.strip()}
+
+# nomes aceitos no CSV (inglês/português)
+_COLS = {"date": ("date", "data", "dia"), "currency": ("currency", "moeda"), "rate": ("rate", "taxa", "cotacao", "cotação")}
+
+_LOCK = threading.Lock()
+_INDEX: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+_INDEX_MTIME: Optional[float] = None
+
+
+# =========================
+# Tabela local
+# =========================
+def _read_table():
+    import pandas as pd
+    if not os.path.exists(RATES_PATH):
+        return pd.DataFrame({"day": pd.Series(dtype="datetime64[ns]"), "currency": pd.Series(dtype=object),
+                             "rate": pd.Series(dtype="float64")})
+    return pd.read_parquet(RATES_PATH)
+
+
+def _dates(s):
+    """ISO (2024-03-31) ou brasileiro (31/03/2024)."""
+    import pandas as pd
+    iso = pd.to_datetime(s, errors="coerce", format="ISO8601")
+    return iso.fillna(pd.to_datetime(s.where(iso.isna()), errors="coerce", dayfirst=True))
+
+
+def parse_csv(data) -> "pd.DataFrame":
+    """CSV (bytes, str ou arquivo) -> DataFrame {day, currency, rate}; aceita ; e vírgula decimal."""
+    import pandas as pd
+
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if isinstance(data, str):
+        data = io.StringIO(data)
+    df = pd.read_csv(data, sep=None, engine="python", dtype=str)
+    cols = {c.strip().lower(): c for c in df.columns}
+    pick = {}
+    for alvo, nomes in _COLS.items():
+        achou = next((cols[n] for n in nomes if n in cols), None)
+        if achou is None:
+            raise ValueError(f"coluna '{alvo}' não encontrada (aceitas: {', '.join(nomes)})")
+        pick[alvo] = achou
+    out = pd.DataFrame({
+        "day": _dates(df[pick["date"]].str.strip()),
+        "currency": df[pick["currency"]].str.strip().str.upper(),
+        "rate": pd.to_numeric(df[pick["rate"]].str.strip().str.replace(",", ".", regex=False), errors="coerce"),
+    })
+    ruins = out["day"].isna() | out["currency"].isna() | ~(out["rate"] > 0)
+    if ruins.any():
+        raise ValueError(f"{int(ruins.sum())} linha(s) inválida(s) no CSV (data, moeda ou taxa)")
+    return out
+
+
+def import_csv(data) -> Dict[str, int]:
+    """
+    Mescla as cotações do CSV na tabela local (mesmo dia/moeda: vale o CSV).
+    Devolve {moeda: linhas importadas}. Caches de relatório são descartados.
+    """
+    import pandas as pd
+    import datacache
+
+    global _INDEX_MTIME
+    novo = parse_csv(data)
+    with _LOCK:
+        tab = pd.concat([_read_table(), novo], ignore_index=True)
+        tab = tab.drop_duplicates(["currency", "day"], keep="last").sort_values(["currency", "day"])
+        os.makedirs(FX_DIR, exist_ok=True)
+        tmp = f"{RATES_PATH}.{uuid.uuid4().hex}.tmp"
+        tab.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, RATES_PATH)
+        _INDEX.clear()
+        _INDEX_MTIME = None
+    datacache.clear()  # snapshots/relatórios foram somados com as taxas antigas
+    return novo.groupby("currency").size().astype(int).to_dict()
+
+
+def _index() -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """moeda -> (dias ordinais ordenados, taxas); recarrega se o arquivo mudou."""
+    global _INDEX_MTIME
+    mtime = os.path.getmtime(RATES_PATH) if os.path.exists(RATES_PATH) else 0.0
+    with _LOCK:
+        if _INDEX_MTIME != mtime:
+            tab = _read_table()
+            _INDEX.clear()
+            for cur, g in tab.groupby("currency"):
+                g = g.sort_values("day")
+                dias = g["day"].to_numpy().astype("datetime64[D]").astype(np.int64)
+                _INDEX[cur] = (dias, g["rate"].to_numpy(dtype=np.float64))
+            _INDEX_MTIME = mtime
+        return _INDEX
+
+
+def version() -> float:
+    """Muda a cada importação (quem guarda valores convertidos compara)."""
+    return os.path.getmtime(RATES_PATH) if os.path.exists(RATES_PATH) else 0.0
+
+
+def currencies() -> list:
+    """Moedas com cotação (mais a de apresentação)."""
+    return sorted({REPORTING, *_index()})
+
+
+def coverage() -> list:
+    """[{moeda, de, até, cotações, última}] para a tela de câmbio."""
+    out = []
+    for cur, (dias, taxas) in sorted(_index().items()):
+        out.append({"moeda": cur, "de": _to_date(dias[0]), "até": _to_date(dias[-1]),
+                    "cotações": len(dias), "última": float(taxas[-1])})
+    return out
+
+
+def can_import(email: Optional[str]) -> bool:
+    """A tabela vale para todo o servidor: só FF_FX_ADMINS importa pela tela."""
+    return bool(email) and email.strip().lower() in ADMINS
+
+
+def missing(currs: Iterable[Optional[str]]) -> Set[str]:
+    """Das moedas dadas, as que não têm nenhuma cotação (somadas sem conversão)."""
+    idx = _index()
+    return {c.upper() for c in currs if c and c.upper() != REPORTING and c.upper() not in idx}
+
+
+def _to_date(d: np.int64) -> date:
+    return np.datetime64(int(d), "D").astype(date)
+
+
+# =========================
+# Conversão vetorizada
+# =========================
+def rates(currs: Sequence[Optional[str]], days: Sequence, to: str = REPORTING) -> np.ndarray:
+    """
+    Taxa de cada posição (moeda -> `to`) na data dada: última cotação até o dia
+    (antes da primeira, a primeira). Um searchsorted por moeda distinta.
+    """
+    import pandas as pd
+
+    codes, uniq = pd.factorize(np.asarray(currs, dtype=object))  # None -> -1 (moeda de apresentação)
+    out = np.ones(len(codes), dtype=np.float64)
+    nomes = [str(u).upper() for u in uniq]
+    if len(codes) == 0 or (all(n == REPORTING for n in nomes) and to == REPORTING):
+        return out
+    dias = np.asarray(days, dtype="datetime64[D]").astype(np.int64)
+    idx = _index()
+
+    def _para_brl(moeda: str, sel: np.ndarray) -> np.ndarray:
+        if moeda == REPORTING or moeda not in idx:  # sem cotação: fica como está
+            return np.ones(int(sel.sum()))
+        ds, rs = idx[moeda]
+        pos = np.searchsorted(ds, dias[sel], side="right") - 1
+        return rs[np.clip(pos, 0, len(rs) - 1)]
+
+    for k, moeda in enumerate(nomes):
+        sel = codes == k
+        out[sel] = _para_brl(moeda, sel)
+    if to != REPORTING:
+        out /= _para_brl(to, np.ones(len(codes), dtype=bool))
+    return out
+
+
+def convert(cents: np.ndarray, currs: Sequence[Optional[str]], days: Sequence, to: str = REPORTING) -> np.ndarray:
+    """Centavos na moeda de cada linha -> centavos em `to` (arredondado ao centavo)."""
+    cents = np.asarray(cents, dtype=np.int64)
+    if all((c or REPORTING) == to for c in currs):
+        return cents
+    return np.rint(cents * rates(currs, days, to)).astype(np.int64)
+
+
+def _tx_days(rows: Sequence[dict]) -> np.ndarray:
+    return np.array([str(r.get("occurred_at") or r.get("due_date") or "1970-01-01")[:10] for r in rows],
+                    dtype="datetime64[D]")
+
+
+def planned(rows: Sequence[dict], to: str = REPORTING) -> np.ndarray:
+    """money.planned na moeda de apresentação (cotação do dia do lançamento)."""
+    c = money.planned(rows)
+    currs = [r.get("currency") for r in rows]
+    return convert(c, currs, _tx_days(rows) if any((x or REPORTING) != to for x in currs) else [], to)
+
+
+def effective(rows: Sequence[dict], signed: bool = False, to: str = REPORTING) -> np.ndarray:
+    """money.effective na moeda de apresentação."""
+    c = money.effective(rows, signed)
+    currs = [r.get("currency") for r in rows]
+    return convert(c, currs, _tx_days(rows) if any((x or REPORTING) != to for x in currs) else [], to)
+
+
+if __name__ == "__main__":
+    # fora do servidor: ele relê as taxas pelo mtime; relatórios já em cache expiram no TTL
+    import sys
+    for arq in sys.argv[1:]:
+        with open(arq, "rb") as f:
+            print(arq, import_csv(f.read()))
@@ -0,0 +1,99 @@
+# loader.py
+"""
+Carga concorrente das dependências de uma página.
+
+As páginas faziam os fetches um depois do outro (categorias, contas, cartões,
+limites...): com o cache frio a latência era a soma dos round trips. Aqui a
+página declara o que precisa e tudo sai junto num pool de threads limitado;
+o tempo fica perto da consulta mais lenta.
+
+    d = loader.load(
+        cats=(fetch_categories, sb, HOUSEHOLD_ID),
+        accs=(fetch_accounts, sb, HOUSEHOLD_ID, True),
+        cards=lambda: fetch_cards(sb, HOUSEHOLD_ID, True),
+    )
+    d["cats"], d["accs"], d["cards"]
+
+As threads recebem o contexto do rerun (add_script_run_ctx): st.cache_data,
+st.session_state e o tracing do perf funcionam como na thread principal.
+Um fetcher que falha levanta a exceção no load(), depois que os outros terminam.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple, Union
+import os
+import threading
+import time
+
+import perf
+
+MAX_WORKERS = int(os.environ.get("FF_LOADER_WORKERS", "8"))
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_local = threading.local()
+_CTX_ATTR = "streamlit_script_run_ctx"  # onde o Streamlit guarda o ScriptRunContext na thread
+
+Dep = Union[Callable[[], Any], Tuple]
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ff-loader")
+        return _POOL
+
+
+def _thunk(dep: Dep) -> Callable[[], Any]:
+    if callable(dep):
+        return dep
+    fn, *args = dep
+    return lambda: fn(*args)
+
+
+def _with_ctx(fn: Callable[[], Any], ctx) -> Callable[[], Any]:
+    def run():
+        # anexado a cada tarefa e restaurado no fim: a thread do pool serve reruns e sessões
+        # diferentes, e uma tarefa sem contexto não pode rodar com o da anterior.
+        # (add_script_run_ctx(t, None) não desanexa: usa o contexto atual da thread.)
+        thread = threading.current_thread()
+        antes = getattr(thread, _CTX_ATTR, None)
+        if ctx is not None:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx
+            add_script_run_ctx(thread, ctx)
+        else:
+            setattr(thread, _CTX_ATTR, None)
+        _local.inside = True
+        try:
+            return fn()
+        finally:
+            _local.inside = False
+            setattr(thread, _CTX_ATTR, antes)
+    return run
+
+
+def load(**deps: Dep) -> Dict[str, Any]:
+    """Executa as dependências em paralelo e devolve {nome: resultado}."""
+    thunks = {name: _thunk(dep) for name, dep in deps.items()}
+    # uma só dependência, ou load() chamado de dentro do pool: sem threads (evita esgotar o pool)
+    if len(thunks) <= 1 or getattr(_local, "inside", False):
+        return {name: fn() for name, fn in thunks.items()}
+
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    t0 = time.perf_counter()
+    futures = {name: _pool().submit(_with_ctx(fn, ctx)) for name, fn in thunks.items()}
+    out, error = {}, None
+    for name, fut in futures.items():
+        try:
+            out[name] = fut.result()
+        except Exception as e:
+            error = error or e
+    perf.record("section", f"loader[{','.join(thunks)}]", time.perf_counter() - t0)
+    if error is not None:
+        raise error
+    return out
@@ -0,0 +1,198 @@
+-- migrations/001_partition_transactions.sql
+-- Particionamento declarativo de public.transactions por mês (RANGE em occurred_at).
+--
+-- * fetch_tx filtra household_id + occurred_at: o planner poda para os meses do intervalo.
+-- * fetch_tx_due, ramo "due_date IS NULL": também filtra occurred_at e é podado.
+-- * fetch_tx_due, ramo "due_date no intervalo": due_date não é a chave de partição;
+--   é atendido pelo índice local (household_id, due_date) de cada partição.
+--
+-- * Partições existem até 37 meses à frente (parcelamento vai a 36). O que cair
+--   na partição default (data fora do horizonte) é movido para a partição do mês
+--   quando ensure_transactions_partitions() a cria.
+-- * `like ... including` não copia FKs nem triggers da tabela antiga: a seção 1
+--   recria as FKs e triggers de usuário de transactions_legacy. FKs de OUTRAS
+--   tabelas apontando para transactions não sobrevivem (a PK passa a ser
+--   (id, occurred_at)) e precisam ser refeitas à mão, se existirem.
+--
+-- Idempotente no que é possível; rode dentro de uma janela de manutenção
+-- (a cópia dos dados bloqueia escrita em transactions durante a migração).
+
+begin;
+
+-- =========================
+-- 1) Tabela particionada com o mesmo shape da atual
+-- =========================
+-- occurred_at passa a integrar a PK (NOT NULL): preenche lançamentos antigos sem data.
+update public.transactions
+   set occurred_at = coalesce(due_date, created_at::date, current_date)
+ where occurred_at is null;
+
+alter table public.transactions rename to transactions_legacy;
+
+create table public.transactions (
+  like public.transactions_legacy including defaults including constraints including generated including comments
+) partition by range (occurred_at);
+
+-- LIKE copia NOT NULL e CHECK (including constraints), mas não FKs nem triggers
+do $$
+declare
+  r record;
+begin
+  for r in
+    select conname, pg_get_constraintdef(oid) as def
+      from pg_constraint
+     where conrelid = 'public.transactions_legacy'::regclass and contype = 'f'
+  loop
+    execute format('alter table public.transactions add constraint %I %s', r.conname, r.def);
+  end loop;
+  for r in
+    select pg_get_triggerdef(oid) as def
+      from pg_trigger
+     where tgrelid = 'public.transactions_legacy'::regclass and not tgisinternal
+  loop
+    execute replace(r.def, 'public.transactions_legacy', 'public.transactions');
+  end loop;
+end $$;
+
+-- A PK de tabela particionada precisa conter a chave de partição.
+alter table public.transactions add primary key (id, occurred_at);
+
+-- Índices no pai são criados localmente em cada partição (atual e futuras).
+create index if not exists transactions_hh_occurred_idx on public.transactions (household_id, occurred_at);
+create index if not exists transactions_hh_due_idx      on public.transactions (household_id, due_date);
+create index if not exists transactions_id_idx          on public.transactions (id);
+
+-- Datas fora das partições já criadas caem aqui (nunca falha o INSERT).
+create table if not exists public.transactions_default
+  partition of public.transactions default;
+
+-- =========================
+-- 2) Criação automática de partições mensais
+-- =========================
+-- Criar uma partição cujo intervalo já tem linhas na default falha ("updated
+-- partition constraint for default partition would be violated"): nesse caso a
+-- default é desanexada, a partição criada, as linhas movidas e a default volta.
+create or replace function public.ensure_transactions_partitions(p_from date, p_to date)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  m date := date_trunc('month', p_from)::date;
+  last date := date_trunc('month', p_to)::date;
+  nxt date;
+  part text;
+  created integer := 0;
+begin
+  while m <= last loop
+    part := format('transactions_y%sm%s', to_char(m, 'YYYY'), to_char(m, 'MM'));
+    nxt := (m + interval '1 month')::date;
+    if to_regclass('public.' || part) is null then
+      if exists (select 1 from public.transactions_default where occurred_at >= m and occurred_at < nxt) then
+        alter table public.transactions detach partition public.transactions_default;
+        execute format(
+          'create table public.%I partition of public.transactions for values from (%L) to (%L)',
+          part, m, nxt
+        );
+        execute format(
+          'insert into public.%I select * from public.transactions_default where occurred_at >= %L and occurred_at < %L',
+          part, m, nxt
+        );
+        delete from public.transactions_default where occurred_at >= m and occurred_at < nxt;
+        alter table public.transactions attach partition public.transactions_default default;
+      else
+        execute format(
+          'create table public.%I partition of public.transactions for values from (%L) to (%L)',
+          part, m, nxt
+        );
+      end if;
+      created := created + 1;
+    end if;
+    m := nxt;
+  end loop;
+  return created;
+end;
+$$;
+
+comment on function public.ensure_transactions_partitions(date, date) is
+  'Cria (se faltarem) as partições mensais de transactions entre p_from e p_to, '
+  'movendo para elas as linhas do mês que estejam na partição default.';
+
+-- =========================
+-- 3) Cópia dos dados
+-- =========================
+do $$
+declare
+  lo date;
+  hi date;
+begin
+  select min(occurred_at)::date, max(occurred_at)::date into lo, hi from public.transactions_legacy;
+  lo := least(coalesce(lo, current_date), current_date);
+  hi := greatest(coalesce(hi, current_date), (current_date + interval '37 months')::date);
+  perform public.ensure_transactions_partitions(lo, hi);
+end $$;
+
+insert into public.transactions select * from public.transactions_legacy;
+
+-- =========================
+-- 4) RLS, grants e views dependentes
+-- =========================
+alter table public.transactions enable row level security;
+
+do $$
+declare
+  pol record;
+begin
+  for pol in
+    select policyname, permissive, roles, cmd, qual, with_check
+      from pg_policies
+     where schemaname = 'public' and tablename = 'transactions_legacy'
+  loop
+    execute format(
+      'create policy %I on public.transactions as %s for %s to %s %s %s',
+      pol.policyname, pol.permissive, pol.cmd,
+      array_to_string(pol.roles, ', '),
+      case when pol.qual is not null then 'using (' || pol.qual || ')' else '' end,
+      case when pol.with_check is not null then 'with check (' || pol.with_check || ')' else '' end
+    );
+  end loop;
+end $$;
+
+grant select, insert, update, delete on public.transactions to authenticated;
+
+-- Views seguem o OID da tabela renomeada: recria apontando para a nova.
+do $$
+declare
+  v record;
+begin
+  for v in
+    select distinct c.relname as view_name, pg_get_viewdef(c.oid) as def
+      from pg_depend d
+      join pg_rewrite r on r.oid = d.objid
+      join pg_class c on c.oid = r.ev_class
+     where d.refobjid = 'public.transactions_legacy'::regclass
+       and c.relkind = 'v'
+  loop
+    execute format('create or replace view public.%I as %s', v.view_name,
+                   replace(v.def, 'transactions_legacy', 'transactions'));
+  end loop;
+end $$;
+
+drop table public.transactions_legacy;
+
+-- =========================
+-- 5) Manutenção: partições futuras sempre 37 meses à frente (parcelas até 36x)
+-- =========================
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule(
+      'ff_transactions_partitions',
+      '0 3 1 * *',
+      $cron$select public.ensure_transactions_partitions(current_date, (current_date + interval '37 months')::date)$cron$
+    );
+  end if;
+end $$;
+
+commit;
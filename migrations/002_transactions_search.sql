@@ -0,0 +1,128 @@
+-- migrations/002_transactions_search.sql
+-- Busca indexada em transactions.description + RPC search_transactions.
+--
+-- * Full-text: coluna gerada search_tsv (config ff_pt = português sem acentos),
+--   índice GIN junto com household_id (btree_gin) — "farmacia" acha "Farmácia".
+-- * Trigramas: índice GIN em ff_unaccent(lower(description)) para pedaços de
+--   palavra e erros de digitação (word_similarity, ILIKE '%...%').
+-- * Filtros estruturados (valor, membro, categoria, pago) usam índices btree
+--   que começam por household_id; o período continua podando partições (001).
+--
+-- A função roda como SECURITY INVOKER: as policies de RLS de transactions valem.
+
+begin;
+
+create extension if not exists pg_trgm;
+create extension if not exists unaccent;
+create extension if not exists btree_gin;
+
+-- unaccent() é STABLE; índices e colunas geradas exigem IMMUTABLE.
+create or replace function public.ff_unaccent(p text)
+returns text
+language sql
+immutable parallel safe strict
+as $$ select public.unaccent('public.unaccent'::regdictionary, p) $$;
+
+do $$
+begin
+  if not exists (select 1 from pg_ts_config where cfgname = 'ff_pt') then
+    create text search configuration public.ff_pt (copy = pg_catalog.portuguese);
+    alter text search configuration public.ff_pt
+      alter mapping for hword, hword_part, word with public.unaccent, portuguese_stem;
+  end if;
+end $$;
+
+-- Filtro de valor usa planned_amount direto (índice); lançamentos antigos só tinham amount.
+update public.transactions set planned_amount = amount where planned_amount is null;
+
+alter table public.transactions
+  add column if not exists search_tsv tsvector
+  generated always as (to_tsvector('public.ff_pt'::regconfig, coalesce(description, ''))) stored;
+
+create index if not exists transactions_search_idx
+  on public.transactions using gin (household_id, search_tsv);
+create index if not exists transactions_desc_trgm_idx
+  on public.transactions using gin (household_id, (public.ff_unaccent(lower(description))) gin_trgm_ops);
+create index if not exists transactions_hh_amount_idx
+  on public.transactions (household_id, planned_amount);
+create index if not exists transactions_hh_member_idx
+  on public.transactions (household_id, member_id, occurred_at);
+create index if not exists transactions_hh_category_idx
+  on public.transactions (household_id, category_id, occurred_at);
+
+-- =========================
+-- RPC: busca ranqueada e paginada com destaque ([[termo]])
+-- =========================
+create or replace function public.search_transactions(
+  p_household  uuid,
+  p_query      text    default '',
+  p_start      date    default null,
+  p_end        date    default null,
+  p_min_amount numeric default null,
+  p_max_amount numeric default null,
+  p_member     uuid    default null,
+  p_category   uuid    default null,
+  p_is_paid    boolean default null,
+  p_limit      int     default 25,
+  p_offset     int     default 0
+)
+returns table (
+  id uuid, occurred_at date, due_date date, type text, description text,
+  planned_amount numeric, paid_amount numeric, is_paid boolean,
+  member_id uuid, category_id uuid, attachment_url text,
+  rank real, headline text, total_count bigint
+)
+language sql
+stable
+security invoker
+as $$
+  with q as (
+    select nullif(btrim(coalesce(p_query, '')), '') as raw
+  ), qq as (
+    select raw,
+           case when raw is null then null
+                else websearch_to_tsquery('public.ff_pt'::regconfig, raw) end as ts,
+           public.ff_unaccent(lower(coalesce(raw, ''))) as norm
+      from q
+  ), hits as (
+    select t.id, t.occurred_at, t.due_date, t.type, t.description,
+           t.planned_amount, t.paid_amount, t.is_paid, t.member_id, t.category_id, t.attachment_url,
+           case when qq.raw is null then 0::real
+                else (ts_rank_cd(t.search_tsv, qq.ts)
+                      + word_similarity(qq.norm, public.ff_unaccent(lower(t.description))))::real
+           end as rank,
+           count(*) over () as total_count
+      from public.transactions t, qq
+     where t.household_id = p_household
+       and (p_start      is null or t.occurred_at    >= p_start)
+       and (p_end        is null or t.occurred_at    <= p_end)
+       and (p_min_amount is null or t.planned_amount >= p_min_amount)
+       and (p_max_amount is null or t.planned_amount <= p_max_amount)
+       and (p_member     is null or t.member_id       = p_member)
+       and (p_category   is null or t.category_id     = p_category)
+       and (p_is_paid    is null or coalesce(t.is_paid, false) = p_is_paid)
+       and (qq.raw is null
+            or t.search_tsv @@ qq.ts
+            or qq.norm <% public.ff_unaccent(lower(t.description))
+            or public.ff_unaccent(lower(t.description)) like '%' || qq.norm || '%')
+     order by rank desc, t.occurred_at desc, t.id
+     limit least(greatest(coalesce(p_limit, 25), 1), 200)
+    offset greatest(coalesce(p_offset, 0), 0)
+  )
+  -- ts_headline só nas linhas da página
+  select h.id, h.occurred_at, h.due_date, h.type, h.description,
+         h.planned_amount, h.paid_amount, h.is_paid, h.member_id, h.category_id, h.attachment_url,
+         h.rank,
+         case when qq.raw is null or h.description is null then h.description
+              else ts_headline('public.ff_pt'::regconfig, h.description, qq.ts,
+                               'StartSel=[[, StopSel=]], HighlightAll=true')
+         end as headline,
+         h.total_count
+    from hits h, qq
+   order by h.rank desc, h.occurred_at desc, h.id;
+$$;
+
+grant execute on function public.search_transactions(uuid, text, date, date, numeric, numeric, uuid, uuid, boolean, int, int)
+  to authenticated;
+
+commit;
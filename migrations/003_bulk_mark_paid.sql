@@ -0,0 +1,32 @@
+-- migrations/003_bulk_mark_paid.sql
+-- RPC mark_transactions_paid: baixa de vários lançamentos num único round trip.
+--
+-- p_items é um array JSON [{"id": uuid, "amount": numeric, "paid_at": date}, ...];
+-- amount nulo usa o previsto (planned_amount, ou amount nos lançamentos antigos)
+-- e paid_at nulo usa a data de hoje. Um único UPDATE ... FROM jsonb_to_recordset,
+-- em vez de N chamadas a mark_transaction_paid.
+--
+-- Devolve só as linhas realmente atualizadas (id + campos de pagamento); ids de
+-- outro household ou inexistentes somem pelo RLS (SECURITY INVOKER) e não voltam.
+
+begin;
+
+create or replace function public.mark_transactions_paid(p_items jsonb)
+returns table (id uuid, is_paid boolean, paid_amount numeric, paid_at date)
+language sql
+volatile
+security invoker
+as $$
+  update public.transactions t
+     set is_paid     = true,
+         paid_amount = coalesce(x.amount, t.planned_amount, t.amount),
+         paid_at     = coalesce(x.paid_at, current_date)
+    from jsonb_to_recordset(coalesce(p_items, '[]'::jsonb))
+         as x(id uuid, amount numeric, paid_at date)
+   where t.id = x.id
+  returning t.id, t.is_paid, t.paid_amount, t.paid_at;
+$$;
+
+grant execute on function public.mark_transactions_paid(jsonb) to authenticated;
+
+commit;
@@ -0,0 +1,29 @@
+-- migrations/004_realtime.sql
+-- Supabase Realtime para o feed de mudanças por household (changefeed.py).
+--
+-- * As tabelas cacheadas pelo app entram na publicação supabase_realtime;
+--   o canal filtra por household_id=eq.<id> e o Realtime aplica o RLS com o
+--   JWT do usuário (as mesmas policies das consultas).
+-- * REPLICA IDENTITY FULL: UPDATE/DELETE trazem a linha antiga inteira. O app
+--   compara occurred_at/due_date/valor antigos e novos para decidir entre
+--   patch no cache e invalidação, e o DELETE precisa do household_id para o filtro.
+
+begin;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['transactions', 'members', 'categories', 'accounts', 'credit_cards', 'budgets']
+  loop
+    execute format('alter table public.%I replica identity full', t);
+    if not exists (
+      select 1 from pg_publication_tables
+       where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = t
+    ) then
+      execute format('alter publication supabase_realtime add table public.%I', t);
+    end if;
+  end loop;
+end $$;
+
+commit;
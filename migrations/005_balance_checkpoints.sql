@@ -0,0 +1,275 @@
+-- migrations/005_balance_checkpoints.sql
+-- Saldo diário por conta a partir de checkpoints mensais.
+--
+-- Saldo da conta = opening_balance + lançamentos pagos da conta (cartão fica de
+-- fora), na data coalesce(paid_at, occurred_at): receita soma, despesa subtrai,
+-- pelo valor pago (ou previsto).
+--
+-- * account_balance_checkpoints guarda o saldo de fim de mês de cada conta
+--   (meses fechados). O saldo de qualquer dia = checkpoint anterior ao
+--   intervalo + varredura curta dos lançamentos desde então: O(janela), não
+--   O(histórico).
+-- * Gravações em transactions (inclusive retroativas) marcam a conta como
+--   "suja" a partir do mês afetado (trigger); refresh_balance_checkpoints()
+--   recalcula só desse mês em diante, partindo do checkpoint anterior.
+--   Trocar opening_balance descarta os checkpoints da conta.
+-- * account_balance_series(): série por dia (p_step 'day') ou só os fins de
+--   mês (p_step 'month', direto dos checkpoints) para gráficos de anos.
+
+begin;
+
+create table if not exists public.account_balance_checkpoints (
+  account_id   uuid not null references public.accounts(id) on delete cascade,
+  household_id uuid not null,
+  month        date not null,            -- 1º dia do mês
+  balance      numeric(14, 2) not null,  -- saldo no fim do mês
+  updated_at   timestamptz not null default now(),
+  primary key (account_id, month)
+);
+create index if not exists account_balance_checkpoints_hh_idx
+  on public.account_balance_checkpoints (household_id, month);
+
+create table if not exists public.account_balance_dirty (
+  account_id   uuid primary key references public.accounts(id) on delete cascade,
+  household_id uuid not null,
+  from_month   date not null
+);
+
+alter table public.account_balance_checkpoints enable row level security;
+alter table public.account_balance_dirty enable row level security;
+
+drop policy if exists account_balance_checkpoints_select on public.account_balance_checkpoints;
+create policy account_balance_checkpoints_select on public.account_balance_checkpoints
+  for select to authenticated
+  using (exists (select 1 from public.members m
+                  where m.household_id = account_balance_checkpoints.household_id
+                    and m.user_id = auth.uid()));
+grant select on public.account_balance_checkpoints to authenticated;
+-- escrita só pelas funções abaixo (security definer)
+
+-- Varredura por conta e data efetiva (índice local em cada partição)
+create index if not exists transactions_account_paid_day_idx
+  on public.transactions (account_id, (coalesce(paid_at, occurred_at)))
+  where is_paid;
+
+-- =========================
+-- Marcação de contas sujas (triggers)
+-- =========================
+create or replace function public.ff_balance_mark_dirty(p_household uuid, p_account uuid, p_day date)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+  insert into public.account_balance_dirty as d (account_id, household_id, from_month)
+  select p_account, p_household, date_trunc('month', p_day)::date
+   where p_account is not null
+     and p_day is not null
+     and p_day < date_trunc('month', current_date)  -- mês corrente não tem checkpoint
+  on conflict (account_id) do update
+    set from_month = least(d.from_month, excluded.from_month);
+$$;
+
+create or replace function public.ff_transactions_balance_dirty()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.is_paid then
+    perform public.ff_balance_mark_dirty(old.household_id, old.account_id, coalesce(old.paid_at, old.occurred_at));
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.is_paid then
+    perform public.ff_balance_mark_dirty(new.household_id, new.account_id, coalesce(new.paid_at, new.occurred_at));
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists transactions_balance_dirty on public.transactions;
+create trigger transactions_balance_dirty
+  after insert or update or delete on public.transactions
+  for each row execute function public.ff_transactions_balance_dirty();
+
+create or replace function public.ff_accounts_balance_reset()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  delete from public.account_balance_checkpoints where account_id = new.id;
+  delete from public.account_balance_dirty where account_id = new.id;
+  return null;
+end;
+$$;
+
+drop trigger if exists accounts_balance_reset on public.accounts;
+create trigger accounts_balance_reset
+  after update of opening_balance on public.accounts
+  for each row when (old.opening_balance is distinct from new.opening_balance)
+  execute function public.ff_accounts_balance_reset();
+
+-- =========================
+-- Recalcular checkpoints (incremental)
+-- =========================
+create or replace function public.refresh_balance_checkpoints(p_household uuid)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  a        record;
+  v_last   date := (date_trunc('month', current_date) - interval '1 month')::date;
+  v_from   date;
+  v_base   numeric;
+  v_rows   integer;
+  v_total  integer := 0;
+begin
+  if not exists (select 1 from public.members m
+                  where m.household_id = p_household and m.user_id = auth.uid()) then
+    raise exception 'sem acesso ao household %', p_household using errcode = '42501';
+  end if;
+
+  for a in
+    select ac.id, coalesce(ac.opening_balance, 0) as opening, d.from_month,
+           (select max(c.month) from public.account_balance_checkpoints c where c.account_id = ac.id) as last_cp,
+           (select min(coalesce(t.paid_at, t.occurred_at)) from public.transactions t
+             where t.account_id = ac.id and t.is_paid
+               and coalesce(t.payment_method, 'account') <> 'card') as first_day
+      from public.accounts ac
+      left join public.account_balance_dirty d on d.account_id = ac.id
+     where ac.household_id = p_household
+  loop
+    if a.last_cp is null then
+      v_from := date_trunc('month', a.first_day)::date;          -- primeira vez: desde o 1º lançamento
+    else
+      v_from := least(a.from_month, (a.last_cp + interval '1 month')::date);
+    end if;
+
+    if v_from is not null and v_from <= v_last then
+      select c.balance into v_base
+        from public.account_balance_checkpoints c
+       where c.account_id = a.id and c.month = (v_from - interval '1 month')::date;
+      v_base := coalesce(v_base, a.opening);
+
+      insert into public.account_balance_checkpoints as c (account_id, household_id, month, balance, updated_at)
+      select a.id, p_household, m.month,
+             v_base + sum(coalesce(mv.delta, 0)) over (order by m.month),
+             now()
+        from generate_series(v_from, v_last, interval '1 month') as g(m)
+        cross join lateral (select g.m::date as month) m
+        left join (
+          select date_trunc('month', coalesce(t.paid_at, t.occurred_at))::date as month,
+                 sum(case when t.type = 'income' then 1 else -1 end
+                     * coalesce(t.paid_amount, t.planned_amount, t.amount, 0)) as delta
+            from public.transactions t
+           where t.account_id = a.id and t.is_paid
+             and coalesce(t.payment_method, 'account') <> 'card'
+             and coalesce(t.paid_at, t.occurred_at) >= v_from
+             and coalesce(t.paid_at, t.occurred_at) < (v_last + interval '1 month')
+           group by 1
+        ) mv on mv.month = m.month
+      on conflict (account_id, month) do update
+        set balance = excluded.balance, updated_at = now();
+      get diagnostics v_rows = row_count;
+      v_total := v_total + v_rows;
+    end if;
+
+    delete from public.account_balance_dirty where account_id = a.id;
+  end loop;
+  return v_total;
+end;
+$$;
+
+grant execute on function public.refresh_balance_checkpoints(uuid) to authenticated;
+
+-- =========================
+-- Série de saldos
+-- =========================
+create or replace function public.account_balance_series(
+  p_household uuid,
+  p_start     date,
+  p_end       date,
+  p_step      text default 'day'
+)
+returns table (account_id uuid, day date, balance numeric)
+language plpgsql
+volatile
+security invoker
+as $$
+begin
+  perform public.refresh_balance_checkpoints(p_household);
+
+  if p_step = 'month' then
+    -- fins de mês direto dos checkpoints; o mês corrente vem da série diária (até hoje)
+    return query
+      select c.account_id, (c.month + interval '1 month' - interval '1 day')::date, c.balance
+        from public.account_balance_checkpoints c
+       where c.household_id = p_household
+         and c.month >= date_trunc('month', p_start)::date
+         and (c.month + interval '1 month' - interval '1 day')::date <= p_end
+      union all
+      select s.account_id, s.day, s.balance
+        from public.account_balance_series(p_household, least(p_end, current_date),
+                                           least(p_end, current_date), 'day') s
+       where p_end >= date_trunc('month', current_date)::date
+      order by 1, 2;
+    return;
+  end if;
+
+  return query
+    with base as (
+      -- último checkpoint antes do mês de p_start (ou o saldo inicial)
+      select ac.id as account_id,
+             coalesce(cp.balance, coalesce(ac.opening_balance, 0)) as balance,
+             coalesce((cp.month + interval '1 month')::date, '-infinity'::date) as since
+        from public.accounts ac
+        left join lateral (
+          select c.month, c.balance from public.account_balance_checkpoints c
+           where c.account_id = ac.id and c.month < date_trunc('month', p_start)::date
+           order by c.month desc limit 1
+        ) cp on true
+       where ac.household_id = p_household
+    ), mv as (
+      select b.account_id, coalesce(t.paid_at, t.occurred_at) as day,
+             sum(case when t.type = 'income' then 1 else -1 end
+                 * coalesce(t.paid_amount, t.planned_amount, t.amount, 0)) as delta
+        from base b
+        join public.transactions t on t.account_id = b.account_id
+       where t.is_paid
+         and coalesce(t.payment_method, 'account') <> 'card'
+         and coalesce(t.paid_at, t.occurred_at) >= b.since
+         and coalesce(t.paid_at, t.occurred_at) <= p_end
+       group by 1, 2
+    ), antes as (
+      select mv.account_id, sum(mv.delta) as delta from mv where mv.day < p_start group by 1
+    )
+    select b.account_id, d.day::date,
+           b.balance + coalesce(an.delta, 0)
+             + sum(coalesce(mv.delta, 0)) over (partition by b.account_id order by d.day)
+      from base b
+      cross join generate_series(p_start, p_end, interval '1 day') as d(day)
+      left join antes an on an.account_id = b.account_id
+      left join mv on mv.account_id = b.account_id and mv.day = d.day::date
+     order by 1, 2;
+end;
+$$;
+
+grant execute on function public.account_balance_series(uuid, date, date, text) to authenticated;
+
+-- Checkpoints iniciais de todos os households
+do $$
+declare
+  h record;
+begin
+  for h in select id from public.households loop
+    insert into public.account_balance_dirty (account_id, household_id, from_month)
+    select ac.id, ac.household_id, '0001-01-01'::date from public.accounts ac where ac.household_id = h.id
+    on conflict (account_id) do nothing;
+  end loop;
+end $$;
+
+commit;
@@ -0,0 +1,56 @@
+-- migrations/006_multi_currency.sql
+-- Lançamentos em outra moeda.
+--
+-- * accounts.currency já existe (o app gravava sempre 'BRL'); passa a valer
+--   o que a conta escolher (código ISO 4217).
+-- * transactions.currency: moeda do valor do lançamento. Sem valor informado,
+--   herda a da conta (trigger); sem conta (cartão), BRL. Lançamento pago pela
+--   conta tem de estar na moeda dela (o saldo soma os valores sem converter);
+--   moeda diferente só no cartão, que não entra no saldo.
+-- * As cotações não ficam no banco: o app guarda a tabela diária localmente
+--   (fx.py, importada de CSV) e converte na hora de agregar.
+
+begin;
+
+alter table public.accounts
+  alter column currency set default 'BRL';
+update public.accounts set currency = 'BRL' where currency is null;
+
+alter table public.transactions
+  add column if not exists currency text;
+
+create or replace function public.ff_transactions_currency()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_acc text;
+begin
+  select upper(a.currency) into v_acc from public.accounts a where a.id = new.account_id;
+  new.currency := upper(coalesce(new.currency, v_acc, 'BRL'));
+  if v_acc is not null and coalesce(new.payment_method, 'account') <> 'card' and new.currency <> v_acc then
+    raise exception 'lançamento em % numa conta em %: use a moeda da conta', new.currency, v_acc
+      using errcode = '23514';
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists transactions_currency on public.transactions;
+create trigger transactions_currency
+  before insert or update of currency, account_id, payment_method on public.transactions
+  for each row execute function public.ff_transactions_currency();
+
+-- lançamentos existentes: a moeda da conta (hoje sempre BRL)
+update public.transactions t
+   set currency = coalesce(a.currency, 'BRL')
+  from public.accounts a
+ where t.currency is null and a.id = t.account_id;
+update public.transactions set currency = 'BRL' where currency is null;
+
+-- sem default na coluna: o default entraria antes do trigger e a conta não seria herdada
+alter table public.transactions
+  alter column currency set not null,
+  add constraint transactions_currency_iso check (currency ~ '^[A-Z]{3}$');
+
+commit;
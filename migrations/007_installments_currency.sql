@@ -0,0 +1,69 @@
+-- migrations/007_installments_currency.sql
+-- create_installments com moeda (p_currency).
+--
+-- A versão anterior não recebia moeda: uma compra parcelada em USD no cartão
+-- era gravada sem currency e o trigger da migração 006 a tornava BRL (ou a
+-- moeda da conta). Recria a RPC com p_currency (nulo = herda, como antes); a
+-- regra de moeda da conta continua no trigger ff_transactions_currency.
+--
+-- Parcelas: total dividido em centavos (o resto vai para as primeiras), uma por
+-- mês a partir de p_first_due (dia limitado ao fim do mês), descrição "(i/n)".
+-- SECURITY INVOKER: o RLS de transactions vale para o insert.
+
+begin;
+
+-- remove as assinaturas antigas (sem p_currency): com as duas, a chamada do
+-- PostgREST por nome ficaria ambígua
+do $$
+declare
+  f regprocedure;
+begin
+  for f in
+    select p.oid::regprocedure from pg_proc p
+     where p.proname = 'create_installments' and p.pronamespace = 'public'::regnamespace
+  loop
+    execute format('drop function %s', f);
+  end loop;
+end $$;
+
+create function public.create_installments(
+  p_household      uuid,
+  p_member         uuid,
+  p_account        uuid,
+  p_category       uuid,
+  p_desc           text,
+  p_total          numeric,
+  p_n              integer,
+  p_first_due      date,
+  p_payment_method text default null,
+  p_card_id        uuid default null,
+  p_currency       text default null
+)
+returns setof public.transactions
+language sql
+volatile
+security invoker
+as $$
+  with p as (
+    select i,
+           (floor(round(p_total * 100) / p_n) + case when i <= (round(p_total * 100)::bigint % p_n) then 1 else 0 end)
+             / 100.0 as v,
+           (p_first_due + make_interval(months => i - 1))::date as d
+      from generate_series(1, greatest(p_n, 1)) as g(i)
+  )
+  insert into public.transactions
+    (household_id, member_id, account_id, category_id, type, amount, planned_amount,
+     occurred_at, due_date, description, payment_method, card_id, created_by, currency)
+  select p_household, p_member, p_account, p_category, 'expense', p.v, p.v,
+         p.d, p.d, format('%s (%s/%s)', p_desc, p.i, p_n), p_payment_method, p_card_id,
+         auth.uid(), upper(p_currency)
+    from p
+   order by p.i
+  returning *;
+$$;
+
+grant execute on function
+  public.create_installments(uuid, uuid, uuid, uuid, text, numeric, integer, date, text, uuid, text)
+  to authenticated;
+
+commit;
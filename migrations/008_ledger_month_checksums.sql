@@ -0,0 +1,32 @@
+-- migrations/008_ledger_month_checksums.sql
+-- Checksum por mês do livro do household, para o snapshot analítico (analytics.py).
+--
+-- O snapshot Parquet é guardado por mês. Depois de uma mudança, o app compara
+-- estes checksums com os do snapshot e rebusca só os meses diferentes (inclui
+-- edições retroativas, exclusões e gravações de outras sessões), em vez de
+-- paginar o histórico inteiro. Uma linha por mês: um round trip pequeno.
+--
+-- O checksum cobre as colunas que o snapshot usa; só é comparado com ele mesmo.
+
+begin;
+
+create or replace function public.ledger_month_checksums(p_household uuid)
+returns table (month date, n bigint, checksum numeric)
+language sql
+stable
+security invoker
+as $$
+  select date_trunc('month', t.occurred_at)::date,
+         count(*),
+         sum(hashtextextended(concat_ws('|', t.id, t.member_id, t.category_id, t.account_id, t.type,
+                                        t.description, t.occurred_at, t.due_date, t.amount,
+                                        t.planned_amount, t.paid_amount, t.is_paid, t.currency), 0))
+    from public.transactions t
+   where t.household_id = p_household
+   group by 1
+   order by 1;
+$$;
+
+grant execute on function public.ledger_month_checksums(uuid) to authenticated;
+
+commit;
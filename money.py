@@ -0,0 +1,124 @@
+# money.py
+"""
+Valores monetários como centavos inteiros (int64) em arrays NumPy.
+
+Somar floats linha a linha (sum(t["planned_amount"] ...)) acumula erro de
+representação — totais "R$ 1.234,5699999" — e é lento em Python puro. Aqui a
+conversão decimal acontece só na borda: o JSON do Supabase / number_input
+viram centavos uma vez (cents, planned, effective), as agregações são somas
+inteiras exatas (np.sum, group_sum) e a volta para reais é só para exibir,
+plotar ou gravar (to_reais, brl).
+
+    c = money.effective(rows, signed=True)       # int64, receita +, despesa -
+    total = money.brl(c.sum())                   # "R$ 1.234,56"
+    df["Valor"] = money.brl(money.cents(df["valor"]))   # coluna inteira, sem laço Python
+"""
+from __future__ import annotations
+from typing import Any, Dict, Hashable, Iterable, Sequence, Union
+
+import numpy as np
+
+Cents = Union[int, np.ndarray]
+
+
+# =========================
+# Borda: reais <-> centavos
+# =========================
+def cents(values: Iterable[Any]) -> np.ndarray:
+    """Reais (float, int, str numérica, Decimal, None) -> int64 centavos; None/NaN viram 0."""
+    if not isinstance(values, (np.ndarray, list, tuple)):
+        values = list(values) if not hasattr(values, "to_numpy") else values.to_numpy()
+    x = np.asarray(values, dtype=np.float64)
+    # v*100 em float64 erra bem menos que meio centavo até ~10^13 reais: o rint é exato
+    return np.rint(np.nan_to_num(x, nan=0.0) * 100).astype(np.int64)
+
+
+def to_cents(v: Any) -> int:
+    """Escalar: reais -> centavos (None/vazio = 0)."""
+    try:
+        x = float(v if v not in (None, "") else 0)
+    except (TypeError, ValueError):
+        return 0
+    return 0 if x != x else int(round(x * 100))  # round() = rint: meio centavo vai para o par
+
+
+def to_reais(c: Cents):
+    """Centavos -> reais (float) para gráfico, JSON e number_input."""
+    if isinstance(c, np.ndarray):
+        return c / 100.0
+    return int(c) / 100.0
+
+
+def normalize(v: Any) -> float:
+    """Valor digitado -> reais arredondados ao centavo (o que é gravado no banco)."""
+    return to_reais(to_cents(v))
+
+
+# =========================
+# Transações
+# =========================
+def planned(rows: Sequence[dict]) -> np.ndarray:
+    """Previsto de cada linha (planned_amount; lançamentos antigos só têm amount)."""
+    return cents([r.get("planned_amount") if r.get("planned_amount") is not None else r.get("amount")
+                  for r in rows])
+
+
+def effective(rows: Sequence[dict], signed: bool = False) -> np.ndarray:
+    """Valor efetivo: pago (se pago e informado), senão previsto; signed: receita +, o resto -."""
+    plan = planned(rows)
+    paid = cents([r.get("paid_amount") for r in rows])
+    use_paid = np.fromiter((bool(r.get("is_paid")) and r.get("paid_amount") is not None for r in rows),
+                           dtype=bool, count=len(rows))
+    eff = np.where(use_paid, paid, plan)
+    if signed:
+        income = np.fromiter((r.get("type") == "income" for r in rows), dtype=bool, count=len(rows))
+        eff = np.where(income, eff, -eff)
+    return eff
+
+
+def group_sum(keys: Sequence[Hashable], values: np.ndarray) -> Dict[Hashable, int]:
+    """Soma exata por chave (ordem da primeira ocorrência)."""
+    index: Dict[Hashable, int] = {}
+    codes = np.fromiter((index.setdefault(k, len(index)) for k in keys), dtype=np.int64, count=len(keys))
+    out = np.zeros(len(index), dtype=np.int64)
+    np.add.at(out, codes, np.asarray(values, dtype=np.int64))
+    return {k: int(out[i]) for k, i in index.items()}
+
+
+# =========================
+# Formatação
+# =========================
+def brl(c: Cents):
+    """
+    Centavos -> "R$ 1.234,56" (negativo: "R$ -1.234,56", como o to_brl).
+    Aceita escalar (devolve str) ou array/coluna (devolve array de str, sem laço Python).
+    """
+    if np.ndim(c) == 0:
+        reais, cent = divmod(abs(int(c)), 100)
+        return f"R$ {'-' if int(c) < 0 else ''}{reais:,}".replace(",", ".") + f",{cent:02d}"
+    arr = np.asarray(c, dtype=np.int64)
+    if arr.size == 0:
+        return np.array([], dtype=object)
+    a = np.abs(arr)
+    reais, cent = a // 100, a % 100
+
+    # grupos de milhar de trás para frente, todos com 3 dígitos; depois tira os zeros à esquerda
+    s = np.char.zfill((reais % 1000).astype(str), 3)
+    r = reais // 1000
+    while (r > 0).any():
+        head = np.char.add(np.char.zfill((r % 1000).astype(str), 3), ".")
+        s = np.where(r > 0, np.char.add(head, s), s)
+        r = r // 1000
+    s = np.char.lstrip(s, "0")
+    s = np.where(s == "", "0", s)
+
+    sign = np.where(arr < 0, "R$ -", "R$ ")
+    out = np.char.add(np.char.add(np.char.add(sign, s), ","), np.char.zfill(cent.astype(str), 2))
+    return out.astype(object)
+
+
+def brl_delta(c: int) -> str:
+    """Variação para o delta do st.metric: sinal antes ("-R$ 12,00", "+R$ 12,00"), que é o que decide a seta."""
+    c = int(c)
+    return ("-" if c < 0 else "+") + brl(abs(c))
+
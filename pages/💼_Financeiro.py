@@ -1,11 +1,24 @@
 # pages/💼_Financeiro.py
 from __future__ import annotations
 from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
 import uuid
 import os
 import streamlit as st
 import pandas as pd
-from utils import to_brl, _to_date_safe, fetch_categories, fetch_accounts, fetch_cards, fetch_tx, fetch_tx_due
+import perf
+import charts
+import export
+import categorizer
+import changefeed
+import loader
+import money
+import reconcile
+import scenarios
+import balances
+import fx
+from utils import (_to_date_safe, fetch_tx, fetch_categories, fetch_accounts, fetch_cards, fetch_members, fetch_tx_due,
+                   fetch_tx_page, TX_SORT_COLUMNS, search_transactions, highlight_html, patch_cached_transactions)
 
 # Acessa o cliente Supabase e IDs do household/membro da sessão
 if "sb" not in st.session_state or "HOUSEHOLD_ID" not in st.session_state or "MY_MEMBER_ID" not in st.session_state or "user" not in st.session_state:
@@ -17,33 +30,46 @@ HOUSEHOLD_ID = st.session_state.HOUSEHOLD_ID
 MY_MEMBER_ID = st.session_state.MY_MEMBER_ID
 user = st.session_state.user
 
+perf.begin_rerun("Financeiro")
+changefeed.watch(sb, HOUSEHOLD_ID)
 st.title("💼 Financeiro")
-tabs = st.tabs(["Lançamentos","Movimentações","Receitas/Despesas fixas","Orçamentos","Fluxo de caixa"])
+# Abas preguiçosas: só a aba aberta roda; cada uma é um fragmento (interação reroda só a aba)
+tabs = st.tabs(["Lançamentos","Movimentações","Receitas/Despesas fixas","Orçamentos","Fluxo de caixa","Busca","Conciliação"], key="fin_tabs", on_change="rerun")
 
 # Lançamentos
-with tabs[0]:
+@perf.fragment("Financeiro", "financeiro.lancamentos")
+def _lancamentos():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("➕ Lançar")
 
-    cats = fetch_categories(sb, HOUSEHOLD_ID)
-    cat_map = {c["name"]: c for c in cats}
-    accs = fetch_accounts(sb, HOUSEHOLD_ID, True)
-    acc_map = {a["name"]: a for a in accs}
-    cards = fetch_cards(sb, HOUSEHOLD_ID, True)
-    card_map = {c["name"]: c for c in cards}
+    dados = loader.load(cats=(fetch_categories, sb, HOUSEHOLD_ID), accs=(fetch_accounts, sb, HOUSEHOLD_ID, True),
+                    cards=(fetch_cards, sb, HOUSEHOLD_ID, True))
+    cat_map = {c["name"]: c for c in dados["cats"]}
+    acc_map = {a["name"]: a for a in dados["accs"]}
+    card_map = {c["name"]: c for c in dados["cards"]}
+
+    # Descrição fora do form: ao confirmar o texto a categoria já vem sugerida pelo histórico
+    desc = st.text_input("Descrição", key="lc_desc")
+    sug_id, conf = categorizer.suggest(sb, HOUSEHOLD_ID, desc) if desc.strip() else (None, 0.0)
+    nomes = list(cat_map.keys())
+    sug_nome = next((n for n in nomes if cat_map[n]["id"] == sug_id), None)
+    if sug_nome:
+        st.caption(f"🤖 Categoria sugerida pelo histórico: {sug_nome} ({conf:.0%})")
 
     with st.form("quick_tx"):
         col1,col2 = st.columns(2)
         with col1:
             tipo = st.selectbox("Tipo", ["income","expense"], index=1, format_func=lambda x: {"income":"Receita","expense":"Despesa"}[x])
-            cat = st.selectbox("Categoria", list(cat_map.keys()) or ["Mercado"])
-            desc = st.text_input("Descrição")
+            cat = st.selectbox("Categoria", nomes or ["Mercado"], index=nomes.index(sug_nome) if sug_nome else 0)
             data = st.date_input("Data", value=date.today())
             due = st.date_input("Vencimento", value=date.today())
         with col2:
             val = st.number_input("Valor", min_value=0.0, step=10.0)
             method = st.selectbox("Forma de pagamento", ["account","card"], index=0, format_func=lambda x: "Conta" if x=="account" else "Cartão")
             acc = st.selectbox("Conta", list(acc_map.keys()) or ["Conta Corrente"])
+            moeda = st.selectbox("Moeda", ["Da conta"] + fx.currencies(),
+                                 help="Sem escolha, vale a moeda da conta (BRL no cartão). Outra moeda só no cartão: "
+                                      "o saldo da conta é somado na moeda dela.")
             card_name = st.selectbox("Cartão (se aplicável)", ["—"] + list(card_map.keys()))
             parcelado = st.checkbox("Parcelado? (somente despesa)")
             n_parc = st.number_input("Nº parcelas", min_value=2, max_value=36, value=2, disabled=not (parcelado and tipo=="expense"))
@@ -52,7 +78,10 @@ with tabs[0]:
             boleto = st.file_uploader("Anexar boleto (PDF/JPG/PNG) — opcional", type=["pdf","jpg","jpeg","png"])
         ok = st.form_submit_button("Lançar")
 
-        if ok:
+        if ok and moeda != "Da conta" and method != "card" and moeda != ((acc_map.get(acc) or {}).get("currency") or fx.REPORTING):
+            st.error(f"A conta {acc} é em {(acc_map.get(acc) or {}).get('currency') or fx.REPORTING}: "
+                     "lançamentos pela conta usam a moeda dela (outra moeda só no cartão).")
+        elif ok:
             try:
                 cat_id = (cat_map.get(cat) or {}).get("id")
                 acc_id = (acc_map.get(acc) or {}).get("id")
@@ -69,21 +98,23 @@ with tabs[0]:
                     attachment_url = sb.storage.from_("boletos").get_public_url(key)
 
                 if tipo=="expense" and parcelado:
-                    sb.rpc("create_installments", {
+                    novos = sb.rpc("create_installments", {
                         "p_household": HOUSEHOLD_ID,
                         "p_member": MY_MEMBER_ID,
                         "p_account": acc_id,
                         "p_category": cat_id,
                         "p_desc": desc,
-                        "p_total": val,
+                        "p_total": money.normalize(val),
                         "p_n": int(n_parc),
                         "p_first_due": due.isoformat(),
                         "p_payment_method": method,
-                        "p_card_id": card_id
-                    }).execute()
+                        "p_card_id": card_id,
+                        # só com moeda escolhida: sem a migração 007 o parcelado comum segue funcionando
+                        **({"p_currency": moeda} if moeda != "Da conta" else {}),
+                    }).execute().data
                 else:
-                    planned = val
-                    sb.table("transactions").insert({
+                    planned = val = money.normalize(val)
+                    novos = sb.table("transactions").insert({
                         "household_id": HOUSEHOLD_ID,
                         "member_id": MY_MEMBER_ID,
                         "account_id": acc_id,
@@ -97,20 +128,96 @@ with tabs[0]:
                         "payment_method": method,
                         "card_id": card_id,
                         "attachment_url": attachment_url,
-                        "created_by": user.id
-                    }).execute()
-                st.toast("✅ Lançamento registrado!", icon="✅"); st.cache_data.clear(); st.rerun()
+                        "created_by": user.id,
+                        **({"currency": moeda} if moeda != "Da conta" else {}),
+                    }).execute().data
+                categorizer.learn(HOUSEHOLD_ID, novos if isinstance(novos, list) else [])
+                st.toast("✅ Lançamento registrado!", icon="✅")
+                changefeed.changed(HOUSEHOLD_ID, rows=novos if isinstance(novos, list) else None); st.rerun()
             except Exception as e:
                 st.error(f"Falha: {e}")
     st.markdown('</div>', unsafe_allow_html=True)
 
+with tabs[0]:
+    if tabs[0].open:
+        _lancamentos()
+
+def _previsto(row: dict) -> float:
+    return float(row.get("planned_amount") if row.get("planned_amount") is not None else row.get("amount") or 0.0)
+
+def _baixar(itens: list) -> int:
+    """
+    Baixa em lote: um único round trip (RPC mark_transactions_paid, migração 003)
+    e as linhas devolvidas são aplicadas sobre o cache — sem st.cache_data.clear().
+    """
+    rows = sb.rpc("mark_transactions_paid", {"p_items": itens}).execute().data or []
+    patch_cached_transactions(HOUSEHOLD_ID, rows)
+    return len(rows)
+
 # Movimentações (pagamento + anexo)
-with tabs[1]:
+@perf.fragment("Financeiro", "financeiro.movimentacoes")
+def _movimentacoes():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("📋 Movimentações")
     ini = st.date_input("Início", value=date.today().replace(day=1), key="mv_ini")
     fim = st.date_input("Fim", value=date.today(), key="mv_fim")
-    tx = fetch_tx(sb, HOUSEHOLD_ID, ini, fim)
+
+    with st.expander("⬇️ Exportar período", expanded=False):
+        ex1, ex2 = st.columns([2, 1])
+        with ex1:
+            fmt = st.selectbox("Formato", list(export.FORMATS), format_func=str.upper, key="mv_export_fmt")
+        with ex2:
+            st.write("")
+            if st.button("Gerar arquivo", key="mv_export_btn", use_container_width=True):
+                try:
+                    prev = st.session_state.pop("mv_export", None)
+                    if prev and os.path.exists(prev[1]):
+                        os.remove(prev[1])
+                    with st.spinner("Exportando..."):
+                        st.session_state["mv_export"] = (fmt, export.export_to_tempfile(sb, HOUSEHOLD_ID, fmt, ini, fim))
+                except Exception as e:
+                    st.error(f"Falha ao exportar: {e}")
+        ready = st.session_state.get("mv_export")
+        if ready and os.path.exists(ready[1]):
+            with open(ready[1], "rb") as f:
+                st.download_button(
+                    f"Baixar {ready[0].upper()}", f,
+                    file_name=f"transacoes_{ini.isoformat()}_{fim.isoformat()}{export.FORMATS[ready[0]][1]}",
+                    mime=export.FORMATS[ready[0]][0], key="mv_export_dl"
+                )
+
+    # Navegador paginado: filtro, ordenação e página resolvidos no banco
+    fl1, fl2, fl3, fl4, fl5 = st.columns([3, 1.2, 1.2, 1.4, 1])
+    with fl1:
+        busca = st.text_input("Buscar na descrição", key="mv_busca").strip()
+    with fl2:
+        f_tipo = st.selectbox("Tipo", [None, "income", "expense"], key="mv_tipo",
+                              format_func=lambda x: {None: "Todos", "income": "Receita", "expense": "Despesa"}[x])
+    with fl3:
+        f_pago = st.selectbox("Pagamento", [None, True, False], key="mv_pago",
+                              format_func=lambda x: {None: "Todos", True: "Pagos", False: "Em aberto"}[x])
+    with fl4:
+        ordem = st.selectbox("Ordenar por", list(TX_SORT_COLUMNS), key="mv_ordem")
+        decresc = st.toggle("Decrescente", value=True, key="mv_desc")
+    with fl5:
+        por_pagina = st.selectbox("Por página", [25, 50, 100], index=1, key="mv_pp")
+
+    # filtros/ordem novos voltam para a 1ª página
+    assinatura = (ini, fim, busca, f_tipo, f_pago, ordem, decresc, por_pagina)
+    if st.session_state.get("mv_assinatura") != assinatura:
+        st.session_state["mv_assinatura"] = assinatura
+        st.session_state["mv_pagina"] = 1
+
+    pagina = int(st.session_state.get("mv_pagina", 1))
+    res = fetch_tx_page(sb, HOUSEHOLD_ID, ini, fim, pagina - 1, por_pagina, TX_SORT_COLUMNS[ordem], decresc,
+                        f_tipo, f_pago, busca)
+    total = res["total"]
+    n_paginas = max(1, -(-total // por_pagina))
+    if pagina > n_paginas:
+        st.session_state["mv_pagina"] = pagina = n_paginas
+        res = fetch_tx_page(sb, HOUSEHOLD_ID, ini, fim, pagina - 1, por_pagina, TX_SORT_COLUMNS[ordem], decresc,
+                            f_tipo, f_pago, busca)
+    tx = res["rows"]
 
     if not tx:
         st.info("Sem lançamentos.")
@@ -119,20 +226,68 @@ with tabs[1]:
         df["Data"] = pd.to_datetime(df.get("occurred_at"), errors="coerce").dt.strftime("%d/%m/%Y")
         df["Venc"] = pd.to_datetime(df.get("due_date"), errors="coerce").dt.strftime("%d/%m/%Y")
         df["Tipo"] = df.get("type").map({"income":"Receita","expense":"Despesa"})
-        df["Previsto (R\$)"] = (df.get("planned_amount").fillna(df.get("amount")).fillna(0.0)).astype(float)
+        df["Previsto (R\$)"] = money.to_reais(fx.planned(tx))
         df["Pago?"] = df.get("is_paid").fillna(False)
-        df["Pago (R\$)"] = df.get("paid_amount").fillna("")
+        df["Pago (R\$)"] = pd.to_numeric(df.get("paid_amount"), errors="coerce")
+        cols = ["Data","Venc","Tipo","description","Previsto (R\$)","Pago?","Pago (R\$)","attachment_url","id"]
+        moedas = df.get("currency", pd.Series(index=df.index, dtype=object)).fillna(fx.REPORTING)
+        if (moedas != fx.REPORTING).any():
+            # outra moeda: valor original ao lado do convertido; o pago fica na moeda do lançamento
+            df["Moeda"], df["Previsto"] = moedas, money.to_reais(money.planned(tx))
+            df = df.rename(columns={"Pago (R\$)": "Pago"})
+            cols = ["Data","Venc","Tipo","description","Moeda","Previsto","Previsto (R\$)","Pago?","Pago","attachment_url","id"]
 
         st.dataframe(
-            df[["Data","Venc","Tipo","description","Previsto (R\$)","Pago?","Pago (R\$)","attachment_url","id"]]
+            df[cols]
             .rename(columns={"description":"Descrição","attachment_url":"Boleto"}),
             use_container_width=True,
             hide_index=True
         )
+        pg1, pg2 = st.columns([1, 3])
+        with pg1:
+            st.number_input("Página", min_value=1, max_value=n_paginas, step=1, key="mv_pagina")
+        with pg2:
+            ini_i = (pagina - 1) * por_pagina + 1
+            st.caption(f"{ini_i}–{ini_i + len(tx) - 1} de {total} lançamento(s) · página {pagina} de {n_paginas}")
+
+        # Baixa em lote: marca várias em aberto da página e confirma num único round trip
+        abertas = [r for r in tx if not r.get("is_paid")]
+        if abertas:
+            st.markdown("### Baixa em lote")
+            lote = pd.DataFrame({
+                "Pagar": False,
+                "Descrição": [r.get("description") or "" for r in abertas],
+                "Venc": pd.to_datetime([r.get("due_date") or r.get("occurred_at") for r in abertas], errors="coerce").date,
+                "Valor pago (R\$)": [_previsto(r) for r in abertas],
+                "Data pagamento": date.today(),
+            }, index=[r["id"] for r in abertas])
+            # chave pelos ids: marcações antigas não "escorregam" para outras linhas quando a lista muda
+            editado = st.data_editor(
+                lote, key=f"mv_lote_{abs(hash(tuple(lote.index)))}", use_container_width=True, hide_index=True,
+                disabled=["Descrição", "Venc"],
+                column_config={
+                    "Pagar": st.column_config.CheckboxColumn(),
+                    "Valor pago (R\$)": st.column_config.NumberColumn(min_value=0.0, step=10.0, format="%.2f"),
+                    "Data pagamento": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                },
+            )
+            marcadas = editado[editado["Pagar"]]
+            if st.button(f"✅ Confirmar {len(marcadas)} pagamento(s)", key="mv_lote_ok", disabled=marcadas.empty):
+                try:
+                    itens = [{
+                        "id": tx_id,
+                        "amount": money.normalize(r["Valor pago (R\$)"]) if pd.notna(r["Valor pago (R\$)"]) else None,
+                        "paid_at": (r["Data pagamento"] or date.today()).isoformat(),
+                    } for tx_id, r in marcadas.iterrows()]
+                    n = _baixar(itens)
+                    st.toast(f"{n} pagamento(s) registrado(s)!", icon="✅"); st.rerun(scope="fragment")
+                except Exception as e:
+                    st.error(f"Falha ao marcar pagos: {e}")
 
         st.markdown("### Marcar pagamento / Anexar boleto")
-        tx_id_options = df["id"].tolist()
-        tx_id = st.selectbox("Transação", tx_id_options, format_func=lambda x: f"ID: {x} - {df[df['id']==x]['description'].iloc[0]}")
+        # índice id -> linha: format_func e confirmação em O(1) (antes: varredura do DataFrame por opção)
+        por_id = {r["id"]: r for r in tx}
+        tx_id = st.selectbox("Transação", list(por_id), format_func=lambda x: f"ID: {x} - {por_id[x].get('description') or ''}")
 
         # Valor pago: se não preencher, usa o previsto da transação
         pago_v = st.number_input("Valor pago (R\$) — deixe 0 para usar o previsto", min_value=0.0, step=10.0)
@@ -143,11 +298,10 @@ with tabs[1]:
         with col_a:
             if st.button("✅ Confirmar pagamento"):
                 try:
-                    row = df[df["id"]==tx_id].iloc[0]
-                    previsto = float(row["Previsto (R\$)"]) if row is not None else 0.0
-                    valor_final = pago_v if pago_v > 0 else previsto
-                    sb.rpc("mark_transaction_paid", {"p_tx_id": tx_id, "p_amount": valor_final, "p_date": pago_d.isoformat()}).execute()
-                    st.toast("Pagamento registrado!", icon="✅"); st.cache_data.clear(); st.rerun()
+                    row = por_id.get(tx_id) or {}
+                    valor_final = money.normalize(pago_v if pago_v > 0 else _previsto(row))
+                    _baixar([{"id": tx_id, "amount": valor_final, "paid_at": pago_d.isoformat()}])
+                    st.toast("Pagamento registrado!", icon="✅"); st.rerun(scope="fragment")
                 except Exception as e:
                     st.error(f"Falha ao marcar pago: {e}")
         with col_b:
@@ -162,20 +316,27 @@ with tabs[1]:
                         data_bytes = novo_boleto.read()
                         sb.storage.from_("boletos").upload(key, data_bytes, {"upsert": True})
                         url = sb.storage.from_("boletos").get_public_url(key)
-                        sb.table("transactions").update({"attachment_url": url}).eq("id", tx_id).execute()
-                        st.toast("Anexo salvo!", icon="📎"); st.cache_data.clear(); st.rerun()
+                        salvas = sb.table("transactions").update({"attachment_url": url}).eq("id", tx_id).execute().data
+                        st.toast("Anexo salvo!", icon="📎"); changefeed.changed(HOUSEHOLD_ID, rows=salvas); st.rerun()
                 except Exception as e:
                     st.error(f"Falha ao anexar: {e}")
     st.markdown('</div>', unsafe_allow_html=True)
 
+with tabs[1]:
+    if tabs[1].open:
+        _movimentacoes()
+
 # Fixas (cria lançamentos previstos; pagamento é controlado em Movimentações)
-with tabs[2]:
+@perf.fragment("Financeiro", "financeiro.fixas")
+def _fixas():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("♻️ Receitas/Despesas fixas")
 
-    cats = fetch_categories(sb, HOUSEHOLD_ID); cat_map = {c["name"]: c for c in cats}
-    accs = fetch_accounts(sb, HOUSEHOLD_ID, True); acc_map = {a["name"]: a for a in accs}
-    cards = fetch_cards(sb, HOUSEHOLD_ID, True); card_map = {c["name"]: c for c in cards}
+    dados = loader.load(cats=(fetch_categories, sb, HOUSEHOLD_ID), accs=(fetch_accounts, sb, HOUSEHOLD_ID, True),
+                    cards=(fetch_cards, sb, HOUSEHOLD_ID, True))
+    cat_map = {c["name"]: c for c in dados["cats"]}
+    acc_map = {a["name"]: a for a in dados["accs"]}
+    card_map = {c["name"]: c for c in dados["cards"]}
 
     with st.form("fixas_form"):
         col1,col2 = st.columns(2)
@@ -198,8 +359,9 @@ with tabs[2]:
                 acc_id = (acc_map.get(acc) or {}).get("id")
                 card_id = (card_map.get(card_name) or {}).get("id") if method=="card" and card_name!="—" else None
 
+                previsto = money.normalize(previsto)
                 # mês inicial
-                sb.table("transactions").insert({
+                primeira = sb.table("transactions").insert({
                     "household_id": HOUSEHOLD_ID,
                     "member_id": MY_MEMBER_ID,
                     "account_id": acc_id,
@@ -213,7 +375,9 @@ with tabs[2]:
                     "payment_method": method,
                     "card_id": card_id,
                     "created_by": user.id
-                }).execute()
+                }).execute().data
+                categorizer.learn(HOUSEHOLD_ID, primeira or [])
+                fixas = list(primeira or [])
 
                 # próximos meses
                 d = start_due
@@ -225,7 +389,7 @@ with tabs[2]:
                         last = (first_next + timedelta(days=32)).replace(day=1) - timedelta(days=1)
                         d = last
 
-                    sb.table("transactions").insert({
+                    fixas += sb.table("transactions").insert({
                         "household_id": HOUSEHOLD_ID,
                         "member_id": MY_MEMBER_ID,
                         "account_id": acc_id,
@@ -239,15 +403,20 @@ with tabs[2]:
                         "payment_method": method,
                         "card_id": card_id,
                         "created_by": user.id
-                    }).execute()
-                st.toast("✅ Fixas criadas!", icon="✅"); st.cache_data.clear(); st.rerun()
+                    }).execute().data or []
+                st.toast("✅ Fixas criadas!", icon="✅"); changefeed.changed(HOUSEHOLD_ID, rows=fixas); st.rerun()
             except Exception as e:
                 st.error(f"Falha: {e}")
     st.caption("💡 O pagamento/valor pago é marcado na aba **Movimentações**. Se não informar o valor, o resultado usa o **previsto**; a **data de pagamento** padrão é o dia marcado.")
     st.markdown('</div>', unsafe_allow_html=True)
 
+with tabs[2]:
+    if tabs[2].open:
+        _fixas()
+
 # Orçamentos
-with tabs[3]:
+@perf.fragment("Financeiro", "financeiro.orcamentos")
+def _orcamentos():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("💡 Orçamentos")
     month_str = st.text_input("Mês (YYYY-MM)", value=date.today().strftime("%Y-%m"))
@@ -262,14 +431,19 @@ with tabs[3]:
     if st.button("Salvar orçamento"):
         try:
             cid = (cat_by_name.get(cat_name) or {}).get("id")
-            sb.rpc("upsert_budget", {"p_household": HOUSEHOLD_ID, "p_month": month_str, "p_category": cid, "p_amount": val_orc}).execute()
+            sb.rpc("upsert_budget", {"p_household": HOUSEHOLD_ID, "p_month": month_str, "p_category": cid, "p_amount": money.normalize(val_orc)}).execute()
             st.toast("✅ Salvo!", icon="✅")
         except Exception as e:
             st.error(f"Falha: {e}")
     st.markdown('</div>', unsafe_allow_html=True)
 
+with tabs[3]:
+    if tabs[3].open:
+        _orcamentos()
+
 # Fluxo previsto
-with tabs[4]:
+@perf.fragment("Financeiro", "financeiro.fluxo_caixa")
+def _fluxo_caixa():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("📈 Fluxo de caixa (previsto)")
     f1,f2 = st.columns(2)
@@ -283,10 +457,244 @@ with tabs[4]:
         st.info("Sem previstos no período.")
     else:
         df = pd.DataFrame(txx)
-        def eff(r):
-            v = r.get("paid_amount") if r.get("is_paid") else (r.get("planned_amount") or r.get("amount") or 0)
-            return v if r.get("type")=="income" else -v
         df["Quando"] = pd.to_datetime(df.get("due_date").fillna(df.get("occurred_at")), errors="coerce").dt.date
-        df["Saldo"] = df.apply(eff, axis=1)
-        st.line_chart(df.groupby("Quando")["Saldo"].sum().reset_index(), x="Quando", y="Saldo")
+        df["centavos"] = fx.effective(txx, signed=True)
+        por_dia = df.groupby("Quando")["centavos"].sum().reset_index()
+        por_dia["Saldo"] = money.to_reais(por_dia.pop("centavos").to_numpy())
+        st.plotly_chart(charts.line("fluxo_caixa", por_dia, "Quando", "Saldo"), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
+
+# Cenários (Monte Carlo): previstos + variação histórica das categorias
+@perf.fragment("Financeiro", "financeiro.cenarios")
+def _cenarios():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("🎲 Cenários")
+    if not st.toggle("Simular cenários do saldo", key="mc_on",
+                     help="Sorteia milhares de caminhos a partir dos previstos em aberto e da variação de cada categoria nos últimos 12 meses."):
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        meses = st.selectbox("Horizonte", [3, 6, 12], index=2, key="mc_meses", format_func=lambda m: f"{m} meses")
+    with c2:
+        n_cen = st.selectbox("Cenários", [500, 2000, 5000], index=1, key="mc_n")
+    hoje = date.today()
+    dias = (hoje + relativedelta(months=meses) - hoje).days
+    h_ini, h_fim = scenarios.history_window(hoje)
+    dados = loader.load(hist=(fetch_tx, sb, HOUSEHOLD_ID, h_ini, h_fim),
+                        prev=(fetch_tx_due, sb, HOUSEHOLD_ID, hoje, hoje + timedelta(days=dias - 1)),
+                        hoje_saldo=(balances.fetch_balance_series, sb, HOUSEHOLD_ID, hoje, hoje),
+                        accs=(fetch_accounts, sb, HOUSEHOLD_ID, False))
+    with c3:
+        # saldo de hoje das contas (checkpoints da migração 005), não só o inicial; cada conta
+        # na moeda dela -> BRL, como os fluxos simulados (fx.planned/effective)
+        moeda = {a["id"]: a.get("currency") for a in dados["accs"]}
+        linhas = dados["hoje_saldo"]
+        centavos = fx.convert(money.cents([r["balance"] for r in linhas]),
+                              [moeda.get(r["account_id"]) for r in linhas], [hoje] * len(linhas))
+        saldo0 = st.number_input("Saldo atual (R\$)", step=100.0, key="mc_saldo",
+                                 value=money.to_reais(int(centavos.sum())))
+
+    modelo = scenarios.build_model(dados["hist"], dados["prev"], hoje, dias)
+    res = scenarios.simulate(money.to_cents(saldo0), modelo, n=int(n_cen))
+    bandas = pd.DataFrame({"Dia": res["dates"], **{f"p{p}": b for p, b in res["bands"].items()}})
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric(f"Saldo mediano em {meses} meses", money.brl(money.to_cents(bandas["p50"].iloc[-1])))
+    m2.metric("Pior 5% dos cenários", money.brl(money.to_cents(bandas["p5"].iloc[-1])))
+    m3.metric("Chance de terminar negativo", f"{res['p_end_negative']:.0%}")
+
+    def _faixas():
+        import plotly.graph_objects as go
+        fig = go.Figure()
+        for lo, hi, cor in (("p5", "p95", "rgba(14,165,233,.15)"), ("p25", "p75", "rgba(14,165,233,.3)")):
+            fig.add_trace(go.Scatter(x=bandas["Dia"], y=bandas[hi], mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scatter(x=bandas["Dia"], y=bandas[lo], mode="lines", line=dict(width=0), fill="tonexty",
+                                     fillcolor=cor, name=f"{lo[1:]}–{hi[1:]}%"))
+        fig.add_trace(go.Scatter(x=bandas["Dia"], y=bandas["p50"], mode="lines", name="Mediana", line=dict(color="#0ea5e9", width=3)))
+        fig.add_hline(y=0, line_dash="dot", line_color="#ef4444")
+        fig.update_layout(height=400, yaxis_title="Saldo (R$)", hovermode="x unified")
+        return fig
+    st.plotly_chart(charts.figure("financeiro.cenarios", bandas, _faixas), use_container_width=True)
+
+    contas = [i for i in res["items"] if i["type"] == "expense"]
+    if contas:
+        st.markdown("##### Risco de saldo negativo até cada vencimento")
+        st.dataframe(pd.DataFrame({
+            "Vencimento": [i["due"] for i in contas],
+            "Descrição": [i["description"] for i in contas],
+            "Previsto": money.brl(money.cents([i["planned"] for i in contas])),
+            "Risco": [i["p_negative"] for i in contas],
+        }), use_container_width=True, hide_index=True, column_config={
+            "Vencimento": st.column_config.DateColumn(format="DD/MM/YYYY"),
+            "Risco": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent"),
+        })
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[4]:
+    if tabs[4].open:
+        _fluxo_caixa()
+        _cenarios()
+
+# Busca (índice full-text/trigramas no banco; filtros estruturados nos mesmos índices)
+@perf.fragment("Financeiro", "financeiro.busca")
+def _busca():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("🔎 Busca")
+    termo = st.text_input("Buscar lançamentos", key="bs_q", placeholder="ex.: farmácia março, mercado").strip()
+
+    dados = loader.load(mems=(fetch_members, sb, HOUSEHOLD_ID), cats=(fetch_categories, sb, HOUSEHOLD_ID))
+    mem_map = {m["id"]: m["display_name"] for m in dados["mems"]}
+    cat_map = {c["id"]: c["name"] for c in dados["cats"]}
+    with st.expander("Filtros", expanded=False):
+        b1, b2, b3 = st.columns(3)
+        with b1:
+            b_ini = st.date_input("De", value=None, key="bs_ini")
+            b_fim = st.date_input("Até", value=None, key="bs_fim")
+        with b2:
+            v_min = st.number_input("Valor mínimo (R\$)", min_value=0.0, step=10.0, value=None, key="bs_vmin")
+            v_max = st.number_input("Valor máximo (R\$)", min_value=0.0, step=10.0, value=None, key="bs_vmax")
+        with b3:
+            b_mem = st.selectbox("Membro", [None] + list(mem_map), key="bs_mem",
+                                 format_func=lambda k: "Todos" if k is None else mem_map.get(k, k))
+            b_cat = st.selectbox("Categoria", [None] + list(cat_map), key="bs_cat",
+                                 format_func=lambda k: "Todas" if k is None else cat_map.get(k, k))
+            b_pago = st.selectbox("Pagamento", [None, True, False], key="bs_pago",
+                                  format_func=lambda x: {None: "Todos", True: "Pagos", False: "Em aberto"}[x])
+
+    filtros = dict(start=b_ini, end=b_fim, min_amount=v_min, max_amount=v_max,
+                   member_id=b_mem, category_id=b_cat, is_paid=b_pago)
+    if not termo and not any(v is not None for v in filtros.values()):
+        st.caption("Digite um termo ou escolha um filtro.")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+
+    por_pagina = 25
+    assinatura = (termo, tuple(filtros.items()))
+    if st.session_state.get("bs_assinatura") != assinatura:
+        st.session_state["bs_assinatura"] = assinatura
+        st.session_state["bs_pagina"] = 1
+    pagina = int(st.session_state.get("bs_pagina", 1))
+    try:
+        res = search_transactions(sb, HOUSEHOLD_ID, termo, pagina - 1, por_pagina, **filtros)
+    except Exception as e:
+        st.error(f"Falha na busca: {e}")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+
+    total = res["total"]
+    if not res["rows"]:
+        st.info("Nada encontrado.")
+    else:
+        # valores formatados de uma vez (coluna em centavos)
+        for r, valor in zip(res["rows"], money.brl(money.planned(res["rows"]))):
+            sinal = "🟢" if r.get("type") == "income" else "🔴"
+            quando = _to_date_safe(r.get("occurred_at"))
+            meta = " · ".join(x for x in (
+                quando.strftime("%d/%m/%Y") if quando else "",
+                cat_map.get(r.get("category_id"), ""), mem_map.get(r.get("member_id"), ""),
+                "✅ pago" if r.get("is_paid") else "em aberto",
+            ) if x)
+            st.markdown(f"{sinal} **{highlight_html(r.get('headline') or r.get('description'))}** — {valor}"
+                        f"<br><span style='color:#64748b;font-size:.85rem'>{meta}</span>", unsafe_allow_html=True)
+        n_paginas = max(1, -(-total // por_pagina))
+        pg1, pg2 = st.columns([1, 3])
+        with pg1:
+            st.number_input("Página", min_value=1, max_value=n_paginas, step=1, key="bs_pagina")
+        with pg2:
+            st.caption(f"{total} resultado(s) · página {pagina} de {n_paginas}")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[5]:
+    if tabs[5].open:
+        _busca()
+
+# Conciliação: extrato bancário x lançamentos em aberto (reconcile.py)
+@perf.fragment("Financeiro", "financeiro.conciliacao")
+def _conciliacao():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("🏦 Conciliação bancária")
+    arq = st.file_uploader("Extrato (CSV ou OFX)", type=["csv", "ofx", "qfx", "txt"], key="cc_arquivo")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        tol_c = st.number_input("Tolerância de valor (centavos)", min_value=0, max_value=500, value=0, step=1, key="cc_cents")
+    with c2:
+        tol_d = st.number_input("Tolerância de data (dias)", min_value=0, max_value=15, value=3, step=1, key="cc_dias")
+    with c3:
+        nota_min = st.slider("Nota mínima", 0.0, 1.0, 0.4, 0.05, key="cc_nota")
+
+    if arq is None:
+        st.caption("Envie o extrato do banco para propor os pares com os lançamentos previstos.")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    try:
+        linhas = reconcile.parse_statement(arq.getvalue(), arq.name)
+    except Exception as e:
+        st.error(f"Falha ao ler o extrato: {e}")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    if not linhas:
+        st.info("Nenhuma linha reconhecida no extrato.")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+
+    ini, fim = reconcile.window(linhas, int(tol_d))
+    abertos = [t for t in fetch_tx_due(sb, HOUSEHOLD_ID, ini, fim) if not t.get("is_paid")]
+    with perf.section("conciliacao.match"):
+        res = reconcile.match(linhas, abertos, int(tol_c), int(tol_d), nota_min)
+    pares = res["pairs"]
+    st.caption(f"{len(linhas)} linha(s) no extrato · {len(abertos)} lançamento(s) em aberto entre "
+               f"{ini.strftime('%d/%m/%Y')} e {fim.strftime('%d/%m/%Y')} · {len(pares)} par(es) proposto(s)")
+
+    if pares:
+        props = pd.DataFrame({
+            "Confirmar": [p["score"] >= 0.7 for p in pares],
+            "Data extrato": [p["line"]["date"] for p in pares],
+            "Extrato": [p["line"].get("description") or "" for p in pares],
+            "Valor (R\$)": [abs(p["line"]["amount"]) for p in pares],
+            "Lançamento": [p["item"].get("description") or "" for p in pares],
+            "Venc": [reconcile.effective_date(p["item"]) for p in pares],
+            "Previsto (R\$)": [reconcile.planned_amount(p["item"]) for p in pares],
+            "Nota": [p["score"] for p in pares],
+        }, index=[p["item"]["id"] for p in pares])
+        editado = st.data_editor(
+            props, key=f"cc_pares_{abs(hash(tuple(props.index)))}", use_container_width=True, hide_index=True,
+            disabled=[c for c in props.columns if c != "Confirmar"],
+            column_config={
+                "Data extrato": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Venc": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Valor (R\$)": st.column_config.NumberColumn(format="%.2f"),
+                "Previsto (R\$)": st.column_config.NumberColumn(format="%.2f"),
+                "Nota": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f"),
+            },
+        )
+        marcados = editado[editado["Confirmar"]]
+        if st.button(f"✅ Baixar {len(marcados)} conciliado(s)", key="cc_ok", disabled=marcados.empty):
+            try:
+                # valor e data pagos = os do extrato
+                n = _baixar([{"id": tx_id, "amount": float(r["Valor (R\$)"]), "paid_at": r["Data extrato"].isoformat()}
+                             for tx_id, r in marcados.iterrows()])
+                st.toast(f"{n} lançamento(s) conciliado(s)!", icon="✅"); st.rerun(scope="fragment")
+            except Exception as e:
+                st.error(f"Falha ao baixar: {e}")
+    else:
+        st.info("Nenhum par dentro da tolerância.")
+
+    if res["unmatched"]:
+        with st.expander(f"Sem par no extrato ({len(res['unmatched'])})", expanded=False):
+            sem_par = pd.DataFrame(res["unmatched"])
+            # categoria para lançar depois: classificação em lote pelo histórico
+            cat_nome = {c["id"]: c["name"] for c in fetch_categories(sb, HOUSEHOLD_ID)}
+            sug = categorizer.model_for(sb, HOUSEHOLD_ID).suggest_many(
+                sem_par["description"], ["expense" if v < 0 else "income" for v in sem_par["amount"]])
+            sem_par["Categoria sugerida"] = [cat_nome.get(c, "—") for c, _ in sug]
+            st.dataframe(sem_par.drop(columns=["fitid"], errors="ignore")
+                         .rename(columns={"date": "Data", "description": "Descrição", "amount": "Valor"}),
+                         use_container_width=True, hide_index=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[6]:
+    if tabs[6].open:
+        _conciliacao()
+
+perf.render_panel()
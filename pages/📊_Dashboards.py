@@ -1,9 +1,19 @@
 # pages/📊_Dashboards.py
 from __future__ import annotations
 from datetime import date, datetime, timedelta
+import os
 import streamlit as st
 import pandas as pd
-from utils import to_brl, _to_date_safe, fetch_tx, fetch_tx_due, fetch_members, fetch_categories
+import perf
+import analytics
+import statements
+import charts
+import changefeed
+import loader
+import money
+import balances
+import fx
+from utils import to_brl, _to_date_safe, fetch_tx_due, fetch_members, fetch_categories, fetch_accounts
 
 # Acessa o cliente Supabase e IDs do household/membro da sessão
 if "sb" not in st.session_state or "HOUSEHOLD_ID" not in st.session_state:
@@ -13,38 +23,65 @@ if "sb" not in st.session_state or "HOUSEHOLD_ID" not in st.session_state:
 sb = st.session_state.sb
 HOUSEHOLD_ID = st.session_state.HOUSEHOLD_ID
 
+perf.begin_rerun("Dashboards")
+changefeed.watch(sb, HOUSEHOLD_ID)
 st.title("📊 Dashboards")
-tabs = st.tabs(["Relatórios","Fluxo de caixa"])
+# Abas preguiçosas: só a aba aberta roda; cada uma é um fragmento (interação reroda só a aba)
+tabs = st.tabs(["Relatórios","Fluxo de caixa","Extrato mensal","Patrimônio","Comparativo"], key="dash_tabs", on_change="rerun")
 
-with tabs[0]:
+@perf.fragment("Dashboards", "dashboards.relatorios")
+def _relatorios():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("Relatórios")
     ini = st.date_input("Início", value=date.today().replace(day=1))
     fim = st.date_input("Fim", value=date.today())
-    tx = fetch_tx(sb, HOUSEHOLD_ID, ini, fim)
 
-    mems = fetch_members(sb, HOUSEHOLD_ID)
-    cats = fetch_categories(sb, HOUSEHOLD_ID)
+    dados = loader.load(mems=(fetch_members, sb, HOUSEHOLD_ID), cats=(fetch_categories, sb, HOUSEHOLD_ID))
+    mems, cats = dados["mems"], dados["cats"]
+    mem_map = {m["id"]: m["display_name"] for m in mems}
+    cat_map = {c["id"]: c["name"] for c in cats}
+
+    with st.expander("Filtros", expanded=False):
+        fc1, fc2, fc3 = st.columns(3)
+        with fc1:
+            f_tipos = st.multiselect("Tipo", ["income", "expense"], format_func=lambda x: {"income":"Receita","expense":"Despesa"}[x])
+            f_pago = st.selectbox("Pagamento", ["Todos", "Pagos", "Em aberto"])
+        with fc2:
+            f_membros = st.multiselect("Membros", list(mem_map.keys()), format_func=lambda k: mem_map.get(k, k))
+            f_texto = st.text_input("Descrição contém")
+        with fc3:
+            f_cats = st.multiselect("Categorias", list(cat_map.keys()), format_func=lambda k: cat_map.get(k, k))
+    filtros = {
+        "types": f_tipos, "member_ids": f_membros, "category_ids": f_cats, "text": f_texto.strip(),
+        "is_paid": {"Pagos": True, "Em aberto": False}.get(f_pago),
+    }
 
-    if not tx:
+    # Agregações no DuckDB sobre o snapshot Parquet (não monta o intervalo em pandas)
+    por_membro = analytics.report(sb, HOUSEHOLD_ID, "member", ini, fim, filtros)
+    if por_membro.empty:
         st.info("Sem lançamentos.")
     else:
-        df = pd.DataFrame(tx)
-        mem_map = {m["id"]: m["display_name"] for m in mems}
-        cat_map = {c["id"]: c["name"] for c in cats}
-
-        df["valor_eff"] = df.apply(lambda r: (r.get("paid_amount") if r.get("is_paid") else r.get("planned_amount") or r.get("amount") or 0) * (1 if r.get("type")=="income" else -1), axis=1)
-        df["Membro"] = df["member_id"].map(mem_map).fillna("—")
-        df["Categoria"] = df["category_id"].map(cat_map).fillna("—")
+        por_membro["Membro"] = por_membro["member"].map(mem_map).fillna("—")
+        por_cat = analytics.report(sb, HOUSEHOLD_ID, "category", ini, fim, filtros)
+        por_cat["Categoria"] = por_cat["category"].map(cat_map).fillna("—")
+        por_mes = analytics.report(sb, HOUSEHOLD_ID, "month", ini, fim, filtros)
 
         st.markdown("#### Por membro")
-        st.bar_chart(df.groupby("Membro")["valor_eff"].sum().reset_index(), x="Membro", y="valor_eff")
+        st.plotly_chart(charts.bar("dashboards.membro", por_membro.groupby("Membro")["valor_eff"].sum().reset_index(), "Membro", "valor_eff"), use_container_width=True)
 
         st.markdown("#### Por categoria")
-        st.bar_chart(df.groupby("Categoria")["valor_eff"].sum().reset_index(), x="Categoria", y="valor_eff")
+        st.plotly_chart(charts.bar("dashboards.categoria", por_cat.groupby("Categoria")["valor_eff"].sum().reset_index(), "Categoria", "valor_eff"), use_container_width=True)
+
+        st.markdown("#### Por mês")
+        st.plotly_chart(charts.bar("dashboards.mes", por_mes.rename(columns={"month": "Mês"})[["Mês", "valor_eff"]], "Mês", "valor_eff"), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
-with tabs[1]:
+with tabs[0]:
+    if tabs[0].open:
+        _relatorios()
+
+@perf.fragment("Dashboards", "dashboards.fluxo_caixa")
+def _fluxo_caixa():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("Fluxo de caixa (previsto)")
     ini = st.date_input("Início", value=date.today().replace(day=1), key="fx_ini_dash")
@@ -55,10 +92,170 @@ with tabs[1]:
         st.info("Sem previstos.")
     else:
         df = pd.DataFrame(txx)
-        def eff(r):
-            v = r.get("paid_amount") if r.get("is_paid") else (r.get("planned_amount") or r.get("amount") or 0)
-            return v if r.get("type")=="income" else -v
         df["Quando"] = pd.to_datetime(df.get("due_date").fillna(df.get("occurred_at")), errors="coerce").dt.date
-        df["Saldo"] = df.apply(eff, axis=1)
-        st.line_chart(df.groupby("Quando")["Saldo"].sum().reset_index(), x="Quando", y="Saldo")
+        df["centavos"] = fx.effective(txx, signed=True)
+        por_dia = df.groupby("Quando")["centavos"].sum().reset_index()
+        por_dia["Saldo"] = money.to_reais(por_dia.pop("centavos").to_numpy())
+        st.plotly_chart(charts.line("fluxo_caixa", por_dia, "Quando", "Saldo"), use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[1]:
+    if tabs[1].open:
+        _fluxo_caixa()
+
+# Extrato em PDF: gerado fora do rerun; a página só acompanha o status
+@perf.fragment("Dashboards", "dashboards.extrato_status", run_every=2)
+def _statement_polling(month: str):
+    # só existe enquanto o job roda: ao terminar, um rerun redesenha o extrato sem o polling
+    if statements.status(HOUSEHOLD_ID, month)[0] == "gerando":
+        st.info("⏳ Gerando extrato...")
+    else:
+        st.rerun()
+
+def _statement_status(month: str):
+    state, info = statements.status(HOUSEHOLD_ID, month)
+    if state == "gerando":
+        _statement_polling(month)
+    elif state == "erro":
+        st.error(f"Falha ao gerar extrato: {info}")
+    elif state == "pronto" and os.path.exists(info):
+        with open(info, "rb") as f:
+            st.download_button("⬇️ Baixar extrato (PDF)", f, file_name=f"extrato_{month}.pdf",
+                               mime="application/pdf", key=f"dl_extrato_{month}")
+
+@perf.fragment("Dashboards", "dashboards.extrato")
+def _extrato():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("Extrato mensal")
+    st.caption("Totais por membro e categoria, gráficos e contas pagas/em aberto do mês.")
+    ultimo = date.today().replace(day=1)
+    meses = [((ultimo - timedelta(days=28 * i)).replace(day=1)).strftime("%Y-%m") for i in range(12)]
+    mes = st.selectbox("Mês", list(dict.fromkeys(meses)), format_func=lambda m: f"{m[5:]}/{m[:4]}")
+    user = st.session_state.get("user")
+    por_email = st.checkbox("Enviar também por e-mail", value=False, disabled=not getattr(user, "email", None))
+    if st.button("Gerar extrato", key="btn_extrato"):
+        try:
+            statements.request(sb, HOUSEHOLD_ID, mes, [user.email] if por_email and user else None)
+        except Exception as e:
+            st.error(f"Falha ao solicitar extrato: {e}")
+    _statement_status(mes)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[2]:
+    if tabs[2].open:
+        _extrato()
+
+# Patrimônio: saldo por conta a partir dos checkpoints mensais (migração 005)
+PERIODOS = {"6 meses": (6, "day"), "1 ano": (12, "day"), "3 anos": (36, "month"), "5 anos": (60, "month")}
+
+@perf.fragment("Dashboards", "dashboards.patrimonio")
+def _patrimonio():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("Patrimônio")
+    periodo = st.radio("Período", list(PERIODOS), horizontal=True, key="pt_periodo")
+    meses, passo = PERIODOS[periodo]
+    hoje = date.today()
+    ini = (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
+    for _ in range(meses - 1):
+        ini = (ini - timedelta(days=1)).replace(day=1)
+
+    dados = loader.load(serie=(balances.fetch_balance_series, sb, HOUSEHOLD_ID, ini, hoje, passo),
+                        accs=(fetch_accounts, sb, HOUSEHOLD_ID))
+    df = balances.net_worth(dados["serie"], dados["accs"])
+    if df.empty:
+        st.info("Sem contas.")
+    else:
+        total = df[balances.TOTAL]
+        m1, m2 = st.columns(2)
+        m1.metric("Patrimônio hoje", money.brl(int(total.iloc[-1])),
+                  delta=money.brl_delta(int(total.iloc[-1] - total.iloc[0])), delta_color="normal")
+        m2.metric(f"Menor saldo em {periodo}", money.brl(int(total.min())))
+        reais = (df / 100.0).rename_axis("Dia").reset_index()
+        contas = [c for c in df.columns if c != balances.TOTAL]
+
+        def _area():
+            import plotly.graph_objects as go
+            fig = go.Figure()
+            for c in contas:
+                fig.add_trace(go.Scatter(x=reais["Dia"], y=reais[c], name=c, mode="lines", stackgroup="contas"))
+            fig.add_trace(go.Scatter(x=reais["Dia"], y=reais[balances.TOTAL], name=balances.TOTAL, mode="lines",
+                                     line=dict(color="#0f172a", width=2, dash="dot")))
+            fig.update_layout(height=420, yaxis_title="Saldo (R$)", hovermode="x unified")
+            return fig
+        st.plotly_chart(charts.figure("dashboards.patrimonio", reais, _area), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[3]:
+    if tabs[3].open:
+        _patrimonio()
+
+# Comparativo: janelas sobre o cubo de somas de prefixo (sem consulta por comparação)
+COMPARACOES = {"30 dias": 30, "90 dias": 90, "365 dias": 365, "Mês vs ano anterior": None}
+
+@perf.fragment("Dashboards", "dashboards.comparativo")
+def _comparativo():
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("Comparativo")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        periodo = st.selectbox("Período", list(COMPARACOES), key="cp_periodo")
+    with c2:
+        tipo = st.radio("Tipo", ["expense", "income"], horizontal=True, key="cp_tipo",
+                        format_func=lambda x: {"income": "Receitas", "expense": "Despesas"}[x])
+    with c3:
+        por = st.radio("Por", ["category", "member"], horizontal=True, key="cp_por",
+                       format_func=lambda x: {"category": "Categoria", "member": "Membro"}[x])
+    hoje = date.today()
+    dias = COMPARACOES[periodo]
+    atual, anterior = analytics.rolling_periods(hoje, dias) if dias else analytics.yoy_periods(hoje)
+    st.caption(f"{atual[0]:%d/%m/%Y}–{atual[1]:%d/%m/%Y} vs {anterior[0]:%d/%m/%Y}–{anterior[1]:%d/%m/%Y}")
+
+    dados = loader.load(cube=(analytics.fetch_cube, sb, HOUSEHOLD_ID),
+                        mems=(fetch_members, sb, HOUSEHOLD_ID), cats=(fetch_categories, sb, HOUSEHOLD_ID))
+    cube = dados["cube"]
+    nomes = ({c["id"]: c["name"] for c in dados["cats"]} if por == "category"
+             else {m["id"]: m["display_name"] for m in dados["mems"]})
+    sinal = -1 if tipo == "expense" else 1  # despesas em positivo: Δ > 0 = gastou mais
+    cmp = analytics.compare(cube, atual, anterior, por, (tipo,))
+    if cmp.empty:
+        st.info("Sem lançamentos nos períodos.")
+    else:
+        a, b = int(cmp["atual"].sum()) * sinal, int(cmp["anterior"].sum()) * sinal
+        m1, m2 = st.columns(2)
+        m1.metric("Período atual", money.brl(a), delta=money.brl_delta(a - b),
+                  delta_color="inverse" if tipo == "expense" else "normal")
+        m2.metric("Período anterior", money.brl(b))
+        nome = cmp[por].map(nomes).fillna("—")
+        st.dataframe(pd.DataFrame({
+            "Categoria" if por == "category" else "Membro": nome,
+            "Atual": money.brl(cmp["atual"].to_numpy() * sinal),
+            "Anterior": money.brl(cmp["anterior"].to_numpy() * sinal),
+            "Δ": money.brl(cmp["delta"].to_numpy() * sinal),
+            "Δ %": cmp["pct"] * sinal,
+        }), use_container_width=True, hide_index=True,
+            column_config={"Δ %": st.column_config.NumberColumn(format="percent")})
+
+        barras = pd.concat([
+            pd.DataFrame({"Grupo": nome, "Valor": money.to_reais(cmp["atual"].to_numpy() * sinal), "Período": "Atual"}),
+            pd.DataFrame({"Grupo": nome, "Valor": money.to_reais(cmp["anterior"].to_numpy() * sinal), "Período": "Anterior"}),
+        ])
+        st.plotly_chart(charts.bar("dashboards.comparativo", barras, "Grupo", "Valor", color="Período", barmode="group"),
+                        use_container_width=True)
+
+    if dias:
+        # soma móvel da janela ao longo do último ano, contra o ano anterior
+        ini = hoje - timedelta(days=364)
+        movel = analytics.rolling(cube, dias, ini, hoje, (tipo,)) * sinal
+        passado = analytics.rolling(cube, dias, ini - timedelta(days=365), hoje - timedelta(days=365), (tipo,)) * sinal
+        serie = pd.DataFrame({"Dia": pd.date_range(ini, hoje), "Últimos 12 meses": money.to_reais(movel),
+                              "Ano anterior": money.to_reais(passado)})
+        st.markdown(f"##### Soma móvel de {dias} dias")
+        st.plotly_chart(charts.line("dashboards.comparativo_movel", serie, "Dia", ["Últimos 12 meses", "Ano anterior"]),
+                        use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+with tabs[4]:
+    if tabs[4].open:
+        _comparativo()
+
+perf.render_panel()
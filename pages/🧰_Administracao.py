@@ -3,11 +3,17 @@ from __future__ import annotations
 from datetime import date
 import streamlit as st
 import pandas as pd
+import perf
+import changefeed
+import fx
+import loader
+import money
 
 # Utils/projeto
 from utils import (
     to_brl,
     fetch_members, fetch_accounts, fetch_categories, fetch_cards, fetch_card_limits,
+    fetch_pending_invites, fetch_relationships, fetch_avatar_url,
     send_email,  # fallback de e-mail (mantido, mas não usado neste fluxo)
 )
 
@@ -22,11 +28,16 @@ sb = st.session_state.sb
 HOUSEHOLD_ID = st.session_state.HOUSEHOLD_ID
 USER = st.session_state.user
 
+perf.begin_rerun("Administração")
+changefeed.watch(sb, HOUSEHOLD_ID)
 st.title("🧰 Administração do Sistema Financeiro")
 
 # URL base do app para construir o link de convite
 APP_URL = "https://familyfinance.streamlit.app"
 
+# moedas oferecidas para contas novas (além das que já têm cotação)
+MOEDAS_COMUNS = ["BRL", "USD", "EUR", "GBP", "ARS"]
+
 # =========================
 # Helpers
 # =========================
@@ -53,26 +64,15 @@ def _safe_rpc(name: str, params: dict | None = None):
         return None
 
 def _exists_table(name: str) -> bool:
-    try:
-        sb.table(name).select("id").eq("household_id", HOUSEHOLD_ID).limit(1).execute()
-        return True
-    except Exception:
-        return False
-
-def _signed_or_public_url(bucket: str, path: str, expires: int = 3600) -> str | None:
-    try:
-        url = sb.storage.from_(bucket).create_signed_url(path, expires)
-        if isinstance(url, dict):
-            return url.get("signedURL") or url.get("signed_url")
-        return url
-    except Exception:
+    # o schema não muda durante a sessão: sonda uma vez e guarda o resultado
+    probes = st.session_state.setdefault("__adm_exists_table__", {})
+    if name not in probes:
         try:
-            pub = sb.storage.from_(bucket).get_public_url(path)
-            if isinstance(pub, dict):
-                return pub.get("publicURL") or pub.get("public_url")
-            return pub
+            sb.table(name).select("id").eq("household_id", HOUSEHOLD_ID).limit(1).execute()
+            probes[name] = True
         except Exception:
-            return None
+            probes[name] = False
+    return probes[name]
 
 def _unique_name_guard(existing_names: list[str], name: str) -> bool:
     return name.strip().lower() not in {n.strip().lower() for n in existing_names}
@@ -109,8 +109,7 @@ def render_members_tab():
             st.write("**Foto do perfil**")
             my_member_id = me.get("id") if me else None
             if my_member_id:
-                avatar_path = f"{HOUSEHOLD_ID}/{my_member_id}.png"
-                url = _signed_or_public_url("avatars", avatar_path, 3600)
+                url = fetch_avatar_url(sb, HOUSEHOLD_ID, my_member_id)
                 if url:
                     st.image(url, width=128, caption="Atual")
             file = st.file_uploader("Enviar nova foto (PNG/JPG)", type=["png", "jpg", "jpeg"], key="upload_avatar")
@@ -128,6 +127,7 @@ def render_members_tab():
                             avatar_path, content,
                             {"content-type": "image/png", "upsert": "true"}
                         )
+                        changefeed.changed(HOUSEHOLD_ID, "avatars")
                         _toast("Foto atualizada!")
                     except Exception as e:
                         st.error(f"Falha ao salvar foto: {e}")
@@ -155,6 +155,8 @@ def render_members_tab():
                 })
                 data = (res.data[0] if res and isinstance(res.data, list) and res.data else
                         res.data if res and isinstance(res.data, dict) else None)
+                if res is not None:
+                    changefeed.changed(HOUSEHOLD_ID, "pending_invites")
                 if data and data.get("url"):
                     st.success("Convite criado!")
                     st.text_input("Link do convite", value=data["url"], label_visibility="visible", disabled=True)
@@ -164,13 +166,7 @@ def render_members_tab():
 
             st.markdown("##### Convites pendentes")
             try:
-                # lista os pendentes do household
-                pend = sb.table("pending_invites") \
-                         .select("id, email, display_name, token, status, expires_at, created_at") \
-                         .eq("household_id", HOUSEHOLD_ID) \
-                         .neq("status", "used") \
-                         .order("created_at", desc=True) \
-                         .execute().data or []
+                pend = fetch_pending_invites(sb, HOUSEHOLD_ID)
                 if not pend:
                     st.info("Nenhum convite pendente.")
                 else:
@@ -189,6 +185,7 @@ def render_members_tab():
                                 if st.button("Revogar", key=f"revoke_{inv['id']}"):
                                     r = _safe_rpc("revoke_invite", {"p_invite_id": inv["id"]})
                                     if r is not None:
+                                        changefeed.changed(HOUSEHOLD_ID, "pending_invites")
                                         _toast("Convite revogado!")
                                     else:
                                         st.error("Falha ao revogar convite.")
@@ -237,17 +234,24 @@ def render_members_tab():
                 try:
                     new_df = grid.data
                     new_map = {row["id"]: row for _, row in new_df.iterrows()}
+                    changed = []
                     for m in mems:
                         row = new_map.get(m["id"])
-                        if not row:
+                        if row is None:
                             continue
                         new_name = row["Nome"]
                         new_role = row["Papel"]
                         if new_name != m["display_name"] or new_role != m["role"]:
-                            sb.table("members").update({
+                            changed.append({
+                                "id": m["id"],
+                                "household_id": HOUSEHOLD_ID,
+                                "user_id": m.get("user_id"),
                                 "display_name": str(new_name),
                                 "role": str(new_role)
-                            }).eq("id", m["id"]).execute()
+                            })
+                    # um único upsert em lote em vez de um UPDATE por linha
+                    if changed:
+                        sb.table("members").upsert(changed, on_conflict="id").execute()
                     _toast("Alterações salvas!")
                 except Exception as e:
                     st.error(f"Erro ao salvar alterações: {e}")
@@ -282,7 +286,10 @@ def render_accounts_tab():
     with st.form("form_new_account", clear_on_submit=True):
         an = st.text_input("Nome da Conta")
         at = st.selectbox("Tipo de Conta", ["checking", "savings", "wallet"], format_func=str.capitalize)
-        ob = st.number_input("Saldo Inicial (R$)", min_value=0.0, step=50.0, value=0.0)
+        ob = st.number_input("Saldo Inicial", min_value=0.0, step=50.0, value=0.0)
+        moedas = sorted({*fx.currencies(), *MOEDAS_COMUNS})
+        moeda = st.selectbox("Moeda", moedas, index=moedas.index(fx.REPORTING),
+                             help="Lançamentos da conta herdam a moeda; relatórios convertem para R$ pela aba Câmbio.")
         can_save = st.form_submit_button("Salvar Nova Conta")
 
         if can_save:
@@ -300,8 +307,8 @@ def render_accounts_tab():
                             "household_id": HOUSEHOLD_ID,
                             "name": an.strip(),
                             "type": at,
-                            "opening_balance": ob,
-                            "currency": "BRL",
+                            "opening_balance": money.normalize(ob),
+                            "currency": moeda,
                             "is_active": True
                         }).execute()
                         _toast("Conta criada!")
@@ -319,7 +326,10 @@ def render_accounts_tab():
         col1, col2, col3, col4, col5 = st.columns([3,2,2,2,2])
         with col1: st.markdown(f"**{a['name']}**")
         with col2: st.write(f"Tipo: {a.get('type','').capitalize()}")
-        with col3: st.write(f"Saldo inicial: {to_brl(a.get('opening_balance',0))}")
+        with col3:
+            cur = a.get("currency") or fx.REPORTING
+            st.write(f"Saldo inicial: {to_brl(a.get('opening_balance',0))}" if cur == fx.REPORTING
+                     else f"Saldo inicial: {cur} {money.normalize(a.get('opening_balance') or 0):,.2f}")
         with col4: st.info("Ativa" if a.get("is_active") else "Inativa")
         with col5:
             lbl = "Desativar" if a.get("is_active") else "Ativar"
@@ -427,7 +437,7 @@ def render_cards_tab():
                         sb.table("credit_cards").insert({
                             "household_id": HOUSEHOLD_ID,
                             "name": nm.strip(),
-                            "limit_amount": lim,
+                            "limit_amount": money.normalize(lim),
                             "closing_day": int(closing),
                             "due_day": int(due),
                             "is_active": True,
@@ -439,8 +449,9 @@ def render_cards_tab():
 
     st.markdown("---")
     st.markdown("#### Seus Cartões")
-    cards_all = fetch_cards(sb, HOUSEHOLD_ID, active_only=False) or []
-    limits = fetch_card_limits(sb, HOUSEHOLD_ID) or []
+    dados = loader.load(cards=(fetch_cards, sb, HOUSEHOLD_ID, False), limits=(fetch_card_limits, sb, HOUSEHOLD_ID))
+    cards_all = dados["cards"] or []
+    limits = dados["limits"] or []
     limap = {x.get("id"): x for x in limits}
     if not cards_all:
         st.info("Nenhum cartão cadastrado.")
@@ -481,16 +492,23 @@ def render_links_tab():
         st.info("Apenas o **owner** pode gerenciar vínculos.")
         return
 
-    has_acc_tbl = _exists_table("account_members")
-    has_card_tbl = _exists_table("card_members")
+    dados = loader.load(
+        has_acc=(_exists_table, "account_members"),
+        has_card=(_exists_table, "card_members"),
+        mems=(fetch_members, sb, HOUSEHOLD_ID),
+        # as mesmas entradas das abas Contas/Cartões (todas), filtradas aqui
+        accs=(fetch_accounts, sb, HOUSEHOLD_ID, False),
+        cards=(fetch_cards, sb, HOUSEHOLD_ID, False),
+    )
+    has_acc_tbl, has_card_tbl = dados["has_acc"], dados["has_card"]
     if not (has_acc_tbl or has_card_tbl):
         st.warning("Tabelas de vínculo não foram encontradas (`account_members`, `card_members`). "
                    "Os lançamentos ainda podem atribuir `member_id` normalmente. "
                    "Crie essas tabelas no banco para persistir os vínculos.")
 
-    mems = fetch_members(sb, HOUSEHOLD_ID) or []
-    accs = fetch_accounts(sb, HOUSEHOLD_ID, active_only=True) or []
-    cards = fetch_cards(sb, HOUSEHOLD_ID, active_only=True) or []
+    mems = dados["mems"] or []
+    accs = [a for a in dados["accs"] or [] if a.get("is_active")]
+    cards = [c for c in dados["cards"] or [] if c.get("is_active")]
 
     if not mems:
         st.info("Cadastre membros primeiro.")
@@ -553,8 +571,8 @@ def render_family_tab():
         st.info("Apenas **owner** pode editar relações familiares.")
         return
 
-    has_rel_tbl = _exists_table("relationships")
-    if not has_rel_tbl:
+    rels = fetch_relationships(sb, HOUSEHOLD_ID)
+    if rels is None:
         st.warning("Tabela `relationships` não encontrada. Crie-a para registrar relações familiares.")
         return
 
@@ -583,16 +601,11 @@ def render_family_tab():
     # ======= ALTERAÇÃO: merge manual (SELECT -> UPDATE/INSERT), sem exigir UNIQUE =======
     if st.button("Salvar relação", use_container_width=True):
         try:
-            existing = sb.table("relationships") \
-                .select("id") \
-                .eq("household_id", HOUSEHOLD_ID) \
-                .eq("from_member_id", left["id"]) \
-                .eq("to_member_id", right["id"]) \
-                .limit(1) \
-                .execute().data
+            existing = next((r for r in rels if r["from_member_id"] == left["id"]
+                             and r["to_member_id"] == right["id"]), None)
 
             if existing:
-                rel_id = existing[0]["id"]
+                rel_id = existing["id"]
                 sb.table("relationships").update({
                     "relationship_type": relation
                 }).eq("id", rel_id).execute()
@@ -604,6 +617,7 @@ def render_family_tab():
                     "relationship_type": relation
                 }).execute()
 
+            changefeed.changed(HOUSEHOLD_ID, "relationships")
             _toast("Relação salva!")
         except Exception as e:
             st.error(f"Erro ao salvar relação: {e}")
@@ -611,7 +625,7 @@ def render_family_tab():
     st.markdown("---")
     st.markdown("#### Relações existentes")
     try:
-        rows = sb.table("relationships").select("*").eq("household_id", HOUSEHOLD_ID).execute().data or []
+        rows = fetch_relationships(sb, HOUSEHOLD_ID) or []
         if not rows:
             st.info("Nenhuma relação registrada.")
         else:
@@ -628,30 +642,65 @@ def render_family_tab():
         st.error(f"Erro ao ler relações: {e}")
 
 # =========================
-# 7) Renderização das Abas
+# 7) Aba: Câmbio
+# =========================
+def render_fx_tab():
+    st.subheader("💱 Câmbio")
+    st.caption("Cotações diárias (R$ por unidade da moeda) para converter contas e lançamentos em outra moeda. "
+               "A tabela é do servidor e vale para todas as famílias.")
+
+    if fx.can_import(getattr(USER, "email", None)):
+        st.caption("CSV com colunas **data**, **moeda** e **taxa**; mesmo dia/moeda substitui o valor anterior.")
+        up = st.file_uploader("CSV de cotações", type=["csv", "txt"], key="fx_csv")
+        if up is not None and st.button("Importar cotações", key="fx_import"):
+            try:
+                n = fx.import_csv(up.getvalue())
+                _toast("Cotações importadas: " + ", ".join(f"{k} ({v})" for k, v in sorted(n.items())))
+            except Exception as e:
+                st.error(f"Erro ao importar: {e}")
+    else:
+        st.info("A importação de cotações é feita pelo administrador do servidor.")
+
+    cov = fx.coverage()
+    if cov:
+        st.dataframe(pd.DataFrame(cov), use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhuma cotação importada; valores em outra moeda entram sem conversão.")
+    falta = fx.missing(a.get("currency") for a in fetch_accounts(sb, HOUSEHOLD_ID, active_only=False) or [])
+    if falta:
+        st.warning(f"Moedas em uso sem cotação: {', '.join(sorted(falta))}.")
+
+# =========================
+# 8) Renderização das Abas
 # =========================
-tabs = st.tabs(["👥 Membros", "💰 Contas", "🏷️ Categorias", "💳 Cartões", "🔗 Vínculos", "🌳 Família"])
+tabs = st.tabs(["👥 Membros", "💰 Contas", "🏷️ Categorias", "💳 Cartões", "🔗 Vínculos", "🌳 Família", "💱 Câmbio"])
 
 with tabs[0]:
-    with st.container(border=True):
+    with st.container(border=True), perf.section("admin.membros"):
         render_members_tab()
 
 with tabs[1]:
-    with st.container(border=True):
+    with st.container(border=True), perf.section("admin.contas"):
         render_accounts_tab()
 
 with tabs[2]:
-    with st.container(border=True):
+    with st.container(border=True), perf.section("admin.categorias"):
         render_categories_tab()
 
 with tabs[3]:
-    with st.container(border=True):
+    with st.container(border=True), perf.section("admin.cartoes"):
         render_cards_tab()
 
 with tabs[4]:
-    with st.container(border=True):
+    with st.container(border=True), perf.section("admin.vinculos"):
         render_links_tab()
 
 with tabs[5]:
-    with st.container(border=True):
-        render_family_tab()
\ No newline at end of file
+    with st.container(border=True), perf.section("admin.familia"):
+        render_family_tab()
+
+with tabs[6]:
+    with st.container(border=True), perf.section("admin.cambio"):
+        render_fx_tab()
+
+perf.render_panel()
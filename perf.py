@@ -0,0 +1,420 @@
+# perf.py
+"""
+Tracing por rerun: chamadas ao Supabase, fetchers do utils e seções das páginas.
+
+Cada span registra duração, linhas, bytes de payload e hit/miss de cache.
+Ativação opt-in: variável FF_PERF=1 ou ?perf=1 na URL. Ao final do rerun
+(`render_panel`) o trace vai para um histórico em memória do processo, de
+onde saem o painel de debug, o p50/p95 por página e os dumps em texto
+Prometheus ou JSON lines (FF_PERF_LOG=/caminho/arquivo.jsonl grava direto).
+"""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import functools
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+_RUN_KEY = "__perf_run__"
+_FLAG_KEY = "__perf_enabled__"
+_HISTORY: deque = deque(maxlen=int(os.environ.get("FF_PERF_HISTORY", "500")))
+_HISTORY_LOCK = threading.Lock()
+_probe = threading.local()
+
+
+# =========================
+# Estado do rerun
+# =========================
+def _has_ctx() -> bool:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx() is not None
+    except Exception:
+        return False
+
+
+def enabled() -> bool:
+    if os.environ.get("FF_PERF") == "1":
+        return True
+    if not _has_ctx():
+        return False
+    try:
+        if st.session_state.get(_FLAG_KEY):
+            return True
+        if st.query_params.get("perf") == "1":
+            st.session_state[_FLAG_KEY] = True
+            return True
+    except Exception:
+        pass
+    return False
+
+
+def _run() -> Optional[dict]:
+    if not _has_ctx():
+        return None
+    try:
+        return st.session_state.get(_RUN_KEY)
+    except Exception:
+        return None
+
+
+def begin_rerun(page: str):
+    """Abre o trace do rerun atual (chamar no topo de cada página)."""
+    if not enabled():
+        return
+    st.session_state[_RUN_KEY] = {"page": page, "t0": time.perf_counter(), "ts": time.time(), "spans": []}
+
+
+def record(kind: str, name: str, duration: float, rows: Optional[int] = None,
+           nbytes: Optional[int] = None, cache: Optional[str] = None, ok: bool = True):
+    run = _run()
+    if run is None or run.get("done"):
+        return
+    run["spans"].append({
+        "kind": kind, "name": name, "ms": round(duration * 1000, 3),
+        "rows": rows, "bytes": nbytes, "cache": cache, "ok": ok,
+    })
+
+
+def _payload_stats(data: Any):
+    # fetchers com carimbo (utils._stamped) e páginas {"rows": ..., "total": n}
+    if isinstance(data, dict) and "fetched_at" in data:
+        data = data["data"]
+    if isinstance(data, dict) and isinstance(data.get("rows"), list):
+        data = data["rows"]
+    rows = len(data) if isinstance(data, list) else (1 if data is not None else 0)
+    try:
+        nbytes = len(json.dumps(data, default=str))
+    except Exception:
+        nbytes = None
+    return rows, nbytes
+
+
+@contextmanager
+def section(name: str):
+    """Mede um trecho de página (pandas, Plotly, renderização...)."""
+    if _run() is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record("section", name, time.perf_counter() - t0, ok=ok)
+
+
+def _fragment_rerun() -> bool:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return bool(ctx and ctx.fragment_ids_this_run)
+    except Exception:
+        return False
+
+
+def fragment(page: str, name: str, **fragment_kwargs):
+    """
+    st.fragment com seção de trace. Num rerun só do fragmento o topo da página
+    não roda, então o fragmento abre e fecha o próprio trace ("<page>/<name>").
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            if not _fragment_rerun():
+                with section(name):
+                    return fn(*args, **kwargs)
+            begin_rerun(f"{page}/{name}")
+            try:
+                with section(name):
+                    return fn(*args, **kwargs)
+            finally:
+                _finish()
+        return st.fragment(body, **fragment_kwargs)
+    return deco
+
+
+# =========================
+# Cliente Supabase instrumentado
+# =========================
+# Operações de storage resolvidas localmente pelo SDK (sem round trip)
+_LOCAL_STORAGE_OPS = {"get_public_url"}
+
+
+class _TracedCall:
+    """Envolve builders (table/rpc/storage) e mede o execute()/operações finais."""
+
+    def __init__(self, inner: Any, label: str):
+        self._inner = inner
+        self._label = label
+
+    def __getattr__(self, attr):
+        target = getattr(self._inner, attr)
+        if not callable(target):
+            return target
+
+        def call(*args, **kwargs):
+            if attr == "execute" or (self._label.startswith("storage") and attr not in _LOCAL_STORAGE_OPS):
+                if _run() is None:
+                    return target(*args, **kwargs)
+                t0 = time.perf_counter()
+                ok = True
+                res = None
+                try:
+                    res = target(*args, **kwargs)
+                    return res
+                except Exception:
+                    ok = False
+                    raise
+                finally:
+                    data = getattr(res, "data", res)
+                    rows, nbytes = _payload_stats(data) if ok and attr == "execute" else (None, None)
+                    if isinstance(data, (bytes, bytearray)):
+                        nbytes = len(data)
+                    name = self._label if attr == "execute" else f"{self._label}.{attr}"
+                    record("supabase", name, time.perf_counter() - t0, rows, nbytes, ok=ok)
+            out = target(*args, **kwargs)
+            return _TracedCall(out, self._label) if out is self._inner or _is_builder(out) else out
+
+        return call
+
+
+def _is_builder(obj) -> bool:
+    return hasattr(obj, "execute")
+
+
+class _TracedStorage:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def from_(self, bucket: str):
+        return _TracedCall(self._inner.from_(bucket), f"storage:{bucket}")
+
+    def __getattr__(self, attr):
+        return getattr(self._inner, attr)
+
+
+class TracingClient:
+    """Proxy do supabase.Client que registra cada round trip no trace do rerun."""
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    def table(self, name: str):
+        return _TracedCall(self._inner.table(name), f"table:{name}")
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[dict] = None, *args, **kwargs):
+        return _TracedCall(self._inner.rpc(name, params, *args, **kwargs), f"rpc:{name}")
+
+    @property
+    def storage(self):
+        return _TracedStorage(self._inner.storage)
+
+    def __getattr__(self, attr):
+        return getattr(self._inner, attr)
+
+
+def instrument(client):
+    """Retorna o cliente envolto pelo TracingClient (idempotente)."""
+    return client if isinstance(client, TracingClient) else TracingClient(client)
+
+
+# =========================
+# Fetchers com cache
+# =========================
+def traced(cache_decorator: Callable) -> Callable:
+    """
+    Aplica `cache_decorator` (ex.: st.cache_data(...)) e registra cada chamada
+    com hit/miss. O miss é detectado por uma sonda que só roda quando o corpo
+    original da função executa.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def probe(*args, **kwargs):
+            stack = getattr(_probe, "stack", None)
+            if stack:
+                stack[-1] = True
+            return fn(*args, **kwargs)
+
+        cached = cache_decorator(probe)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _run() is None:
+                return cached(*args, **kwargs)
+            stack = _probe.__dict__.setdefault("stack", [])
+            stack.append(False)
+            t0 = time.perf_counter()
+            ok = True
+            res = None
+            try:
+                res = cached(*args, **kwargs)
+                return res
+            except Exception:
+                ok = False
+                raise
+            finally:
+                miss = stack.pop()
+                rows, nbytes = _payload_stats(res) if ok else (None, None)
+                record("fetch", fn.__name__, time.perf_counter() - t0, rows, nbytes,
+                       cache="miss" if miss else "hit", ok=ok)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return deco
+
+
+# =========================
+# Fechamento do rerun, agregados e dumps
+# =========================
+def _finish() -> Optional[dict]:
+    run = _run()
+    if run is None or run.get("done"):
+        return run
+    run["done"] = True
+    run["total_ms"] = round((time.perf_counter() - run["t0"]) * 1000, 3)
+    entry = {k: run[k] for k in ("page", "ts", "total_ms", "spans")}
+    with _HISTORY_LOCK:
+        _HISTORY.append(entry)
+    path = os.environ.get("FF_PERF_LOG")
+    if path:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError:
+            pass
+    return run
+
+
+def history() -> List[dict]:
+    with _HISTORY_LOCK:
+        return list(_HISTORY)
+
+
+def _quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    v = sorted(values)
+    i = min(len(v) - 1, max(0, int(round(q * (len(v) - 1)))))
+    return v[i]
+
+
+def page_stats() -> Dict[str, dict]:
+    """p50/p95 do tempo de rerun por página, a partir do histórico do processo."""
+    by_page: Dict[str, List[float]] = {}
+    for e in history():
+        by_page.setdefault(e["page"], []).append(e["total_ms"])
+    return {
+        p: {"count": len(v), "p50_ms": _quantile(v, .5), "p95_ms": _quantile(v, .95)}
+        for p, v in by_page.items()
+    }
+
+
+def metrics_jsonl() -> str:
+    return "".join(json.dumps(e, default=str) + "\n" for e in history())
+
+
+def _esc(s: str) -> str:
+    return str(s).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def metrics_prometheus() -> str:
+    lines = [
+        "# HELP ff_rerun_duration_ms Duração do rerun por página.",
+        "# TYPE ff_rerun_duration_ms summary",
+    ]
+    hist = history()
+    for page, s in page_stats().items():
+        p = _esc(page)
+        lines.append(f'ff_rerun_duration_ms{{page="{p}",quantile="0.5"}} {s["p50_ms"]}')
+        lines.append(f'ff_rerun_duration_ms{{page="{p}",quantile="0.95"}} {s["p95_ms"]}')
+        tot = sum(e["total_ms"] for e in hist if e["page"] == page)
+        lines.append(f'ff_rerun_duration_ms_sum{{page="{p}"}} {round(tot, 3)}')
+        lines.append(f'ff_rerun_duration_ms_count{{page="{p}"}} {s["count"]}')
+
+    agg: Dict[tuple, dict] = {}
+    for e in hist:
+        for sp in e["spans"]:
+            a = agg.setdefault((e["page"], sp["kind"], sp["name"]),
+                               {"ms": 0.0, "n": 0, "rows": 0, "bytes": 0, "hit": 0, "miss": 0})
+            a["ms"] += sp["ms"]
+            a["n"] += 1
+            a["rows"] += sp.get("rows") or 0
+            a["bytes"] += sp.get("bytes") or 0
+            if sp.get("cache") in ("hit", "miss"):
+                a[sp["cache"]] += 1
+    lines += ["# HELP ff_span_duration_ms Tempo por chamada/seção.", "# TYPE ff_span_duration_ms summary"]
+    for (page, kind, name), a in sorted(agg.items()):
+        lb = f'page="{_esc(page)}",kind="{kind}",name="{_esc(name)}"'
+        lines.append(f"ff_span_duration_ms_sum{{{lb}}} {round(a['ms'], 3)}")
+        lines.append(f"ff_span_duration_ms_count{{{lb}}} {a['n']}")
+        lines.append(f"ff_span_rows_total{{{lb}}} {a['rows']}")
+        lines.append(f"ff_span_bytes_total{{{lb}}} {a['bytes']}")
+        if a["hit"] or a["miss"]:
+            lines.append(f'ff_cache_requests_total{{{lb},result="hit"}} {a["hit"]}')
+            lines.append(f'ff_cache_requests_total{{{lb},result="miss"}} {a["miss"]}')
+
+    import datacache
+    dc = datacache.stats()
+    lines += ["# HELP ff_data_cache_bytes Bytes no cache dos fetchers.", "# TYPE ff_data_cache_bytes gauge",
+              f'ff_data_cache_bytes {dc["_total"]["bytes"]}',
+              f'ff_data_cache_max_bytes {dc["_total"]["max_bytes"]}']
+    for name, s in sorted(dc.items()):
+        if name == "_total":
+            continue
+        lb = f'fetcher="{_esc(name)}"'
+        lines.append(f"ff_data_cache_entry_bytes{{{lb}}} {s['bytes']}")
+        lines.append(f"ff_data_cache_entries{{{lb}}} {s['entries']}")
+        for k in ("hits", "misses", "evictions", "expired", "rejected"):
+            lines.append(f"ff_data_cache_{k}_total{{{lb}}} {s[k]}")
+    return "\n".join(lines) + "\n"
+
+
+def render_panel():
+    """Fecha o trace do rerun e, se ativo, mostra o painel de performance."""
+    run = _finish()
+    if run is None:
+        return
+    import pandas as pd
+
+    spans = run["spans"]
+    with st.expander(f"⏱️ Performance do rerun — {run['total_ms']:.0f} ms", expanded=False):
+        if spans:
+            df = pd.DataFrame(spans)
+            by_kind = df.groupby("kind")["ms"].agg(["count", "sum"]).reset_index()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Round trips", int((df["kind"] == "supabase").sum()))
+            c2.metric("Cache hits", int((df["cache"] == "hit").sum()))
+            c3.metric("Cache misses", int((df["cache"] == "miss").sum()))
+            st.dataframe(by_kind.rename(columns={"count": "Qtde", "sum": "Total (ms)"}),
+                         use_container_width=True, hide_index=True)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nenhum span registrado neste rerun.")
+
+        stats = page_stats()
+        if stats:
+            st.markdown("##### p50/p95 por página (processo)")
+            st.dataframe(pd.DataFrame([{"Página": p, **s} for p, s in stats.items()]),
+                         use_container_width=True, hide_index=True)
+        import datacache
+        dc = datacache.stats()
+        tot = dc.pop("_total")
+        if dc:
+            st.markdown(f"##### Cache de dados (processo) — {tot['bytes'] / 1024:.0f} KiB "
+                        f"de {tot['max_bytes'] / 1024 / 1024:.0f} MiB, {tot['households']} household(s)")
+            st.dataframe(pd.DataFrame([{"Fetcher": k, **v} for k, v in sorted(dc.items())]),
+                         use_container_width=True, hide_index=True)
+        d1, d2 = st.columns(2)
+        d1.download_button("Métricas (Prometheus)", metrics_prometheus(), "ff_metrics.prom", "text/plain")
+        d2.download_button("Métricas (JSON lines)", metrics_jsonl(), "ff_metrics.jsonl", "application/json")
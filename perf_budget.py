@@ -0,0 +1,151 @@
+# perf_budget.py
+"""
+Orçamento de round trips por página.
+
+Renderiza cada página (Home, Financeiro, Dashboards, Administração) — e as
+abas preguiçosas listadas como "<página>/<aba>" — com o
+AppTest do Streamlit contra o cliente fake (fake_supabase.FakeSupabase),
+conta os round trips de um rerun com cache frio e de um rerun com cache
+quente, e falha quando algum número passa do orçamento declarado em BUDGETS.
+
+Uso (CI / antes do deploy):
+    python perf_budget.py            # sai com código 1 se algum orçamento estourar
+    python -m pytest tests           # o mesmo, como teste (tests/test_perf_budget.py)
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Round trips máximos por rerun. "cold" = cache vazio; "warm" = rerun seguinte.
+# Ao otimizar uma página, reduza o número aqui para travar o ganho.
+BUDGETS: Dict[str, Dict[str, int]] = {
+    "Home":          {"cold": 3, "warm": 0},
+    "Financeiro":    {"cold": 3, "warm": 0},
+    "Financeiro/Movimentações": {"cold": 1, "warm": 0},
+    "Financeiro/Fluxo de caixa": {"cold": 2, "warm": 0},
+    "Financeiro/Busca": {"cold": 2, "warm": 0},
+    "Financeiro/Conciliação": {"cold": 0, "warm": 0},
+    # +1 no frio: ledger_month_checksums ao criar o snapshot analítico; em troca,
+    # as atualizações seguintes rebuscam só os meses alterados (analytics.py)
+    "Dashboards":    {"cold": 4, "warm": 0},
+    "Dashboards/Fluxo de caixa": {"cold": 2, "warm": 0},
+    "Dashboards/Patrimônio": {"cold": 2, "warm": 0},
+    "Dashboards/Comparativo": {"cold": 4, "warm": 0},
+    "Administração": {"cold": 10, "warm": 0},
+}
+
+PAGES: Dict[str, Optional[str]] = {
+    "Home": None,  # app.py
+    "Financeiro": "pages/💼_Financeiro.py",
+    "Dashboards": "pages/📊_Dashboards.py",
+    "Administração": "pages/🧰_Administracao.py",
+}
+
+# Abas preguiçosas (só a aberta roda): "<página>/<aba>" -> chave do st.tabs
+TABS: Dict[str, str] = {
+    "Financeiro": "fin_tabs",
+    "Dashboards": "dash_tabs",
+}
+
+
+def _new_app(client):
+    from streamlit.testing.v1 import AppTest
+
+    user = client.auth.sign_in_with_password({"email": "budget@local", "password": "budget123"}).user
+    for m in client._tables["members"]:
+        if m["id"] == "m-1":
+            m["user_id"] = user.id
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.session_state["sb"] = client
+    at.session_state["auth_ok"] = True
+    at.session_state["user"] = user
+    at.session_state["HOUSEHOLD_ID"] = "hh-demo"
+    at.session_state["MY_MEMBER_ID"] = "m-1"
+    # lembrete de vencimentos já enviado hoje (não entra no orçamento das páginas)
+    from datetime import date
+    at.session_state[f"__notified__{date.today().isoformat()}"] = True
+    return at
+
+
+def payload(at) -> Dict[str, int]:
+    """
+    Tamanho do rerun no fio: soma dos protos dos elementos renderizados
+    (o que vai pelo websocket) e quantos arquivos de mídia (/media) a página
+    referencia — cada um é um download à parte no navegador.
+    """
+    total, media = 0, 0
+    stack = [at._tree]
+    while stack:
+        node = stack.pop()
+        proto = getattr(node, "proto", None)
+        if proto is not None and hasattr(proto, "ByteSize"):
+            total += proto.ByteSize()
+            media += sum(1 for i in getattr(proto, "imgs", []) if "/media/" in i.url)
+        stack.extend((getattr(node, "children", None) or {}).values())
+    return {"bytes": total, "media": media}
+
+
+def measure(page: str, client=None) -> Dict[str, object]:
+    """Roda a página duas vezes e retorna os round trips de cada rerun."""
+    import tempfile
+    import streamlit as st
+    import analytics
+    import datacache
+    from fake_supabase import FakeSupabase, demo_dataset
+
+    client = client or FakeSupabase(demo_dataset())
+    at = _new_app(client)
+    page, _, tab = page.partition("/")
+    if tab:
+        at.session_state[TABS[page]] = tab
+    path = PAGES[page]
+    if path:
+        at.switch_page(path)
+
+    st.cache_data.clear()
+    datacache.clear()
+    out: Dict[str, object] = {"page": f"{page}/{tab}" if tab else page}
+    # snapshot analítico vazio: "cold" não depende do que ficou em disco de outra execução
+    saved, snapshots = analytics.SNAPSHOT_DIR, tempfile.TemporaryDirectory()
+    analytics.SNAPSHOT_DIR = snapshots.name
+    try:
+        for phase in ("cold", "warm"):
+            client.reset_calls()
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"{page}: {at.exception[0].message}")
+            out[phase] = client.round_trips
+            out[f"{phase}_payload"] = payload(at)
+            out[f"{phase}_calls"] = [c["label"] for c in client.calls]
+    finally:
+        analytics.SNAPSHOT_DIR = saved
+        snapshots.cleanup()
+    return out
+
+
+def check(budgets: Dict[str, Dict[str, int]] = BUDGETS) -> List[str]:
+    """Mede todas as páginas e devolve a lista de violações (vazia = ok)."""
+    violations = []
+    for page, budget in budgets.items():
+        res = measure(page)
+        for phase, limit in budget.items():
+            if res[phase] > limit:
+                violations.append(
+                    f"{page} [{phase}]: {res[phase]} round trips (orçamento {limit}) — "
+                    + ", ".join(res[f"{phase}_calls"])
+                )
+        pl = res["warm_payload"]
+        print(f"{page:<26} cold={res['cold']:>3}/{budget.get('cold')}  warm={res['warm']:>3}/{budget.get('warm')}"
+              f"  rerun={pl['bytes'] / 1024:6.1f} KiB  mídia={pl['media']}")
+    return violations
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    problems = check()
+    for p in problems:
+        print("ORÇAMENTO EXCEDIDO:", p)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,231 @@
+# reconcile.py
+"""
+Conciliação de extrato bancário com os lançamentos previstos em aberto.
+
+Comparar cada linha do extrato com cada lançamento é O(n·m). Aqui os
+lançamentos em aberto são indexados por (tipo, faixa de valor, faixa de
+data) e cada linha do extrato só consulta as faixas vizinhas — um hash join
+com janela de tolerância (valor ± centavos, data ± dias). Os candidatos
+recebem uma nota (descrição parecida pesa mais; valor e data exatos
+desempatam) e a atribuição é um-para-um: as maiores notas escolhem primeiro.
+
+    linhas = reconcile.parse_statement(arquivo.read(), arquivo.name)
+    props = reconcile.match(linhas, abertos, cents=0, days=3)
+
+Formatos aceitos: CSV (separador e vírgula decimal detectados) e OFX.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+import csv
+import io
+import re
+import unicodedata
+
+import money
+
+# Pesos da nota (somam 1)
+W_DESC, W_DATE, W_AMOUNT = 0.6, 0.25, 0.15
+
+_DATE_COLS = ("data", "date", "dt", "data lançamento", "data lancamento", "data movimento")
+_DESC_COLS = ("descrição", "descricao", "histórico", "historico", "description", "memo", "lançamento", "lancamento")
+_AMOUNT_COLS = ("valor", "amount", "valor (r$)", "value")
+
+
+# =========================
+# Leitura do extrato
+# =========================
+def _parse_date(v: str) -> Optional[date]:
+    v = (v or "").strip()[:10]
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%Y%m%d"):
+        try:
+            return datetime.strptime(v, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_amount(v: str) -> Optional[float]:
+    """'1.234,56', '-1234.56', 'R$ 10,00', '(10,00)' -> float."""
+    s = (v or "").strip().replace("R$", "").replace(" ", "")
+    neg = s.startswith("(") and s.endswith(")")
+    s = s.strip("()")
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".") if s.rfind(",") > s.rfind(".") else s.replace(",", "")
+    elif "," in s:
+        s = s.replace(",", ".")
+    try:
+        x = float(s)
+    except ValueError:
+        return None
+    return -x if neg else x
+
+
+def _pick(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    low = [h.strip().lower() for h in header]
+    for n in names:
+        if n in low:
+            return low.index(n)
+    return None
+
+
+def _parse_csv(text: str) -> List[dict]:
+    sample = text[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    if not rows:
+        return []
+    header = rows[0]
+    i_d, i_s, i_v = _pick(header, _DATE_COLS), _pick(header, _DESC_COLS), _pick(header, _AMOUNT_COLS)
+    if i_d is None or i_v is None:
+        raise ValueError("CSV sem colunas de data e valor reconhecíveis (ex.: Data;Descrição;Valor).")
+    out = []
+    for r in rows[1:]:
+        if len(r) <= max(i_d, i_v):
+            continue
+        d, v = _parse_date(r[i_d]), _parse_amount(r[i_v])
+        if d is None or v is None:
+            continue
+        out.append({"date": d, "amount": v, "description": (r[i_s] if i_s is not None and i_s < len(r) else "").strip()})
+    return out
+
+
+_OFX_TX = re.compile(r"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|$)", re.S | re.I)
+
+
+def _ofx_tag(block: str, tag: str) -> str:
+    m = re.search(rf"<{tag}>([^<\r\n]*)", block, re.I)
+    return m.group(1).strip() if m else ""
+
+
+def _parse_ofx(text: str) -> List[dict]:
+    out = []
+    for block in _OFX_TX.findall(text):
+        d = _parse_date(_ofx_tag(block, "DTPOSTED")[:8])
+        v = _parse_amount(_ofx_tag(block, "TRNAMT"))
+        if d is None or v is None:
+            continue
+        desc = _ofx_tag(block, "MEMO") or _ofx_tag(block, "NAME")
+        out.append({"date": d, "amount": v, "description": desc, "fitid": _ofx_tag(block, "FITID") or None})
+    return out
+
+
+def parse_statement(data: bytes, filename: str = "") -> List[dict]:
+    """Linhas do extrato: [{date, amount (negativo = saída), description}, ...]."""
+    for enc in ("utf-8-sig", "latin-1"):
+        try:
+            text = data.decode(enc)
+            break
+        except UnicodeDecodeError:
+            continue
+    if filename.lower().endswith((".ofx", ".qfx")) or "<OFX>" in text[:2048].upper():
+        return _parse_ofx(text)
+    return _parse_csv(text)
+
+
+# =========================
+# Casamento
+# =========================
+def _fold(s: Optional[str]) -> str:
+    s = unicodedata.normalize("NFKD", (s or "").lower())
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", s).split())
+
+
+def _cents(v) -> int:
+    return abs(money.to_cents(v))
+
+
+def planned_amount(t: dict) -> float:
+    return float(t.get("planned_amount") if t.get("planned_amount") is not None else t.get("amount") or 0.0)
+
+
+def effective_date(t: dict) -> Optional[date]:
+    """Mesma regra do fluxo de caixa: vencimento, ou a data do lançamento."""
+    for k in ("due_date", "occurred_at"):
+        v = t.get(k)
+        if v:
+            try:
+                return v if isinstance(v, date) else date.fromisoformat(str(v)[:10])
+            except ValueError:
+                continue
+    return None
+
+
+def similarity(a: Optional[str], b: Optional[str]) -> float:
+    """0..1 entre descrições (sem acento/caixa/pontuação; prefixo comum conta)."""
+    fa, fb = _fold(a), _fold(b)
+    if not fa or not fb:
+        return 0.0
+    if min(len(fa), len(fb)) >= 4 and (fa in fb or fb in fa):
+        return 1.0
+    return SequenceMatcher(None, fa, fb, autojunk=False).ratio()
+
+
+def build_index(items: Iterable[dict], cents: int, days: int) -> Dict[tuple, List[tuple]]:
+    """
+    (tipo, faixa de valor, faixa de data) -> [(centavos, data, item)].
+    Faixas com a largura da tolerância: o candidato está na faixa da linha ou numa vizinha.
+    """
+    wa, wd = cents + 1, days + 1
+    idx: Dict[tuple, List[tuple]] = {}
+    for t in items:
+        d = effective_date(t)
+        if d is None:
+            continue
+        c = _cents(planned_amount(t))
+        idx.setdefault((t.get("type"), c // wa, d.toordinal() // wd), []).append((c, d, t))
+    return idx
+
+
+def candidates(line: dict, idx: Dict[tuple, List[tuple]], cents: int, days: int) -> List[tuple]:
+    """[(nota, item, Δcentavos, Δdias)] dentro da tolerância, maior nota primeiro."""
+    wa, wd = cents + 1, days + 1
+    kind = "expense" if line["amount"] < 0 else "income"
+    c, o = _cents(line["amount"]), line["date"].toordinal()
+    out = []
+    for ba in (c // wa - 1, c // wa, c // wa + 1):
+        for bd in (o // wd - 1, o // wd, o // wd + 1):
+            for ic, idate, t in idx.get((kind, ba, bd), ()):
+                da, dd = abs(ic - c), abs(idate.toordinal() - o)
+                if da > cents or dd > days:
+                    continue
+                score = (W_DESC * similarity(line.get("description"), t.get("description"))
+                         + W_DATE * (1 - dd / wd) + W_AMOUNT * (1 - da / wa))
+                out.append((round(score, 4), t, da, dd))
+    out.sort(key=lambda x: (-x[0], x[3], x[2], str(x[1].get("id"))))
+    return out
+
+
+def match(lines: List[dict], items: List[dict], cents: int = 0, days: int = 3,
+          min_score: float = 0.0) -> Dict[str, list]:
+    """
+    Propõe pares um-para-um extrato x lançamento em aberto.
+    Retorna {"pairs": [{line, item, score, delta_cents, delta_days}], "unmatched": [linhas]}.
+    Atribuição gulosa por nota: cada lançamento e cada linha entram em no máximo um par.
+    """
+    idx = build_index((t for t in items if not t.get("is_paid")), cents, days)
+    edges = []
+    for i, line in enumerate(lines):
+        for score, t, da, dd in candidates(line, idx, cents, days):
+            if score >= min_score:
+                edges.append((score, -dd, -da, i, t))
+    edges.sort(key=lambda e: (-e[0], -e[1], -e[2], e[3], str(e[4].get("id"))))
+    used_lines, used_items, pairs = set(), set(), []
+    for score, ndd, nda, i, t in edges:
+        if i in used_lines or t.get("id") in used_items:
+            continue
+        used_lines.add(i); used_items.add(t.get("id"))
+        pairs.append({"line": lines[i], "item": t, "score": score, "delta_cents": -nda, "delta_days": -ndd})
+    pairs.sort(key=lambda p: (p["line"]["date"], p["line"].get("description") or ""))
+    return {"pairs": pairs, "unmatched": [l for i, l in enumerate(lines) if i not in used_lines]}
+
+
+def window(lines: List[dict], days: int) -> Tuple[date, date]:
+    """Intervalo de lançamentos a buscar para cobrir o extrato com a tolerância."""
+    ds = [l["date"] for l in lines]
+    return min(ds) - timedelta(days=days), max(ds) + timedelta(days=days)
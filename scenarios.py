@@ -0,0 +1,189 @@
+# scenarios.py
+"""
+Simulação Monte Carlo do fluxo de caixa.
+
+O fluxo previsto responde "e se tudo sair como planejado". Aqui são sorteados
+milhares de caminhos futuros do saldo a partir de:
+
+  * lançamentos previstos em aberto: o valor de cada um varia com a razão
+    pago/previsto observada na categoria (conta de luz varia, aluguel não);
+  * gasto/receita variável: o histórico mensal de cada categoria (média e
+    desvio, últimos 12 meses fechados). No mês em que os previstos da
+    categoria já cobrem a média, nada é somado; senão a diferença entra
+    como fluxo diário com distribuição gama (nunca negativo).
+
+Tudo vetorizado em NumPy: cenários × dias, sem laço Python por cenário.
+12 meses × 2.000 cenários roda em bem menos de 1 s num núcleo.
+
+    modelo = scenarios.build_model(historico, previstos, hoje, dias=365)
+    res = scenarios.simulate(saldo_inicial_centavos, modelo, n=2000)
+    res["bands"][50]        # mediana do saldo por dia (reais)
+    res["items"]            # previstos com a probabilidade de saldo negativo até o vencimento
+"""
+from __future__ import annotations
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+import fx
+import money
+import perf
+from reconcile import effective_date
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTORY_MONTHS = 12
+MIN_RATIO_SAMPLES = 3
+
+
+# =========================
+# Modelo (a partir das linhas do banco)
+# =========================
+def _month_key(d: date) -> str:
+    return d.strftime("%Y-%m")
+
+
+def history_window(today: date, months: int = HISTORY_MONTHS):
+    """Meses fechados antes do atual: (início, fim)."""
+    first = today.replace(day=1)
+    start = first
+    for _ in range(months):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start, first - timedelta(days=1)
+
+
+def category_stats(history: Sequence[dict], today: date, months: int = HISTORY_MONTHS) -> Dict[tuple, dict]:
+    """
+    (tipo, category_id) -> {mean, std} do total mensal (centavos) e
+    {ratio_mean, ratio_std} da razão pago/previsto dos lançamentos pagos.
+    """
+    start, end = history_window(today, months)
+    rows = [r for r in history if (d := effective_date(r)) and start <= d <= end and r.get("type") in ("income", "expense")]
+    meses, m = [], start
+    while m <= end:
+        meses.append(_month_key(m))
+        m = (m.replace(day=28) + timedelta(days=4)).replace(day=1)
+    col = {m: i for i, m in enumerate(meses)}
+
+    eff = fx.effective(rows)
+    keys = [(r["type"], r.get("category_id")) for r in rows]
+    idx: Dict[tuple, int] = {}
+    codes = np.fromiter((idx.setdefault(k, len(idx)) for k in keys), dtype=np.int64, count=len(keys))
+    mcol = np.fromiter((col.get(_month_key(effective_date(r)), 0) for r in rows), dtype=np.int64, count=len(rows))
+    grid = np.zeros((len(idx), len(meses)), dtype=np.int64)
+    np.add.at(grid, (codes, mcol), eff)
+
+    plan = fx.planned(rows)
+    paid_ok = np.fromiter((bool(r.get("is_paid")) and r.get("paid_amount") is not None for r in rows),
+                          dtype=bool, count=len(rows)) & (plan > 0)
+    ratio = np.where(paid_ok, eff / np.maximum(plan, 1), np.nan)
+
+    out = {}
+    for k, i in idx.items():
+        rs = ratio[(codes == i) & paid_ok]
+        enough = len(rs) >= MIN_RATIO_SAMPLES
+        out[k] = {
+            "mean": float(grid[i].mean()), "std": float(grid[i].std()),
+            "ratio_mean": float(rs.mean()) if enough else 1.0,
+            "ratio_std": float(rs.std()) if enough else 0.0,
+        }
+    return out
+
+
+def build_model(history: Sequence[dict], planned: Sequence[dict], today: date, days: int = 365) -> dict:
+    """
+    Parâmetros da simulação: previstos em aberto no horizonte (dia, valor,
+    sinal, variação) e, por dia, média/variância do fluxo variável.
+    """
+    stats = category_stats(history, today)
+    items = []
+    for r in planned:
+        d = effective_date(r)
+        if r.get("is_paid") or d is None or r.get("type") not in ("income", "expense"):
+            continue
+        day = (d - today).days
+        if 0 <= day < days:
+            items.append((r, day))
+    rows = [r for r, _ in items]
+    plan = fx.planned(rows).astype(np.float64)
+    st_items = [stats.get((r["type"], r.get("category_id")), {}) for r in rows]
+
+    # previsto por (tipo, categoria, mês): o variável só completa o que faltar para a média
+    coberto = money.group_sum([(r["type"], r.get("category_id"), _month_key(today + timedelta(days=day)))
+                               for r, day in items], plan.astype(np.int64))
+    mean = {"income": np.zeros(days), "expense": np.zeros(days)}
+    var = {"income": np.zeros(days), "expense": np.zeros(days)}
+    d0 = 0
+    while d0 < days:
+        dia = today + timedelta(days=d0)
+        dim = monthrange(dia.year, dia.month)[1]
+        n = min(dim - dia.day + 1, days - d0)  # dias do mês dentro do horizonte
+        frac = n / dim
+        for (kind, cat), s in stats.items():
+            extra = s["mean"] * frac - coberto.get((kind, cat, _month_key(dia)), 0)
+            if extra > 0:
+                mean[kind][d0:d0 + n] += extra / n
+                var[kind][d0:d0 + n] += s["std"] ** 2 * frac / n
+        d0 += n
+
+    return {
+        "start": today,
+        "days": days,
+        "items": rows,
+        "day": np.array([day for _, day in items], dtype=np.int64),
+        "amount": plan,
+        "sign": np.array([1.0 if r["type"] == "income" else -1.0 for r in rows]),
+        "ratio_mean": np.array([s.get("ratio_mean", 1.0) for s in st_items]),
+        "ratio_std": np.array([s.get("ratio_std", 0.0) for s in st_items]),
+        "var_mean": mean,
+        "var_var": var,
+    }
+
+
+# =========================
+# Simulação
+# =========================
+def _gamma_flows(rng, mean: np.ndarray, var: np.ndarray, n: int) -> np.ndarray:
+    """(n, dias) com média/variância por dia; variância zero = valor fixo."""
+    rand = (var > 0) & (mean > 0)
+    shape = np.where(rand, mean ** 2 / np.where(rand, var, 1), 0.0)
+    scale = np.where(rand, var / np.where(rand, mean, 1), 1.0)
+    draws = rng.gamma(shape, scale, size=(n, len(mean)))
+    return np.where(rand, draws, mean)
+
+
+def simulate(start_balance: int, model: dict, n: int = 2000, seed: Optional[int] = 7,
+             percentiles: Sequence[int] = PERCENTILES) -> dict:
+    """
+    Sorteia `n` caminhos do saldo (centavos) a partir de `start_balance`.
+    Retorna {dates, bands{p: reais por dia}, p_negative (por dia), p_end_negative, items}.
+    """
+    days = model["days"]
+    rng = np.random.default_rng(seed)
+    with perf.section("scenarios.simulate"):
+        flows = (_gamma_flows(rng, model["var_mean"]["income"], model["var_var"]["income"], n)
+                 - _gamma_flows(rng, model["var_mean"]["expense"], model["var_var"]["expense"], n))
+        if len(model["amount"]):
+            ratio = rng.normal(model["ratio_mean"], model["ratio_std"], size=(n, len(model["amount"])))
+            valores = np.clip(ratio, 0.0, None) * (model["amount"] * model["sign"])
+            # soma por dia de vencimento: itens ordenados por dia, reduceat por grupo
+            order = np.argsort(model["day"], kind="stable")
+            dias_u, inicio = np.unique(model["day"][order], return_index=True)
+            flows[:, dias_u] += np.add.reduceat(valores[:, order], inicio, axis=1)
+        saldo = float(start_balance) + np.cumsum(flows, axis=1)
+        bands = np.percentile(saldo, percentiles, axis=0)
+        p_neg = (np.minimum.accumulate(saldo, axis=1) < 0).mean(axis=0)
+
+    items = [{
+        "id": r.get("id"), "description": r.get("description"), "type": r.get("type"),
+        "due": model["start"] + timedelta(days=int(d)), "planned": money.to_reais(int(a)),
+        "p_negative": float(p_neg[d]),
+    } for r, d, a in zip(model["items"], model["day"], model["amount"])]
+    return {
+        "dates": [model["start"] + timedelta(days=i) for i in range(days)],
+        "bands": {p: money.to_reais(np.rint(b)) for p, b in zip(percentiles, bands)},
+        "p_negative": p_neg,
+        "p_end_negative": float((saldo[:, -1] < 0).mean()) if days else 0.0,
+        "items": items,
+    }
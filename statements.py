@@ -0,0 +1,314 @@
+# statements.py
+"""
+Extrato mensal em PDF gerado em segundo plano.
+
+A página só coleta os dados (os mesmos fetchers/agregações do dashboard) e
+entrega um dicionário simples (JSON) a um interpretador novo
+(`python -m statements`); a renderização do PDF roda fora do rerun do
+Streamlit. Nada de fork: o servidor do Streamlit tem threads e locks vivos, e
+spawn/forkserver do multiprocessing reexecutariam o script da página (é o
+__main__ dentro do Streamlit) no worker. O resultado fica em disco por
+(household, mês, impressão digital dos dados): pedir de novo o mesmo extrato
+sem mudança nos lançamentos devolve o arquivo pronto.
+
+A página consulta `status()` periodicamente só enquanto o PDF está sendo gerado;
+se pedido, o extrato é enviado por e-mail (utils.send_email) ao terminar —
+também numa thread do pool, nunca dentro do rerun.
+"""
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+STATEMENTS_DIR = os.environ.get(
+    "FF_STATEMENTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ff_statements")
+)
+MAX_WORKERS = int(os.environ.get("FF_STATEMENT_WORKERS", "2"))
+WORKER_TIMEOUT = 120  # segundos por extrato
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+_JOBS: Dict[Tuple[str, str], Tuple[str, Future]] = {}
+
+
+def _pool() -> ThreadPoolExecutor:
+    """Threads que só esperam o processo do worker (no máximo MAX_WORKERS ao mesmo tempo)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ff-statement")
+        return _POOL
+
+
+def _run_worker(payload: dict, path: str) -> str:
+    """Renderiza num processo novo (python -m statements <path>, payload no stdin)."""
+    proc = subprocess.run([sys.executable, "-m", "statements", path], cwd=_HERE,
+                          input=json.dumps(payload, default=str).encode(),
+                          capture_output=True, timeout=WORKER_TIMEOUT)
+    if proc.returncode != 0:
+        err = proc.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(err[-1] if err else f"worker terminou com código {proc.returncode}")
+    return path
+
+
+def month_bounds(month: str) -> Tuple[date, date]:
+    """'YYYY-MM' -> (primeiro dia, último dia)."""
+    first = date.fromisoformat(f"{month}-01")
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+
+# =========================
+# Coleta (no processo do Streamlit)
+# =========================
+def collect(sb, household_id: str, month: str) -> dict:
+    """Monta o payload do extrato com os fetchers cacheados do utils."""
+    from utils import (fetch_tx, fetch_tx_due, fetch_categories, fetch_members,
+                       summarize_transactions, _to_date_safe)
+
+    first, last = month_bounds(month)
+    txs = fetch_tx(sb, household_id, first, last)
+    cats = {c["id"]: c.get("name", "Sem Categoria") for c in fetch_categories(sb, household_id)}
+    mems = {m["id"]: m.get("display_name") for m in fetch_members(sb, household_id)}
+    summary = summarize_transactions(txs, cats, mems)
+
+    bills = []
+    for t in fetch_tx_due(sb, household_id, first, last):
+        if t.get("type") != "expense":
+            continue
+        due = _to_date_safe(t.get("due_date")) or _to_date_safe(t.get("occurred_at"))
+        bills.append({
+            "due": due.isoformat() if due else "",
+            "description": t.get("description") or "(sem descrição)",
+            "category": cats.get(t.get("category_id"), "Sem Categoria"),
+            "planned": float(t.get("planned_amount") or t.get("amount") or 0),
+            "paid": float(t["paid_amount"]) if t.get("paid_amount") is not None else None,
+            "is_paid": bool(t.get("is_paid")),
+        })
+    return {"household_id": household_id, "month": month, "summary": summary, "bills": bills}
+
+
+def fingerprint(payload: dict) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _path(household_id: str, month: str, fp: str) -> str:
+    return os.path.join(STATEMENTS_DIR, str(household_id), f"extrato_{month}_{fp}.pdf")
+
+
+# =========================
+# Orquestração
+# =========================
+def request(sb, household_id: str, month: str, email_to: Optional[List[str]] = None) -> str:
+    """
+    Garante que o extrato do mês esteja pronto ou em geração. Retorna o caminho
+    final do PDF (que pode ainda não existir enquanto o job roda).
+    """
+    payload = collect(sb, household_id, month)
+    fp = fingerprint(payload)
+    path = _path(household_id, month, fp)
+    key = (str(household_id), month)
+
+    current = _JOBS.get(key)
+    if os.path.exists(path):
+        # já pronto (inclusive de antes de reiniciar): status() passa a oferecer este arquivo
+        done: Future = Future()
+        done.set_result(path)
+        _JOBS[key] = (path, done)
+        if email_to:
+            _pool().submit(_email, path, month, email_to)  # SMTP fora do rerun
+        return path
+    if current and current[0] == path and not current[1].done():
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fut = _pool().submit(_run_worker, payload, path)
+    if email_to:
+        def _send_when_done(f: Future):
+            if f.exception() is None:
+                _email(path, month, email_to)
+        fut.add_done_callback(_send_when_done)
+    _JOBS[key] = (path, fut)
+    return path
+
+
+def status(household_id: str, month: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    ("pronto", caminho) | ("gerando", None) | ("erro", mensagem) | (None, None)
+    """
+    job = _JOBS.get((str(household_id), month))
+    if not job:
+        return None, None
+    path, fut = job
+    if not fut.done():
+        return "gerando", None
+    exc = fut.exception()
+    if exc is not None:
+        return "erro", str(exc)
+    return "pronto", path
+
+
+def _email(path: str, month: str, to: List[str]):
+    from utils import send_email
+
+    with open(path, "rb") as f:
+        data = f.read()
+    mm, yyyy = month[5:], month[:4]
+    send_email(to, f"Extrato mensal {mm}/{yyyy} — Family Finance",
+               f"Olá!\n\nSegue em anexo o extrato de {mm}/{yyyy}.\n\n— Family Finance",
+               attach_name=os.path.basename(path), attach_bytes=data)
+
+
+# =========================
+# Renderização (no processo do worker)
+# =========================
+class _Pdf:
+    """Gerador PDF mínimo: texto Helvetica (WinAnsi), retângulos e linhas em páginas A4."""
+
+    W, H = 595, 842
+
+    def __init__(self):
+        self.pages: List[List[str]] = []
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+
+    @staticmethod
+    def _txt(s: str) -> str:
+        b = str(s).encode("cp1252", "ignore").decode("latin-1").strip()
+        return b.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    def text(self, x, y, s, size=10, bold=False, rgb=(0, 0, 0)):
+        r, g, b = rgb
+        self.pages[-1].append(
+            f"BT {r:.3f} {g:.3f} {b:.3f} rg /{'F2' if bold else 'F1'} {size} Tf {x:.1f} {y:.1f} Td ({self._txt(s)}) Tj ET"
+        )
+
+    def rect(self, x, y, w, h, rgb):
+        r, g, b = rgb
+        self.pages[-1].append(f"{r:.3f} {g:.3f} {b:.3f} rg {x:.1f} {y:.1f} {w:.1f} {h:.1f} re f")
+
+    def line(self, x1, y1, x2, y2, gray=0.8):
+        self.pages[-1].append(f"{gray:.2f} G 0.5 w {x1:.1f} {y1:.1f} m {x2:.1f} {y2:.1f} l S")
+
+    def tobytes(self) -> bytes:
+        objs: List[bytes] = []
+        n_pages = len(self.pages)
+        # 1 catálogo, 2 árvore de páginas, 3/4 fontes, depois (página, conteúdo) por página
+        kids = " ".join(f"{5 + 2 * i} 0 R" for i in range(n_pages))
+        objs.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+        objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+        objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        for i, ops in enumerate(self.pages):
+            stream = "\n".join(ops).encode("latin-1")
+            objs.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.W} {self.H}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {6 + 2 * i} 0 R >>".encode()
+            )
+            objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for i, body in enumerate(objs, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+        for off in offsets:
+            out += b"%010d 00000 n \n" % off
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+        return bytes(out)
+
+
+_GREEN, _RED, _BLUE, _GRAY = (0.13, 0.77, 0.37), (0.94, 0.27, 0.27), (0.05, 0.65, 0.91), (0.4, 0.45, 0.55)
+
+
+def _bars(pdf: _Pdf, y: float, title: str, items: List[Tuple[str, float]], fmt) -> float:
+    """Gráfico de barras horizontais; devolve o y livre abaixo dele."""
+    pdf.text(40, y, title, 12, bold=True)
+    y -= 18
+    top = max((abs(v) for _, v in items), default=0) or 1
+    for name, v in items:
+        if y < 60:
+            pdf.new_page(); y = pdf.H - 50
+        pdf.text(40, y, name[:28], 9)
+        w = 260 * abs(v) / top
+        pdf.rect(200, y - 2, max(w, 1), 10, _RED if v < 0 else _BLUE)
+        pdf.text(470, y, fmt(v), 9)
+        y -= 15
+    return y - 10
+
+
+def render_pdf(payload: dict) -> bytes:
+    import money
+
+    def to_brl(v):  # = utils.to_brl, sem importar o Streamlit no worker
+        return money.brl(money.to_cents(v))
+
+    s = payload["summary"]
+    mm, yyyy = payload["month"][5:], payload["month"][:4]
+    pdf = _Pdf()
+    y = pdf.H - 50
+    pdf.text(40, y, f"Extrato mensal - {mm}/{yyyy}", 18, bold=True, rgb=(0.04, 0.13, 0.22))
+    pdf.text(40, y - 16, f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}", 9, rgb=_GRAY)
+    y -= 50
+    for i, (label, v, rgb) in enumerate((("Receitas", s["income"], _GREEN), ("Despesas", s["expense"], _RED),
+                                         ("Saldo", s["balance"], _GREEN if s["balance"] >= 0 else _RED))):
+        x = 40 + i * 175
+        pdf.rect(x, y - 28, 160, 44, (0.95, 0.96, 0.98))
+        pdf.text(x + 10, y, label, 10, rgb=_GRAY)
+        pdf.text(x + 10, y - 18, to_brl(v), 13, bold=True, rgb=rgb)
+    y -= 60
+
+    cats = sorted(s["by_category"].items(), key=lambda kv: -kv[1])
+    y = _bars(pdf, y, "Despesas por categoria", cats, to_brl)
+    mems = sorted(s["by_member"].items(), key=lambda kv: -kv[1])
+    y = _bars(pdf, y, "Resultado por membro", mems, to_brl)
+
+    bills = sorted(payload["bills"], key=lambda b: (b["is_paid"], b["due"]))
+    if y < 140:
+        pdf.new_page(); y = pdf.H - 50
+    pdf.text(40, y, "Contas do mês", 12, bold=True)
+    y -= 18
+    for col, x in (("Vencimento", 40), ("Descrição", 110), ("Categoria", 300), ("Valor", 420), ("Situação", 500)):
+        pdf.text(x, y, col, 9, bold=True, rgb=_GRAY)
+    y -= 6
+    pdf.line(40, y, 555, y)
+    y -= 12
+    for b in bills:
+        if y < 50:
+            pdf.new_page(); y = pdf.H - 50
+        due = f"{b['due'][8:10]}/{b['due'][5:7]}" if b["due"] else "-"
+        val = b["paid"] if b["is_paid"] and b["paid"] is not None else b["planned"]
+        pdf.text(40, y, due, 9)
+        pdf.text(110, y, b["description"][:36], 9)
+        pdf.text(300, y, b["category"][:22], 9)
+        pdf.text(420, y, to_brl(val), 9)
+        pdf.text(500, y, "Pago" if b["is_paid"] else "Em aberto", 9, rgb=_GREEN if b["is_paid"] else _RED)
+        y -= 14
+    if not bills:
+        pdf.text(40, y, "Nenhuma conta com vencimento no mês.", 9, rgb=_GRAY)
+    return pdf.tobytes()
+
+
+def render_pdf_file(payload: dict, path: str) -> str:
+    """Tarefa do worker: renderiza e grava de forma atômica."""
+    data = render_pdf(payload)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    render_pdf_file(json.load(sys.stdin), sys.argv[1])
@@ -1,12 +1,22 @@
 # supabase_client.py
 import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING
 
-def get_supabase() -> Client:
+if TYPE_CHECKING:
+    from supabase import Client
+
+def get_supabase() -> "Client":
     """
     Retorna uma instância do cliente Supabase, utilizando variáveis de ambiente
     para a URL e a chave de API.
+
+    Com FF_FAKE_SUPABASE definida, retorna o cliente local em memória
+    (ver fake_supabase.py) para rodar e medir o app offline.
     """
+    if os.environ.get("FF_FAKE_SUPABASE"):
+        from fake_supabase import from_env
+        return from_env()
+
     url: str = os.environ.get("SUPABASE_URL")
     key: str = os.environ.get("SUPABASE_KEY")
 
@@ -15,4 +25,6 @@ def get_supabase() -> Client:
         # ou criar um arquivo .env e carregá-lo, ou configurar diretamente no Streamlit Cloud
         raise ValueError("SUPABASE_URL e SUPABASE_KEY devem ser configuradas como variáveis de ambiente.")
 
+    # import tardio: o SDK (~0,3 s) só carrega quando o cliente real é criado
+    from supabase import create_client
     return create_client(url, key)
@@ -0,0 +1,12 @@
+# tests/test_perf_budget.py
+"""Orçamento de round trips (perf_budget.py) como teste: falha quando uma página regride."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import perf_budget  # noqa: E402
+
+
+def test_pages_within_round_trip_budget():
+    assert perf_budget.check() == []
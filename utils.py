@@ -1,23 +1,55 @@
 # utils.py
 from __future__ import annotations
 from datetime import date, datetime, timedelta
+import functools
+import inspect
 import uuid
 import io
 import os
-import smtplib
-from email.message import EmailMessage
+import threading
+import time
 from typing import List, Optional
-import pandas as pd
+import numpy as np
 import streamlit as st
-from supabase import Client  # IMPORTANTE para hash_funcs
+import datacache
+import fx
+import money
+import perf
 
 # Assumimos que 'sb' e 'user' serão passados ou acessíveis via st.session_state
 
+# O cliente não entra na chave do cache (nem o real, nem o fake local de testes).
+# Chaves por nome do tipo: não obriga importar o SDK do supabase só para isso.
+_CLIENT_HASH_FUNCS = {
+    "supabase._sync.client.Client": lambda _: None,
+    "fake_supabase.FakeSupabase": lambda _: None,
+    "perf.TracingClient": lambda _: None,
+}
+
 def to_brl(v: float) -> str:
+    # via centavos: arredonda uma vez, sem depender do float formatado (colunas: money.brl)
+    return money.brl(money.to_cents(v))
+
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+def static_url(path: str) -> str:
+    """
+    URL relativa de um arquivo de static/ (server.enableStaticServing), com a
+    versão pelo mtime: o navegador cacheia e só baixa de novo quando o arquivo muda.
+    """
     try:
-        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "R$ 0,00"
+        v = int(os.path.getmtime(os.path.join(_STATIC_DIR, path)))
+    except OSError:
+        v = 0
+    return f"app/static/{path}?v={v}"
+
+def static_img(name: str, width: int, alt: str = "") -> str:
+    """<img> de uma variante WebP gerada por build_assets.py (1x + 2x no srcset)."""
+    one = static_url(f"img/{name}_{width}.webp")
+    srcset = ""
+    if os.path.exists(os.path.join(_STATIC_DIR, "img", f"{name}_{width * 2}.webp")):
+        srcset = f' srcset="{one} 1x, {static_url(f"img/{name}_{width * 2}.webp")} 2x"'
+    return f'<img src="{one}"{srcset} width="{width}" alt="{alt}">'
 
 def _to_date_safe(s):
     if not s:
@@ -32,6 +64,35 @@ def _to_date_safe(s):
                 pass
         return None
 
+def summarize_transactions(txs, cat_name_by_id: Optional[dict] = None, mem_name_by_id: Optional[dict] = None) -> dict:
+    """
+    Agregados de um conjunto de transações, com as regras do dashboard Home:
+      - receitas/despesas/saldo e despesas por categoria pelo valor previsto;
+      - resultado por membro pelo valor efetivo (pago, se pago; senão previsto).
+    Somas exatas em centavos (money), na moeda de apresentação (fx); os valores devolvidos são reais.
+    """
+    cat_name_by_id = cat_name_by_id or {}
+    mem_name_by_id = mem_name_by_id or {}
+    txs = list(txs)
+    kinds = np.array([t.get("type") for t in txs], dtype=object)
+    is_inc, is_exp = kinds == "income", kinds == "expense"
+    planned = fx.planned(txs)
+    eff = fx.effective(txs)
+    income, expense = int(planned[is_inc].sum()), int(planned[is_exp].sum())
+    by_category = money.group_sum(
+        [cat_name_by_id.get(t.get("category_id"), "Sem Categoria") for t, e in zip(txs, is_exp) if e],
+        planned[is_exp])
+    by_member = money.group_sum(
+        [mem_name_by_id.get(t.get("member_id"), "Não Atribuído") for t in txs],
+        np.where(is_inc, eff, -eff))
+    return {
+        "income": money.to_reais(income),
+        "expense": money.to_reais(expense),
+        "balance": money.to_reais(income - expense),
+        "by_category": {k: money.to_reais(v) for k, v in by_category.items()},
+        "by_member": {k: money.to_reais(v) for k, v in by_member.items()},
+    }
+
 def _safe_table(sb, HOUSEHOLD_ID, name: str):
     """
     Busca dados de uma tabela com tratamento de erro e filtro por household_id.
@@ -43,10 +104,106 @@ def _safe_table(sb, HOUSEHOLD_ID, name: str):
         # st.error(f"Erro ao buscar tabela '{name}' via _safe_table: {e}")  # debug opcional
         return []
 
+# ========= Cache vivo: mudanças por household =========
+# Cada fetcher cacheia {fetched_at, data}. Quando chega uma mudança do household
+# (changefeed.py: Supabase Realtime, o cliente fake ou a própria gravação),
+# mark_changed() anota o instante por tabela e, na próxima leitura, só as
+# entradas daquele household buscadas ANTES da mudança são descartadas e
+# rebuscadas (clear com os mesmos argumentos) — nada de limpar o cache inteiro.
+#
+# Atualizações de transações que não mexem em intervalo/ordem (pagamento,
+# anexo) nem isso: patch_cached_transactions() guarda as linhas novas e elas
+# são aplicadas sobre os resultados cacheados antes do patch. Entradas que
+# filtram por um campo que o patch pode mudar (is_paid, categoria, membro)
+# rebuscam: o overlay não tira linhas que deixaram de casar nem acerta o total.
+
+_LIVE_TTL = 600  # igual ao ttl dos fetchers: depois disso nenhum cache é mais antigo que a marca
+_CHANGED_AT: dict = {}   # (household, tabela) -> instante da última mudança
+_TX_PATCHES: dict = {}   # household -> {tx_id: (ts, campos)}
+_LIVE_LOCK = threading.Lock()
+
+def mark_changed(HOUSEHOLD_ID, table: str):
+    """Tabela do household mudou: entradas cacheadas antes de agora ficam velhas."""
+    with _LIVE_LOCK:
+        _CHANGED_AT[(HOUSEHOLD_ID, table)] = time.time()
+
+def patch_cached_transactions(HOUSEHOLD_ID, rows: List[dict]):
+    """Registra as linhas atualizadas (id + campos alterados) para o overlay."""
+    now = time.time()
+    with _LIVE_LOCK:
+        hh = _TX_PATCHES.setdefault(HOUSEHOLD_ID, {})
+        for tid in [k for k, (ts, _) in hh.items() if now - ts > _LIVE_TTL]:
+            del hh[tid]
+        for r in rows:
+            if r.get("id") is not None:
+                hh[r["id"]] = (now, {k: v for k, v in r.items() if k != "id"})
+        # quem não aplica patch (ex.: snapshot analítico) trata como mudança
+        _CHANGED_AT[(HOUSEHOLD_ID, "transactions:patch")] = now
+
+def _changed_after(HOUSEHOLD_ID, tables, ts: float) -> bool:
+    with _LIVE_LOCK:
+        return any(_CHANGED_AT.get((HOUSEHOLD_ID, t), 0.0) >= ts for t in tables)
+
+def _patched_after(HOUSEHOLD_ID, fetched_at: float) -> bool:
+    with _LIVE_LOCK:
+        return any(ts >= fetched_at for ts, _ in (_TX_PATCHES.get(HOUSEHOLD_ID) or {}).values())
+
+def _apply_tx_patches(HOUSEHOLD_ID, fetched_at: float, rows: List[dict]) -> List[dict]:
+    with _LIVE_LOCK:
+        hh = _TX_PATCHES.get(HOUSEHOLD_ID)
+        if not hh:
+            return rows
+        novos = {tid: f for tid, (ts, f) in hh.items() if ts >= fetched_at}
+    if not novos:
+        return rows
+    return [{**r, **novos[r.get("id")]} if r.get("id") in novos else r for r in rows]
+
+def _stamped(fn):
+    """Corpo cacheado: guarda junto o instante da busca."""
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        return {"fetched_at": time.time(), "data": fn(*args, **kwargs)}
+    return inner
+
+def _live(*tables: str, patch: bool = False, filters: tuple = ()):
+    """
+    Fetcher público sobre um cache _stamped: rebusca só esta entrada se alguma
+    de `tables` mudou depois dela; com patch=True aplica os patches de transações
+    (senão um patch conta como mudança). `filters`: parâmetros do fetcher com o
+    nome do campo que filtram; com algum deles preenchido, patch também rebusca.
+    """
+    watched = tables if patch else tables + (("transactions:patch",) if "transactions" in tables else ())
+
+    def deco(cached):
+        sig = inspect.signature(cached)
+
+        def _filtered(args, kwargs) -> bool:
+            bound = sig.bind_partial(None, None, *args, **kwargs).arguments
+            return any(bound.get(f) is not None for f in filters)
+
+        @functools.wraps(cached)
+        def wrapper(sb, HOUSEHOLD_ID, *args, **kwargs):
+            res = cached(sb, HOUSEHOLD_ID, *args, **kwargs)
+            if _changed_after(HOUSEHOLD_ID, watched, res["fetched_at"]) or (
+                    patch and filters and _filtered(args, kwargs) and _patched_after(HOUSEHOLD_ID, res["fetched_at"])):
+                cached.clear(sb, HOUSEHOLD_ID, *args, **kwargs)
+                res = cached(sb, HOUSEHOLD_ID, *args, **kwargs)
+            data = res["data"]
+            if not patch:
+                return data
+            if isinstance(data, dict):
+                return {**data, "rows": _apply_tx_patches(HOUSEHOLD_ID, res["fetched_at"], data["rows"])}
+            return _apply_tx_patches(HOUSEHOLD_ID, res["fetched_at"], data)
+        wrapper.clear = cached.clear
+        return wrapper
+    return deco
+
 # --- Fetchers de Dados ---
 # Todas as funções fetcher precisarão de 'sb' e 'HOUSEHOLD_ID'
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("members")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_members(sb, HOUSEHOLD_ID):
     try:
         # inclui user_id para mapeamentos usuário↔membro
@@ -62,7 +219,9 @@ def fetch_members(sb, HOUSEHOLD_ID):
         st.error(f"Erro ao buscar membros: {e}")
         return _safe_table(sb, HOUSEHOLD_ID, "members")
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("categories")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_categories(sb, HOUSEHOLD_ID):
     try:
         return (
@@ -77,11 +236,13 @@ def fetch_categories(sb, HOUSEHOLD_ID):
         st.error(f"Erro ao buscar categorias: {e}")
         return _safe_table(sb, HOUSEHOLD_ID, "categories")
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("accounts")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_accounts(sb, HOUSEHOLD_ID, active_only=False):
     q = (
         sb.table("accounts")
-          .select("id,name,is_active,type,opening_balance")
+          .select("id,name,is_active,type,opening_balance,currency")
           .eq("household_id", HOUSEHOLD_ID)
     )
     if active_only:
@@ -94,7 +255,9 @@ def fetch_accounts(sb, HOUSEHOLD_ID, active_only=False):
     data.sort(key=lambda a: (a.get("name") or "").lower())
     return data
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("credit_cards")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_cards(sb, HOUSEHOLD_ID, active_only=True):
     q = (
         sb.table("credit_cards")
@@ -111,7 +274,9 @@ def fetch_cards(sb, HOUSEHOLD_ID, active_only=True):
     data.sort(key=lambda c: (c.get("name") or "").lower())
     return data
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("credit_cards", "transactions")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_card_limits(sb, HOUSEHOLD_ID):
     try:
         data = (
@@ -128,9 +293,57 @@ def fetch_card_limits(sb, HOUSEHOLD_ID):
     data.sort(key=lambda c: (c.get("name") or "").lower())
     return data
 
+@_live("pending_invites")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_pending_invites(sb, HOUSEHOLD_ID):
+    """Convites ainda não usados do household, mais recentes primeiro."""
+    return (
+        sb.table("pending_invites")
+          .select("id, email, display_name, token, status, expires_at, created_at")
+          .eq("household_id", HOUSEHOLD_ID)
+          .neq("status", "used")
+          .order("created_at", desc=True)
+          .execute()
+          .data
+        or []
+    )
+
+@_live("relationships")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_relationships(sb, HOUSEHOLD_ID):
+    """Relações familiares do household; None se a tabela relationships não existe."""
+    try:
+        return sb.table("relationships").select("*").eq("household_id", HOUSEHOLD_ID).execute().data or []
+    except Exception:
+        return None
+
+@_live("avatars")  # upload de foto: changefeed.changed(HOUSEHOLD_ID, "avatars")
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_avatar_url(sb, HOUSEHOLD_ID, member_id, expires: int = 3600) -> Optional[str]:
+    """URL assinada (ou pública) de avatars/<household>/<membro>.png; vale mais que o ttl do cache."""
+    bucket, path = sb.storage.from_("avatars"), f"{HOUSEHOLD_ID}/{member_id}.png"
+    try:
+        url = bucket.create_signed_url(path, expires)
+        if isinstance(url, dict):
+            return url.get("signedURL") or url.get("signed_url")
+        return url
+    except Exception:
+        try:
+            pub = bucket.get_public_url(path)
+            if isinstance(pub, dict):
+                return pub.get("publicURL") or pub.get("public_url")
+            return pub
+        except Exception:
+            return None
+
 # ========= MELHORIA: filtrar no banco com fallback local =========
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("transactions", patch=True)
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_tx(sb, HOUSEHOLD_ID, start: date, end: date):
     """
     Busca transações pelo occurred_at no intervalo [start, end].
@@ -160,7 +373,9 @@ def fetch_tx(sb, HOUSEHOLD_ID, start: date, end: date):
         out.sort(key=lambda t: (_to_date_safe(t.get("occurred_at")) or date.min))
         return out
 
-@st.cache_data(ttl=600, hash_funcs={Client: lambda _: None})
+@_live("transactions", patch=True)
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
 def fetch_tx_due(sb, HOUSEHOLD_ID, start: date, end: date):
     """
     Busca transações por data de vencimento. Regra:
@@ -213,13 +428,108 @@ def fetch_tx_due(sb, HOUSEHOLD_ID, start: date, end: date):
         out.sort(key=lambda t: (_to_date_safe(t.get("due_date")) or _to_date_safe(t.get("occurred_at")) or date.min))
         return out
 
+# Colunas ordenáveis do navegador de Movimentações (rótulo -> coluna no banco)
+TX_SORT_COLUMNS = {
+    "Data": "occurred_at",
+    "Vencimento": "due_date",
+    "Valor": "planned_amount",
+    "Descrição": "description",
+}
+
+@_live("transactions", patch=True, filters=("is_paid",))
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def fetch_tx_page(sb, HOUSEHOLD_ID, start: date, end: date, page: int = 0, page_size: int = 50,
+                  sort: str = "occurred_at", desc: bool = True, tx_type: Optional[str] = None,
+                  is_paid: Optional[bool] = None, text: str = ""):
+    """
+    Uma página de transações de [start, end], já filtrada e ordenada no banco.
+    Retorna {"rows": [...], "total": n} — total vem do count="exact" da mesma
+    consulta, então abrir um ano custa o mesmo que abrir uma semana.
+    """
+    q = (
+        sb.table("transactions")
+          .select("*", count="exact")
+          .eq("household_id", HOUSEHOLD_ID)
+          .gte("occurred_at", start.isoformat())
+          .lte("occurred_at", end.isoformat())
+    )
+    if tx_type:
+        q = q.eq("type", tx_type)
+    if is_paid is not None:
+        q = q.eq("is_paid", is_paid)
+    if text:
+        q = q.ilike("description", f"%{text}%")
+    first = max(0, int(page)) * page_size
+    # id desempata a ordenação: páginas estáveis mesmo com valores repetidos
+    res = q.order(sort, desc=desc).order("id").range(first, first + page_size - 1).execute()
+    return {"rows": res.data or [], "total": res.count if res.count is not None else len(res.data or [])}
+
+@_live("transactions", patch=True, filters=("is_paid", "category_id", "member_id"))
+@perf.traced(datacache.cached(ttl=600, hash_funcs=_CLIENT_HASH_FUNCS))
+@_stamped
+def search_transactions(sb, HOUSEHOLD_ID, query: str = "", page: int = 0, page_size: int = 25,
+                        start: Optional[date] = None, end: Optional[date] = None,
+                        min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                        member_id: Optional[str] = None, category_id: Optional[str] = None,
+                        is_paid: Optional[bool] = None):
+    """
+    Busca ranqueada na descrição (RPC search_transactions, migração 002) com
+    filtros estruturados. Retorna {"rows": [...], "total": n}; cada linha traz
+    "headline" com os termos encontrados entre [[ ]].
+    """
+    rows = sb.rpc("search_transactions", {
+        "p_household": HOUSEHOLD_ID, "p_query": query or "",
+        "p_start": start.isoformat() if start else None, "p_end": end.isoformat() if end else None,
+        "p_min_amount": min_amount, "p_max_amount": max_amount,
+        "p_member": member_id, "p_category": category_id, "p_is_paid": is_paid,
+        "p_limit": page_size, "p_offset": max(0, int(page)) * page_size,
+    }).execute().data or []
+    return {"rows": rows, "total": int(rows[0].get("total_count") or 0) if rows else 0}
+
+def highlight_html(headline: Optional[str]) -> str:
+    """Converte o destaque [[termo]] da busca em <mark>, escapando o resto."""
+    import html
+    return html.escape(headline or "").replace("[[", "<mark>").replace("]]", "</mark>")
+
+def iter_tx_batches(sb, HOUSEHOLD_ID, start: Optional[date] = None, end: Optional[date] = None,
+                    batch_size: int = 1000, columns: str = "*"):
+    """
+    Percorre as transações do household em lotes (paginação por range no banco),
+    ordenadas por occurred_at/id. Memória constante: nunca materializa o intervalo todo.
+    Sem start/end percorre o histórico inteiro. Use batch_size <= max-rows da API.
+    """
+    offset = 0
+    while True:
+        q = sb.table("transactions").select(columns).eq("household_id", HOUSEHOLD_ID)
+        if start is not None:
+            q = q.gte("occurred_at", start.isoformat())
+        if end is not None:
+            q = q.lte("occurred_at", end.isoformat())
+        rows = (
+            q.order("occurred_at", desc=False)
+             .order("id", desc=False)
+             .range(offset, offset + batch_size - 1)
+             .execute()
+             .data
+            or []
+        )
+        if rows:
+            yield rows
+        # página incompleta = fim (batch_size deve ser <= max-rows do PostgREST)
+        if len(rows) < batch_size:
+            return
+        offset += len(rows)
+
 # --- SMTP (opcional) ---
 def _smtp_cfg():
-    cfg = getattr(st.secrets, "smtp", None)
-    if hasattr(st, "secrets") and st.secrets and "smtp" in st.secrets:
-        cfg = st.secrets["smtp"]
-    else:
-        return None  # Nenhuma configuração SMTP encontrada
+    try:
+        if hasattr(st, "secrets") and st.secrets and "smtp" in st.secrets:
+            cfg = st.secrets["smtp"]
+        else:
+            return None  # Nenhuma configuração SMTP encontrada
+    except Exception:
+        return None  # sem secrets.toml (ex.: execução local/offline)
 
     if not cfg:
         return None
@@ -237,6 +547,9 @@ def send_email(to_emails: List[str], subject: str, body: str, attach_name: Optio
     if not smtp:
         # silencioso: sem SMTP configurado
         return False
+    # smtplib/email só carregam quando há e-mail a enviar (fora do caminho do login)
+    import smtplib
+    from email.message import EmailMessage
     try:
         msg = EmailMessage()
         msg["Subject"] = subject
@@ -261,39 +574,45 @@ def _today_str():
     return date.today().isoformat()
 
 def notify_due_bills(sb, HOUSEHOLD_ID, user):
+    """
+    Lembrete diário das contas a vencer. Com FF_EMAIL_ANOMALIES=1 o e-mail também
+    traz os gastos fora do normal (anomalies.py, último estado — sem consulta).
+    """
     key = f"__notified__{_today_str()}"
     if st.session_state.get(key):
         return
 
     try:
+        to = [user.email] if user and getattr(user, "email", None) else []
+        if not to:
+            return
+
         start = date.today()
         end = date.today() + timedelta(days=3)
         txs = fetch_tx_due(sb, HOUSEHOLD_ID, start, end)
 
-        if not txs:
-            st.session_state[key] = True
-            return
-
         # filtra despesas não pagas
-        pend = [t for t in txs if (t.get("type") == "expense" and not t.get("is_paid"))]
-        if not pend:
-            st.session_state[key] = True
-            return
-
-        to = [user.email] if user and getattr(user, "email", None) else []
-        if not to:
-            st.session_state[key] = True
-            return
-
+        pend = [t for t in (txs or []) if (t.get("type") == "expense" and not t.get("is_paid"))]
         lines = []
         for t in pend:
             due = _to_date_safe(t.get("due_date")) or _to_date_safe(t.get("occurred_at"))
             val = t.get("planned_amount") or t.get("amount") or 0.0
             lines.append(f"- {t.get('description','(sem descrição)')} — vence em {due.strftime('%d/%m/%Y')} — {to_brl(val)}")
 
-        if lines:
-            subject = "Lembrete: contas a vencer (3 dias / hoje)"
-            body = "Olá!\n\nAs seguintes contas vencem em até 3 dias (ou hoje):\n\n" + "\n".join(lines) + "\n\n— Family Finance"
+        alertas = []
+        if os.environ.get("FF_EMAIL_ANOMALIES", "0").lower() in ("1", "true"):
+            import anomalies
+            cats = {c["id"]: c.get("name") for c in fetch_categories(sb, HOUSEHOLD_ID)}
+            alertas = [f"- {anomalies.describe(a, cats)}" for a in anomalies.alerts(HOUSEHOLD_ID)]
+
+        if lines or alertas:
+            partes = []
+            if lines:
+                partes.append("As seguintes contas vencem em até 3 dias (ou hoje):\n\n" + "\n".join(lines))
+            if alertas:
+                partes.append("Gastos fora do normal:\n\n" + "\n".join(alertas))
+            subject = "Lembrete: contas a vencer (3 dias / hoje)" if lines else "Alerta: gastos fora do normal"
+            body = "Olá!\n\n" + "\n\n".join(partes) + "\n\n— Family Finance"
             send_email(to, subject, body)
     finally:
         st.session_state[key] = True